@@ -0,0 +1,87 @@
+# Generated by Django 4.2.3 on 2026-10-18 07:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_revenue(apps, schema_editor):
+    """
+    Payments paid before the summary existed count in the month of their
+    borrowing, they have no time of payment
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO analytics_monthlyrevenue (month, type, payments, amount) "
+            "SELECT date_trunc('month', borrowing.borrow_date AT TIME ZONE %s)::date, "
+            "payment.type, count(*), sum(payment.to_pay) "
+            "FROM borrowings_payment AS payment "
+            "JOIN borrowings_borrowing AS borrowing "
+            "ON borrowing.id = payment.borrowing_id_id "
+            "WHERE payment.status = 'PAID' "
+            "GROUP BY 1, 2",
+            [settings.TIME_ZONE],
+        )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('borrowings', '0013_borrowing_returned_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CirculationWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_borrowing_id', models.BigIntegerField(default=0)),
+                ('last_returned_at', models.DateTimeField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MonthlyCirculation',
+            fields=[
+                ('month', models.DateField(primary_key=True, serialize=False)),
+                ('borrowings', models.BigIntegerField(default=0)),
+                ('returns', models.BigIntegerField(default=0)),
+                ('loan_seconds', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MonthlyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('type', models.CharField(max_length=50)),
+                ('payments', models.BigIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserMonthlyBorrowings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('borrowings', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_borrowings', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyrevenue',
+            constraint=models.UniqueConstraint(fields=('month', 'type'), name='monthly_revenue_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='usermonthlyborrowings',
+            index=models.Index(fields=['month', '-borrowings'], name='user_monthly_top_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='usermonthlyborrowings',
+            constraint=models.UniqueConstraint(fields=('user', 'month'), name='user_monthly_borrowings_unique'),
+        ),
+        migrations.RunPython(backfill_revenue, migrations.RunPython.noop),
+    ]
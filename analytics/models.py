@@ -0,0 +1,71 @@
+from django.db import models
+
+from user.models import User
+
+
+class MonthlyCirculation(models.Model):
+    """
+    Borrowings made and returned in a month and how long the returned
+    ones were kept, folded in by refresh_circulation
+    """
+
+    month = models.DateField(primary_key=True)
+    borrowings = models.BigIntegerField(default=0)
+    returns = models.BigIntegerField(default=0)
+    loan_seconds = models.BigIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"Circulation of {self.month:%Y-%m}"
+
+
+class UserMonthlyBorrowings(models.Model):
+    """Borrowings a user made in a month, folded in by refresh_circulation"""
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="monthly_borrowings"
+    )
+    month = models.DateField()
+    borrowings = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "month"], name="user_monthly_borrowings_unique"
+            ),
+        ]
+        indexes = [
+            # users who borrowed the most in a month
+            models.Index(
+                fields=["month", "-borrowings"], name="user_monthly_top_idx"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Borrowings of user {self.user_id} in {self.month:%Y-%m}"
+
+
+class MonthlyRevenue(models.Model):
+    """Payments of a type paid in a month, recorded when they are paid"""
+
+    month = models.DateField()
+    type = models.CharField(max_length=50)
+    payments = models.BigIntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["month", "type"], name="monthly_revenue_unique"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.type} revenue of {self.month:%Y-%m}"
+
+
+class CirculationWatermark(models.Model):
+    """Last borrowing and return folded into the circulation summaries"""
+
+    last_borrowing_id = models.BigIntegerField(default=0)
+    last_returned_at = models.DateTimeField(null=True, blank=True)
+    refreshed_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,54 @@
+from rest_framework import serializers
+
+from analytics.models import MonthlyCirculation, MonthlyRevenue, UserMonthlyBorrowings
+from books.models import BookAvailability
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+class MostBorrowedBookSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source="book_id")
+    title = serializers.CharField(source="book.title")
+    author = serializers.CharField(source="book.author")
+
+    class Meta:
+        model = BookAvailability
+        fields = ("id", "title", "author", "total_borrowings", "active_loans")
+
+
+class MonthlyCirculationSerializer(serializers.ModelSerializer):
+    month = serializers.DateField(format="%Y-%m")
+    average_loan_days = serializers.SerializerMethodField()
+
+    class Meta:
+        model = MonthlyCirculation
+        fields = ("month", "borrowings", "returns", "average_loan_days")
+
+    def get_average_loan_days(self, circulation: MonthlyCirculation) -> float | None:
+        """Average length of the loans returned in the month"""
+        if not circulation.returns:
+            return None
+
+        return round(
+            circulation.loan_seconds / circulation.returns / SECONDS_PER_DAY, 2
+        )
+
+
+class UserMonthlyBorrowingsSerializer(serializers.ModelSerializer):
+    month = serializers.DateField(format="%Y-%m")
+
+    class Meta:
+        model = UserMonthlyBorrowings
+        fields = ("user_id", "month", "borrowings")
+
+
+class MonthlyRevenueSerializer(serializers.ModelSerializer):
+    month = serializers.DateField(format="%Y-%m")
+
+    class Meta:
+        model = MonthlyRevenue
+        fields = ("month", "type", "payments", "amount")
+
+
+class OutstandingFinesSerializer(serializers.Serializer):
+    outstanding_fines = serializers.DecimalField(max_digits=14, decimal_places=2)
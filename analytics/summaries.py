@@ -0,0 +1,150 @@
+"""
+Summary tables of the analytics endpoints.
+
+Borrowings and returns are folded into the monthly summaries by the
+refresh_analytics task rather than by the requests that make them, so
+live traffic never waits on a summary row. A watermark keeps the last
+folded borrowing id and return date; borrowings and returns newer than
+ANALYTICS_COMMIT_MARGIN seconds are left for the next run, by then the
+transactions that wrote them have committed. Revenue is recorded by the
+batches that mark payments paid (borrowings/webhooks.py). Most borrowed
+books are read from the availability projection of the catalog.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from analytics.models import (
+    CirculationWatermark,
+    MonthlyCirculation,
+    MonthlyRevenue,
+    UserMonthlyBorrowings,
+)
+from borrowings.models import Borrowing
+
+BORROWING = Borrowing._meta.db_table
+BORROWING_USER = Borrowing._meta.get_field("user_id").column
+CIRCULATION = MonthlyCirculation._meta.db_table
+USER_MONTHLY = UserMonthlyBorrowings._meta.db_table
+REVENUE = MonthlyRevenue._meta.db_table
+
+
+def month_of(column: str) -> str:
+    """SQL of the first day of the month of a timestamp in TIME_ZONE"""
+    return f"date_trunc('month', {column} AT TIME ZONE %(time_zone)s)::date"
+
+
+def refresh_circulation() -> bool:
+    """
+    Folds the next ANALYTICS_REFRESH_BATCH_SIZE borrowings and returns
+    after the watermark into the summaries in one transaction. Returns
+    whether more are left.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.ANALYTICS_COMMIT_MARGIN)
+    batch_size = settings.ANALYTICS_REFRESH_BATCH_SIZE
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # concurrent runs wait for each other here
+        watermark, _ = CirculationWatermark.objects.select_for_update().get_or_create(
+            pk=1
+        )
+        params = {
+            "time_zone": settings.TIME_ZONE,
+            "cutoff": cutoff,
+            "last_id": watermark.last_borrowing_id,
+            "last_returned_at": watermark.last_returned_at,
+            "batch_size": batch_size,
+        }
+
+        cursor.execute(
+            f"SELECT count(*), max(id) FROM (SELECT id FROM {BORROWING} "
+            "WHERE id > %(last_id)s AND borrow_date <= %(cutoff)s "
+            "ORDER BY id LIMIT %(batch_size)s) AS batch",
+            params,
+        )
+        borrowings, params["last_borrowing_id"] = cursor.fetchone()
+
+        if borrowings:
+            cursor.execute(
+                f"WITH batch AS (SELECT {BORROWING_USER} AS user_id, "
+                f"{month_of('borrow_date')} AS month FROM {BORROWING} "
+                "WHERE id > %(last_id)s AND id <= %(last_borrowing_id)s), "
+                f"users AS (INSERT INTO {USER_MONTHLY} AS summary "
+                "(user_id, month, borrowings) "
+                "SELECT user_id, month, count(*) FROM batch "
+                "GROUP BY user_id, month ORDER BY user_id, month "
+                "ON CONFLICT (user_id, month) DO UPDATE SET "
+                "borrowings = summary.borrowings + EXCLUDED.borrowings) "
+                f"INSERT INTO {CIRCULATION} AS summary "
+                "(month, borrowings, returns, loan_seconds) "
+                "SELECT month, count(*), 0, 0 FROM batch "
+                "GROUP BY month ORDER BY month "
+                "ON CONFLICT (month) DO UPDATE SET "
+                "borrowings = summary.borrowings + EXCLUDED.borrowings",
+                params,
+            )
+            watermark.last_borrowing_id = params["last_borrowing_id"]
+
+        # the batch ends with the last return of its size, with the
+        # returns of the same time, or at the cutoff
+        cursor.execute(
+            f"SELECT actual_return_date FROM {BORROWING} "
+            "WHERE actual_return_date > %(last_returned_at)s "
+            "AND actual_return_date <= %(cutoff)s "
+            "ORDER BY actual_return_date OFFSET %(batch_size)s - 1 LIMIT 1"
+            if watermark.last_returned_at else
+            f"SELECT actual_return_date FROM {BORROWING} "
+            "WHERE actual_return_date <= %(cutoff)s "
+            "ORDER BY actual_return_date OFFSET %(batch_size)s - 1 LIMIT 1",
+            params,
+        )
+        row = cursor.fetchone()
+        returns_left = row is not None
+        params["returned_until"] = row[0] if row else cutoff
+
+        cursor.execute(
+            f"INSERT INTO {CIRCULATION} AS summary "
+            "(month, borrowings, returns, loan_seconds) "
+            f"SELECT {month_of('actual_return_date')}, 0, count(*), "
+            "sum(extract(epoch FROM actual_return_date - borrow_date))::bigint "
+            f"FROM {BORROWING} "
+            "WHERE actual_return_date <= %(returned_until)s "
+            + (
+                "AND actual_return_date > %(last_returned_at)s "
+                if watermark.last_returned_at else ""
+            )
+            + "GROUP BY 1 ORDER BY 1 "
+            "ON CONFLICT (month) DO UPDATE SET "
+            "returns = summary.returns + EXCLUDED.returns, "
+            "loan_seconds = summary.loan_seconds + EXCLUDED.loan_seconds",
+            params,
+        )
+        watermark.last_returned_at = params["returned_until"]
+        watermark.save()
+
+    return borrowings == batch_size or returns_left
+
+
+def record_revenue(payments: list[tuple]) -> None:
+    """Adds payments paid now, as (type, amount) pairs, to the revenue"""
+    if not payments:
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {REVENUE} AS summary (month, type, payments, amount) "
+            f"SELECT {month_of('now()')}, type, count(*), sum(amount) "
+            "FROM unnest(%(types)s::varchar[], %(amounts)s::numeric[]) "
+            "AS payment (type, amount) "
+            "GROUP BY type ORDER BY type "
+            "ON CONFLICT (month, type) DO UPDATE SET "
+            "payments = summary.payments + EXCLUDED.payments, "
+            "amount = summary.amount + EXCLUDED.amount",
+            {
+                "time_zone": settings.TIME_ZONE,
+                "types": [payment_type for payment_type, _ in payments],
+                "amounts": [amount for _, amount in payments],
+            },
+        )
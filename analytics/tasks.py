@@ -0,0 +1,17 @@
+from celery import shared_task
+
+from analytics.summaries import refresh_circulation
+
+
+@shared_task
+def refresh_analytics() -> int:
+    """
+    Folds the borrowings and returns made since the last run into the
+    summaries, batch by batch, and returns the number of batches
+    """
+    batches = 1
+
+    while refresh_circulation():
+        batches += 1
+
+    return batches
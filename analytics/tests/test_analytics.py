@@ -0,0 +1,234 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from analytics.models import (
+    CirculationWatermark,
+    MonthlyCirculation,
+    MonthlyRevenue,
+    UserMonthlyBorrowings,
+)
+from analytics.summaries import refresh_circulation
+from analytics.tasks import refresh_analytics
+from benchmarks.fake_stripe import checkout_event
+from books.models import Book, BookAvailability
+from borrowings.models import Borrowing, Payment
+from borrowings.tasks import accrue_overdue_fines
+from borrowings.webhooks import apply_events, to_stripe_event
+
+CIRCULATION_URL = reverse("analytics:circulation")
+MOST_BORROWED_URL = reverse("analytics:most-borrowed-books")
+OUTSTANDING_FINES_URL = reverse("analytics:outstanding-fines")
+REVENUE_URL = reverse("analytics:revenue")
+USER_BORROWINGS_URL = reverse("analytics:user-borrowings")
+
+
+@override_settings(ANALYTICS_COMMIT_MARGIN=0, ANALYTICS_REFRESH_BATCH_SIZE=2)
+class AnalyticsTests(TestCase):
+    def setUp(self):
+        # the fixture borrowings and payments are folded in by the migrations
+        Borrowing.objects.all().delete()
+        MonthlyRevenue.objects.all().delete()
+        self.month = timezone.localdate().replace(day=1)
+        self.user = get_user_model().objects.create_user(
+            "reader@library.com", "password"
+        )
+        self.admin = get_user_model().objects.create_superuser(
+            "admin@library.com", "password"
+        )
+        self.book = Book.objects.create(
+            title="Harry Potter",
+            author="J.K. Rowling",
+            cover="Hard",
+            inventory=5,
+            daily_fee=Decimal("0.10"),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def borrow(self, user, **params):
+        return Borrowing.objects.create(
+            book_id=self.book,
+            user_id=user,
+            expected_return_date=timezone.now() + timedelta(days=7),
+            **params,
+        )
+
+    def circulation(self):
+        """Borrowings, returns and loan seconds of all months"""
+        return tuple(
+            MonthlyCirculation.objects.aggregate(
+                Sum("borrowings"), Sum("returns"), Sum("loan_seconds")
+            ).values()
+        )
+
+    def test_refresh_folds_only_what_is_new(self):
+        for _ in range(3):
+            self.borrow(self.user)
+        returned = self.borrow(self.admin)
+        Borrowing.objects.filter(pk=returned.pk).update(
+            borrow_date=returned.borrow_date - timedelta(days=2),
+            actual_return_date=returned.borrow_date,
+        )
+
+        self.assertTrue(refresh_circulation())
+        self.assertEqual(refresh_analytics(), 2)
+
+        self.assertEqual(self.circulation(), (4, 1, 2 * 24 * 60 * 60))
+        self.assertEqual(
+            list(
+                UserMonthlyBorrowings.objects.values("user_id")
+                .annotate(total=Sum("borrowings"))
+                .order_by("-total")
+                .values_list("user_id", "total")
+            ),
+            [(self.user.id, 3), (self.admin.id, 1)],
+        )
+
+        self.borrow(self.user)
+        refresh_analytics()
+        refresh_analytics()
+
+        self.assertEqual(self.circulation(), (5, 1, 2 * 24 * 60 * 60))
+        self.assertEqual(
+            CirculationWatermark.objects.get().last_borrowing_id,
+            Borrowing.objects.latest("id").id,
+        )
+
+    @patch("borrowings.webhooks.send_notification")
+    def test_paid_payments_are_added_to_the_revenue(self, send_notification):
+        borrowing = self.borrow(self.user)
+        payments = [
+            Payment.objects.create(
+                status="PENDING",
+                type=payment_type,
+                session_url=f"https://checkout.stripe.com/{session_id}",
+                session_id=session_id,
+                to_pay=to_pay,
+                borrowing_id=borrowing,
+            )
+            for session_id, payment_type, to_pay in [
+                ("cs_analytics_1", "PAYMENT", Decimal("0.70")),
+                ("cs_analytics_2", "PAYMENT", Decimal("1.40")),
+                ("cs_analytics_3", "FINE", Decimal("0.20")),
+            ]
+        ]
+
+        apply_events([
+            to_stripe_event(checkout_event(payment.session_id))
+            for payment in payments
+        ])
+        # paid payments are not counted twice
+        apply_events([to_stripe_event(checkout_event(payments[0].session_id))])
+
+        response = self.client.get(REVENUE_URL, {"months": 1})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [
+                (row["type"], row["payments"], Decimal(row["amount"]))
+                for row in response.data
+            ],
+            [("FINE", 1, Decimal("0.20")), ("PAYMENT", 2, Decimal("2.10"))],
+        )
+        self.assertEqual(response.data[0]["month"], f"{self.month:%Y-%m}")
+
+    def test_endpoints_are_served_from_the_summaries(self):
+        MonthlyCirculation.objects.create(
+            month=self.month, borrowings=10, returns=4, loan_seconds=4 * 86400 * 3
+        )
+        MonthlyCirculation.objects.create(
+            month=self.month.replace(year=self.month.year - 2), borrowings=1
+        )
+        UserMonthlyBorrowings.objects.create(
+            user=self.user, month=self.month, borrowings=7
+        )
+        UserMonthlyBorrowings.objects.create(
+            user=self.admin, month=self.month, borrowings=3
+        )
+        BookAvailability.objects.update(total_borrowings=0)
+        other = Book.objects.create(
+            title="Dune", author="Frank Herbert", cover="Soft", inventory=2,
+            daily_fee=Decimal("0.20"),
+        )
+        BookAvailability.objects.filter(book=self.book).update(total_borrowings=5)
+        BookAvailability.objects.filter(book=other).update(total_borrowings=9)
+
+        response = self.client.get(CIRCULATION_URL)
+        self.assertEqual(response.data, [{
+            "month": f"{self.month:%Y-%m}",
+            "borrowings": 10,
+            "returns": 4,
+            "average_loan_days": 3.0,
+        }])
+
+        response = self.client.get(MOST_BORROWED_URL, {"limit": 2})
+        self.assertEqual(
+            [(book["title"], book["total_borrowings"]) for book in response.data],
+            [("Dune", 9), ("Harry Potter", 5)],
+        )
+
+        response = self.client.get(
+            USER_BORROWINGS_URL, {"month": f"{self.month:%Y-%m}", "limit": 1}
+        )
+        self.assertEqual(
+            response.data,
+            [{"user_id": self.user.id, "month": f"{self.month:%Y-%m}", "borrowings": 7}],
+        )
+
+        response = self.client.get(USER_BORROWINGS_URL, {"user_id": self.admin.id})
+        self.assertEqual([row["borrowings"] for row in response.data], [3])
+
+    def test_outstanding_fines_of_the_last_accrual_run(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        overdue = self.borrow(self.user)
+        Borrowing.objects.filter(pk=overdue.pk).update(
+            expected_return_date=timezone.now() - timedelta(days=3, hours=1)
+        )
+        returned = self.borrow(self.admin)
+        Borrowing.objects.filter(pk=returned.pk).update(
+            expected_return_date=timezone.now() - timedelta(days=2, hours=1),
+            actual_return_date=timezone.now(),
+        )
+
+        response = self.client.get(OUTSTANDING_FINES_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"outstanding_fines": "0.00"})
+
+        accrue_overdue_fines()
+
+        response = self.client.get(OUTSTANDING_FINES_URL)
+        # 3 days of twice 0.10, the returned borrowing owes nothing more
+        self.assertEqual(response.data, {"outstanding_fines": "0.60"})
+
+    def test_invalid_parameters(self):
+        for url, params in [
+            (USER_BORROWINGS_URL, {}),
+            (USER_BORROWINGS_URL, {"month": "July"}),
+            (MOST_BORROWED_URL, {"limit": 1000}),
+            (CIRCULATION_URL, {"months": "all"}),
+        ]:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_analytics_are_for_the_staff_only(self):
+        self.client.force_authenticate(self.user)
+
+        for url in (
+                CIRCULATION_URL,
+                MOST_BORROWED_URL,
+                REVENUE_URL,
+                OUTSTANDING_FINES_URL,
+        ):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,27 @@
+from django.urls import path
+
+from analytics.views import (
+    CirculationView,
+    MostBorrowedBooksView,
+    OutstandingFinesView,
+    RevenueView,
+    UserBorrowingsView,
+)
+
+app_name = "analytics"
+
+urlpatterns = [
+    path(
+        "most-borrowed-books/",
+        MostBorrowedBooksView.as_view(),
+        name="most-borrowed-books",
+    ),
+    path("circulation/", CirculationView.as_view(), name="circulation"),
+    path("user-borrowings/", UserBorrowingsView.as_view(), name="user-borrowings"),
+    path("revenue/", RevenueView.as_view(), name="revenue"),
+    path(
+        "outstanding-fines/",
+        OutstandingFinesView.as_view(),
+        name="outstanding-fines",
+    ),
+]
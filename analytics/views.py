@@ -0,0 +1,174 @@
+from datetime import date, datetime
+
+from django.utils import timezone
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from rest_framework import generics
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from analytics.models import MonthlyCirculation, MonthlyRevenue, UserMonthlyBorrowings
+from analytics.serializers import (
+    MonthlyCirculationSerializer,
+    MonthlyRevenueSerializer,
+    MostBorrowedBookSerializer,
+    OutstandingFinesSerializer,
+    UserMonthlyBorrowingsSerializer,
+)
+from books.models import BookAvailability
+from borrowings.fines import outstanding_fines
+from user.authentication import StatelessJWTAuthentication
+
+MAX_LIMIT = 100
+MAX_MONTHS = 120
+
+LIMIT_PARAMETER = OpenApiParameter(
+    name="limit",
+    description=f"Number of rows, at most {MAX_LIMIT} (ex. ?limit=10).",
+    required=False,
+    type=int,
+)
+MONTHS_PARAMETER = OpenApiParameter(
+    name="months",
+    description=(
+        f"Number of months up to the current one, at most {MAX_MONTHS} "
+        "(ex. ?months=12)."
+    ),
+    required=False,
+    type=int,
+)
+
+
+class AnalyticsView(generics.ListAPIView):
+    """
+    Analytics for the staff, read from the summary tables with index
+    range scans, so they take as long for any size of the library
+    """
+    permission_classes = (IsAdminUser,)
+    authentication_classes = (StatelessJWTAuthentication,)
+    pagination_class = None
+
+    def bounded(self, name: str, default: int, maximum: int) -> int:
+        value = self.request.query_params.get(name, default)
+
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise ValidationError({name: "A whole number is required."})
+
+        if not 1 <= value <= maximum:
+            raise ValidationError({name: f"Must be between 1 and {maximum}."})
+
+        return value
+
+    def first_month(self) -> date:
+        """First day of the earliest of the requested months"""
+        months = self.bounded("months", 12, MAX_MONTHS)
+        today = timezone.localdate()
+        month = today.year * 12 + today.month - months
+
+        return date(month // 12, month % 12 + 1, 1)
+
+
+@extend_schema(
+    description="Most borrowed books of all time endpoint",
+    parameters=[LIMIT_PARAMETER],
+)
+class MostBorrowedBooksView(AnalyticsView):
+    serializer_class = MostBorrowedBookSerializer
+
+    def get_queryset(self):
+        return BookAvailability.objects.select_related("book").order_by(
+            "-total_borrowings", "book_id"
+        )[:self.bounded("limit", 10, MAX_LIMIT)]
+
+
+@extend_schema(
+    description="Borrowings, returns and average loan length by month endpoint",
+    parameters=[MONTHS_PARAMETER],
+)
+class CirculationView(AnalyticsView):
+    serializer_class = MonthlyCirculationSerializer
+
+    def get_queryset(self):
+        return MonthlyCirculation.objects.filter(
+            month__gte=self.first_month()
+        ).order_by("-month")
+
+
+@extend_schema(
+    description=(
+        "Borrowings of a user by month, or the users who borrowed "
+        "the most in a month endpoint"
+    ),
+    parameters=[
+        OpenApiParameter(
+            name="user_id",
+            description="Borrowings of the user by month (ex. ?user_id=1).",
+            required=False,
+            type=int,
+        ),
+        OpenApiParameter(
+            name="month",
+            description="Users who borrowed the most in the month (ex. ?month=2023-07).",
+            required=False,
+            type=str,
+        ),
+        MONTHS_PARAMETER,
+        LIMIT_PARAMETER,
+    ],
+)
+class UserBorrowingsView(AnalyticsView):
+    serializer_class = UserMonthlyBorrowingsSerializer
+
+    def get_queryset(self):
+        user_id = self.request.query_params.get("user_id")
+        month = self.request.query_params.get("month")
+
+        if user_id:
+            if not user_id.isdigit():
+                raise ValidationError({"user_id": "A whole number is required."})
+
+            return UserMonthlyBorrowings.objects.filter(
+                user_id=user_id, month__gte=self.first_month()
+            ).order_by("-month")
+
+        if month:
+            try:
+                month = datetime.strptime(month, "%Y-%m").date()
+            except ValueError:
+                raise ValidationError({"month": "The format is YYYY-MM."})
+
+            return UserMonthlyBorrowings.objects.filter(month=month).order_by(
+                "-borrowings", "user_id"
+            )[:self.bounded("limit", 10, MAX_LIMIT)]
+
+        raise ValidationError("Either user_id or month is required.")
+
+
+@extend_schema(
+    description="Paid payments and fines by month endpoint",
+    parameters=[MONTHS_PARAMETER],
+)
+class RevenueView(AnalyticsView):
+    serializer_class = MonthlyRevenueSerializer
+
+    def get_queryset(self):
+        return MonthlyRevenue.objects.filter(
+            month__gte=self.first_month()
+        ).order_by("-month", "type")
+
+
+@extend_schema(
+    description=(
+        "Fines accrued by the borrowings that are not returned yet, "
+        "as of the last accrual run endpoint"
+    ),
+    responses=OutstandingFinesSerializer,
+)
+class OutstandingFinesView(AnalyticsView):
+    serializer_class = OutstandingFinesSerializer
+
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer({"outstanding_fines": outstanding_fines()})
+        return Response(serializer.data)
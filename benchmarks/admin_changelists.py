@@ -0,0 +1,143 @@
+"""
+Admin pages of borrowings and payments on a synthetic data set.
+
+Seeds ``--rows`` books, borrowings and payments like
+``benchmarks/list_endpoints.py`` and measures the changelists, filtered
+changelists and change form of the admin classes against the default
+ModelAdmin they replace, whose change form renders every book and user
+(only up to ``--legacy-max`` rows). Then returns ``--returns``
+borrowings with the mark-returned action and one by one like the return
+endpoint.
+
+    python -m benchmarks.admin_changelists --rows 1000000 --returns 1000
+"""
+import argparse
+import time
+from unittest.mock import patch
+
+from benchmarks.common import percentile, print_table, setup_django, teardown_django
+from benchmarks.list_endpoints import seed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--returns", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--legacy-max", type=int, default=100_000)
+    args = parser.parse_args()
+
+    old_config = setup_django()
+
+    from django.contrib import admin
+    from django.contrib.admin import helpers
+    from django.contrib.auth import get_user_model
+    from django.db.models import Max
+    from django.test import Client, RequestFactory, override_settings
+    from django.urls import reverse
+
+    from borrowings.models import Borrowing, Payment
+    from borrowings.returns import close_borrowing
+
+    rows = []
+    returns = []
+    try:
+        seed(args.rows)
+        user = get_user_model().objects.create_superuser(
+            "admin@bench.com", "password"
+        )
+        client = Client()
+        client.force_login(user)
+        last_id = str(Borrowing.objects.aggregate(last=Max("id"))["last"])
+        # page, model, view arguments, query of the admin classes and of
+        # the default ModelAdmin
+        pages = [
+            ("borrowings", Borrowing, (), {}, {}),
+            (
+                "active borrowings",
+                Borrowing,
+                (),
+                {"state": "active"},
+                {"actual_return_date__isnull": "True"},
+            ),
+            (
+                "pending payments",
+                Payment,
+                (),
+                {"status__exact": "PENDING"},
+                {"status__exact": "PENDING"},
+            ),
+            ("borrowing change form", Borrowing, (last_id,), {}, {}),
+        ]
+
+        def latencies(model_admin, view_args, params) -> dict:
+            view = model_admin.change_view if view_args else model_admin.changelist_view
+            measured = []
+
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                request = RequestFactory().get("/", params)
+                request.user = user
+                response = view(request, *view_args)
+                response.render()
+                measured.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, response.status_code
+
+            return {
+                "p50_ms": percentile(measured, 50),
+                "p99_ms": percentile(measured, 99),
+            }
+
+        for page, model, view_args, params, _ in pages:
+            rows.append({
+                "admin": "admin classes",
+                "page": page,
+                **latencies(admin.site._registry[model], view_args, params),
+            })
+
+        for page, model, view_args, _, params in pages:
+            if view_args and args.rows > args.legacy_max:
+                continue
+
+            rows.append({
+                "admin": "default ModelAdmin (before)",
+                "page": page,
+                **latencies(admin.ModelAdmin(model, admin.site), view_args, params),
+            })
+
+        active = Borrowing.objects.filter(
+            actual_return_date__isnull=True
+        ).order_by("id")
+        selected = list(active.values_list("id", flat=True)[:args.returns])
+        started = time.perf_counter()
+        # more ids than a changelist page has, the fixture borrowings
+        # are overdue and get fines
+        with override_settings(DATA_UPLOAD_MAX_NUMBER_FIELDS=None), \
+                patch("borrowings.tasks.create_payment_session.delay"):
+            response = client.post(
+                reverse("admin:borrowings_borrowing_changelist"),
+                {"action": "mark_returned", helpers.ACTION_CHECKBOX_NAME: selected},
+            )
+        assert response.status_code == 302, response.status_code
+        returns.append({
+            "returns": "mark-returned action",
+            "ms": (time.perf_counter() - started) * 1000,
+        })
+
+        borrowings = list(active.select_related("book_id")[:args.returns])
+        started = time.perf_counter()
+        for borrowing in borrowings:
+            close_borrowing(borrowing)
+        returns.append({
+            "returns": "one by one (before)",
+            "ms": (time.perf_counter() - started) * 1000,
+        })
+    finally:
+        teardown_django(old_config)
+
+    print_table(f"Admin pages, {args.rows} rows per table", rows)
+    print_table(f"Returning {args.returns} borrowings", returns)
+
+
+if __name__ == "__main__":
+    main()
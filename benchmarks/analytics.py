@@ -0,0 +1,191 @@
+"""
+Analytics endpoints on a synthetic data set.
+
+Seeds ``--rows`` borrowings over the last two years with SQL, most of
+them returned and each with a paid payment, times the refresh that folds
+them all into the summaries and one that folds ``--new`` more, then
+measures the latency of every analytics endpoint against the ad-hoc
+``GROUP BY`` query over the borrowings and payments it replaces.
+
+    python -m benchmarks.analytics --rows 1000000 --new 10000
+"""
+import argparse
+import time
+
+from benchmarks.common import percentile, print_table, setup_django, teardown_django
+
+AD_HOC = {
+    "most-borrowed-books": (
+        "SELECT book_id_id, count(*) FROM borrowings_borrowing "
+        "GROUP BY book_id_id ORDER BY count(*) DESC LIMIT 10"
+    ),
+    "circulation": (
+        "SELECT date_trunc('month', borrow_date), count(*), "
+        "count(actual_return_date), "
+        "avg(actual_return_date - borrow_date) FROM borrowings_borrowing "
+        "WHERE borrow_date >= now() - interval '12 months' GROUP BY 1"
+    ),
+    "user-borrowings": (
+        "SELECT user_id_id, count(*) FROM borrowings_borrowing "
+        "WHERE borrow_date >= date_trunc('month', now()) "
+        "GROUP BY user_id_id ORDER BY count(*) DESC LIMIT 10"
+    ),
+    "revenue": (
+        "SELECT date_trunc('month', borrowing.borrow_date), payment.type, "
+        "count(*), sum(payment.to_pay) FROM borrowings_payment AS payment "
+        "JOIN borrowings_borrowing AS borrowing "
+        "ON borrowing.id = payment.borrowing_id_id "
+        "WHERE payment.status = 'PAID' "
+        "AND borrowing.borrow_date >= now() - interval '12 months' GROUP BY 1, 2"
+    ),
+}
+
+
+def seed(rows: int, span: str) -> None:
+    """Borrowings made over ``span`` up to now, returned before now"""
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO borrowings_borrowing (borrow_date, expected_return_date, "
+            "actual_return_date, book_id_id, user_id_id) "
+            "SELECT borrow_date, borrow_date + interval '14 days', "
+            "CASE WHEN i %% 5 > 0 AND borrow_date + loan < now() "
+            "THEN borrow_date + loan END, "
+            "(SELECT min(id) FROM books_book) + i %% 10000, "
+            "(SELECT min(id) FROM user_user) + i %% 10000 "
+            "FROM (SELECT i, now() - random() * %s::interval AS borrow_date, "
+            "random() * interval '30 days' AS loan "
+            "FROM generate_series(1, %s::bigint) i) AS borrowing",
+            [span, rows],
+        )
+        cursor.execute(
+            "INSERT INTO borrowings_payment (status, type, session_url, "
+            "session_id, to_pay, borrowing_id_id) "
+            "SELECT 'PAID', CASE WHEN id % 10 = 0 THEN 'FINE' ELSE 'PAYMENT' END, "
+            "'https://checkout.stripe.com/' || id, 'cs_' || id, 7, id "
+            "FROM borrowings_borrowing WHERE id > (SELECT coalesce(max("
+            "borrowing_id_id), 0) FROM borrowings_payment)"
+        )
+        # what the borrowings would have counted in the projection
+        cursor.execute(
+            "UPDATE books_bookavailability AS availability "
+            "SET total_borrowings = counted.total FROM (SELECT book_id_id, "
+            "count(*) AS total FROM borrowings_borrowing GROUP BY 1) AS counted "
+            "WHERE counted.book_id_id = availability.book_id"
+        )
+        cursor.execute("ANALYZE")
+
+
+def timed(func) -> tuple:
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--new", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    old_config = setup_django()
+
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test import override_settings
+    from rest_framework import status
+    from rest_framework.test import APIClient
+
+    from analytics.models import MonthlyRevenue
+    from analytics.tasks import refresh_analytics
+    from books.availability import create_availability
+    from books.models import Book
+
+    rows = []
+    refreshes = []
+    try:
+        get_user_model().objects.bulk_create(
+            get_user_model()(email=f"reader{i}@library.com") for i in range(10_000)
+        )
+        Book.objects.bulk_create(
+            Book(
+                title=f"Book {i}", author="Author", cover="Hard",
+                inventory=10, daily_fee=1,
+            )
+            for i in range(10_000)
+        )
+        create_availability(list(Book.objects.values_list("id", flat=True)))
+        seed(args.rows, "730 days")
+
+        with override_settings(ANALYTICS_COMMIT_MARGIN=0):
+            batches, seconds = timed(refresh_analytics)
+            refreshes.append({
+                "refresh": f"first, {args.rows} borrowings",
+                "batches": batches,
+                "seconds": seconds,
+            })
+            seed(args.new, "1 hour")
+            batches, seconds = timed(refresh_analytics)
+            refreshes.append({
+                "refresh": f"incremental, {args.new} borrowings",
+                "batches": batches,
+                "seconds": seconds,
+            })
+
+        # revenue is recorded by the payments as they are paid
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {MonthlyRevenue._meta.db_table} "
+                "(month, type, payments, amount) "
+                "SELECT date_trunc('month', borrowing.borrow_date)::date, "
+                "payment.type, count(*), sum(payment.to_pay) "
+                "FROM borrowings_payment AS payment "
+                "JOIN borrowings_borrowing AS borrowing "
+                "ON borrowing.id = payment.borrowing_id_id GROUP BY 1, 2"
+            )
+
+        client = APIClient()
+        client.force_authenticate(
+            get_user_model().objects.create_superuser("admin@bench.com", "password")
+        )
+        month = time.strftime("%Y-%m")
+        params = {"user-borrowings": {"month": month}}
+
+        def latencies(func) -> dict:
+            func()
+            measured = []
+
+            for _ in range(args.repeat):
+                _, seconds = timed(func)
+                measured.append(seconds * 1000)
+
+            return {
+                "p50_ms": percentile(measured, 50),
+                "p99_ms": percentile(measured, 99),
+            }
+
+        for endpoint, query in AD_HOC.items():
+            def get():
+                response = client.get(
+                    f"/api/analytics/{endpoint}/", params.get(endpoint, {})
+                )
+                assert response.status_code == status.HTTP_200_OK, response.data
+
+            def ad_hoc():
+                with connection.cursor() as cursor:
+                    cursor.execute(query)
+                    cursor.fetchall()
+
+            rows.append({"endpoint": endpoint, "case": "summary", **latencies(get)})
+            rows.append({"endpoint": endpoint, "case": "ad-hoc GROUP BY", **latencies(ad_hoc)})
+    finally:
+        teardown_django(old_config)
+
+    print_table(f"Analytics refresh, {args.rows} borrowings", refreshes)
+    print_table(f"Analytics endpoints, {args.rows} borrowings", rows)
+
+
+if __name__ == "__main__":
+    main()
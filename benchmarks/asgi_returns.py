@@ -0,0 +1,226 @@
+"""
+Late returns on the WSGI and the ASGI deployment under provider latency.
+
+Every return creates a fine and waits for its Stripe session on a local
+fake Stripe server answering after ``--latency`` ms. The project is
+served by a WSGI server with ``--wsgi-threads`` threads, like a gunicorn
+worker, and by one uvicorn process running the async views, and a client
+process keeps ``--concurrency`` returns in flight against each of them.
+Reports the peak number of database connections of every run.
+
+    python -m benchmarks.asgi_returns --latency 2000 --concurrency 200 1000
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import percentile, print_table, setup_django, teardown_django
+from benchmarks.fake_stripe import FakeStripeServer
+
+
+def serve_stripe(latency: float, ports) -> None:
+    """Fake Stripe of its own process, so it does not compete for the GIL"""
+    server = FakeStripeServer(latency=latency)
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+def drive(base_url: str, borrowing_ids: list[int], token: str, concurrency: int) -> dict:
+    """Posts a return of every borrowing, ``concurrency`` at a time"""
+    import httpx
+
+    async def run():
+        queue = asyncio.Queue()
+        for borrowing_id in borrowing_ids:
+            queue.put_nowait(borrowing_id)
+
+        latencies, statuses = [], []
+        client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {token}"},
+            limits=httpx.Limits(max_connections=concurrency),
+            timeout=120,
+        )
+
+        async def worker():
+            while not queue.empty():
+                borrowing_id = queue.get_nowait()
+                started = time.perf_counter()
+                try:
+                    response = await client.post(
+                        f"/api/borrowings/borrowings/{borrowing_id}/return/"
+                    )
+                    statuses.append(response.status_code)
+                except httpx.HTTPError:
+                    statuses.append(0)
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        seconds = time.perf_counter() - started
+        await client.aclose()
+
+        return {
+            "per_second": len(borrowing_ids) / seconds,
+            "p50": percentile(latencies, 50),
+            "p99": percentile(latencies, 99),
+            "mean": statistics.fmean(latencies),
+            "ok": statuses.count(200),
+            "errors": len(statuses) - statuses.count(200),
+        }
+
+    return asyncio.run(run())
+
+
+def peak_connections(stop: threading.Event, peak: list[int]) -> None:
+    """Highest number of connections to the database until ``stop`` is set"""
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        while not stop.wait(0.02):
+            cursor.execute(
+                "SELECT count(*) FROM pg_stat_activity"
+                " WHERE datname = current_database()"
+            )
+            # without the connection of this thread
+            peak[0] = max(peak[0], cursor.fetchone()[0] - 1)
+
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=500, help="ms")
+    parser.add_argument("--calls", type=int, default=1_000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--wsgi-threads", type=int, default=32)
+    args = parser.parse_args()
+
+    processes = multiprocessing.get_context("spawn")
+    ports = processes.Queue()
+    stripe = processes.Process(
+        target=serve_stripe, args=(args.latency, ports), daemon=True
+    )
+    stripe.start()
+    os.environ.update({
+        "STRIPE_API_BASE": f"http://127.0.0.1:{ports.get()}",
+        "STRIPE_API_KEY": os.getenv("STRIPE_API_KEY") or "sk_test_load",
+    })
+    old_config = setup_django()
+    import uvicorn
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer
+    from django.utils import timezone
+
+    from books.models import Book
+    from borrowings.models import Borrowing, Payment
+    from library_project.asgi import application
+    from user.serializers import TokenObtainPairSerializer
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    class PooledWSGIServer(WSGIServer):
+        """Answers on a fixed pool of threads, like gunicorn --threads"""
+
+        request_queue_size = 4096
+
+        def __init__(self, address, threads):
+            super().__init__(address, QuietHandler)
+            self.executor = ThreadPoolExecutor(threads)
+
+        def process_request(self, request, client_address):
+            self.executor.submit(self.process, request, client_address)
+
+        def process(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    settings.ALLOWED_HOSTS = ["127.0.0.1"]
+    wsgi = PooledWSGIServer(("127.0.0.1", 0), args.wsgi_threads)
+    wsgi.set_app(WSGIHandler())
+    asgi = uvicorn.Server(uvicorn.Config(
+        application, host="127.0.0.1", port=0, lifespan="off",
+        log_level="warning", backlog=4096,
+    ))
+    asgi_thread = threading.Thread(target=asgi.run, daemon=True)
+    threading.Thread(target=wsgi.serve_forever, daemon=True).start()
+    asgi_thread.start()
+
+    rows = []
+    try:
+        while not asgi.started:
+            time.sleep(0.05)
+
+        deployments = {
+            f"WSGI, {args.wsgi_threads} threads":
+                f"http://127.0.0.1:{wsgi.server_address[1]}",
+            "ASGI, 1 process":
+                f"http://127.0.0.1:{asgi.servers[0].sockets[0].getsockname()[1]}",
+        }
+        user = get_user_model().objects.create_user("bench@library.com", "password")
+        token = str(TokenObtainPairSerializer.get_token(user).access_token)
+        book = Book.objects.create(
+            title="Book", author="Bench", cover="Hard", inventory=0, daily_fee=1
+        )
+        client = processes.Pool(1)
+
+        for concurrency in args.concurrency:
+            for deployment, url in deployments.items():
+                borrowings = Borrowing.objects.bulk_create(
+                    Borrowing(
+                        book_id=book,
+                        user_id=user,
+                        expected_return_date=timezone.now() - timezone.timedelta(days=3),
+                    )
+                    for _ in range(args.calls)
+                )
+                stop, peak = threading.Event(), [0]
+                sampler = threading.Thread(target=peak_connections, args=(stop, peak))
+                sampler.start()
+                result = client.apply(
+                    drive,
+                    (url, [borrowing.id for borrowing in borrowings], token, concurrency),
+                )
+                stop.set()
+                sampler.join()
+                rows.append({
+                    "deployment": deployment,
+                    "in_flight": concurrency,
+                    **result,
+                    "sessions": Payment.objects.filter(
+                        borrowing_id__in=borrowings, session_id__isnull=False
+                    ).count(),
+                    "connections": peak[0],
+                })
+
+        client.close()
+    finally:
+        asgi.should_exit = True
+        asgi_thread.join()
+        wsgi.shutdown()
+        wsgi.executor.shutdown()
+        wsgi.server_close()
+        stripe.terminate()
+        teardown_django(old_config)
+
+    print_table(
+        f"Late returns, {args.calls} per run, provider latency {args.latency:.0f} ms",
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Book search latency on a synthetic catalog.
+
+Seeds ``--books`` books with SQL, then measures p50/p99 latency of the
+first page (20 results) of indexed search for exact, typo and author
+terms, compared with a client-side style ``icontains`` scan.
+
+    python -m benchmarks.book_search --books 1000000
+"""
+import argparse
+import random
+import string
+import time
+
+from benchmarks.common import percentile, print_table, setup_django, teardown_django
+
+def vocabulary(size: int = 20_000) -> list[str]:
+    """Deterministic made-up words of 4 to 10 letters"""
+    generator = random.Random(42)
+    return [
+        "".join(
+            generator.choice(string.ascii_lowercase)
+            for _ in range(generator.randint(4, 10))
+        ).capitalize()
+        for _ in range(size)
+    ]
+
+
+WORDS = vocabulary()
+
+TERMS = {
+    "exact word": WORDS[1234],
+    "two words": f"{WORDS[42]} {WORDS[42 * 7919 % 20000]}",
+    "typo": WORDS[2345][:-1] + "x",
+    "author": WORDS[777 * 15485863 % 20000],
+    "author typo": WORDS[777 * 15485863 % 20000][1:],
+}
+
+
+def seed(books: int) -> None:
+    """
+    Titles are three words of the vocabulary and authors an initial with
+    a surname from it, so each word is in about a hundred books.
+    Search indexes are rebuilt after the insert, which is much faster
+    than updating them row by row.
+    """
+    from django.db import connection
+
+    from books.models import Book
+
+    with connection.schema_editor() as schema_editor:
+        for index in Book._meta.indexes:
+            schema_editor.remove_index(Book, index)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO books_book (title, author, cover, inventory, daily_fee) "
+            "SELECT w[1 + i %% 20000] || ' ' || w[1 + (i * 7919) %% 20000] || ' ' "
+            "|| w[1 + (i * 104729) %% 20000], "
+            "chr(65 + (i %% 26)::int) || '. ' || w[1 + (i * 15485863) %% 20000], "
+            "CASE WHEN i %% 2 = 0 THEN 'Hard' ELSE 'Soft' END, i %% 4, 1 "
+            "FROM generate_series(1, %s::bigint) i, (SELECT %s::text[] AS w) words",
+            [books, WORDS],
+        )
+
+    with connection.schema_editor() as schema_editor:
+        for index in Book._meta.indexes:
+            schema_editor.add_index(Book, index)
+
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE books_book")
+
+
+def measure(func, repeat: int) -> dict:
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return {"p50": percentile(latencies, 50), "p99": percentile(latencies, 99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--scan-repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    old_config = setup_django()
+
+    from django.db.models import Q
+
+    from books.models import Book
+    from books.search import search_books
+
+    rows = []
+    try:
+        started = time.perf_counter()
+        seed(args.books)
+        print(f"Seeded {args.books} books in {time.perf_counter() - started:.1f}s")
+
+        for name, term in TERMS.items():
+            def search():
+                return list(search_books(Book.objects.all(), term)[:20])
+
+            def scan():
+                return list(
+                    Book.objects.filter(
+                        Q(title__icontains=term) | Q(author__icontains=term)
+                    )[:20]
+                )
+
+            rows.append({
+                "query": f"{name} ({term})",
+                "found": len(search()),
+                **{f"search_{k}": v for k, v in measure(search, args.repeat).items()},
+                **{f"icontains_{k}": v for k, v in measure(scan, args.scan_repeat).items()},
+            })
+    finally:
+        teardown_django(old_config)
+
+    print_table(f"Book search latency, ms, {args.books} books", rows)
+
+
+if __name__ == "__main__":
+    main()
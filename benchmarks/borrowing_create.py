@@ -0,0 +1,120 @@
+"""
+Borrowing create throughput on a single hot book.
+
+Compares the legacy flow (Stripe session created inside the transaction
+that holds the book row lock) with creating the session after commit and
+with the deferred Celery mode. Stripe is replaced with a stub that sleeps
+for ``--stripe-latency`` milliseconds.
+
+    python -m benchmarks.borrowing_create --calls 200 --workers 16
+"""
+import argparse
+import itertools
+import time
+from unittest.mock import patch
+
+from benchmarks.common import (
+    print_table,
+    run_concurrently,
+    setup_django,
+    teardown_django,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--stripe-latency", type=float, default=150)
+    args = parser.parse_args()
+
+    old_config = setup_django()
+
+    from django.contrib.auth import get_user_model
+    from django.db import transaction
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+
+    from books.models import Book
+    from borrowings.models import Borrowing, Payment
+    from borrowings.serializers import BorrowingSerializer
+    from borrowings.stripe import attach_stripe_session, calculate_borrowing_price
+
+    session_ids = itertools.count()
+
+    def fake_session_create(**kwargs):
+        time.sleep(args.stripe_latency / 1000)
+        session_id = f"cs_bench_{next(session_ids)}"
+        return {
+            "id": session_id,
+            "url": f"https://checkout.stripe.test/{session_id}",
+            "amount_total": kwargs["line_items"][0]["price_data"]["unit_amount"],
+        }
+
+    @transaction.atomic()
+    def legacy_create(self, validated_data):
+        validated_data["book_id"].inventory -= 1
+        validated_data["book_id"].save()
+        borrowing = Borrowing.objects.create(**validated_data)
+        payment = Payment.objects.create(
+            status="PENDING",
+            type="PAYMENT",
+            borrowing_id=borrowing,
+            to_pay=calculate_borrowing_price(borrowing),
+        )
+        attach_stripe_session(payment)
+        return borrowing
+
+    user = get_user_model().objects.create_user("bench@library.com", "password")
+    book = Book.objects.create(
+        title="Hot book",
+        author="Bench",
+        cover="Hard",
+        inventory=10 ** 6,
+        daily_fee=1,
+    )
+
+    def borrow():
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post(
+            "/api/borrowings/borrowings/",
+            {"expected_return_date": "2099-01-01", "book_id": book.id},
+        )
+        assert response.status_code == 201, response.content
+
+    modes = {
+        "legacy (session in transaction)": (
+            patch.object(BorrowingSerializer, "create", legacy_create),
+            override_settings(STRIPE_DEFERRED_SESSION=False),
+        ),
+        "session after commit": (
+            patch.object(BorrowingSerializer, "create", BorrowingSerializer.create),
+            override_settings(STRIPE_DEFERRED_SESSION=False),
+        ),
+        "deferred (celery)": (
+            patch("borrowings.tasks.create_payment_session.delay"),
+            override_settings(STRIPE_DEFERRED_SESSION=True),
+        ),
+    }
+
+    rows = []
+    try:
+        with patch("stripe.checkout.Session.create", fake_session_create), \
+                patch("borrowings.serializers.send_borrowing_create_message"):
+            for name, (serializer_patch, settings_override) in modes.items():
+                with serializer_patch, settings_override:
+                    result = run_concurrently(borrow, args.calls, args.workers)
+                rows.append({"mode": name, **result})
+    finally:
+        teardown_django(old_config)
+
+    print_table(
+        f"Borrowing create on one book, {args.workers} workers, "
+        f"Stripe latency {args.stripe_latency:.0f} ms",
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
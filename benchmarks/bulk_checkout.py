@@ -0,0 +1,125 @@
+"""
+Borrowing a basket of books one by one and with the bulk checkout.
+
+For every basket size posts one borrowing per book to
+``/api/borrowings/borrowings/`` and one request with all books to
+``/api/borrowings/borrowings/checkout/``, and reports the latency of the
+whole basket, database queries and external calls (Stripe sessions and
+admin notifications). Stripe is replaced with a stub that sleeps for
+``--stripe-latency`` milliseconds.
+
+    python -m benchmarks.bulk_checkout --baskets 1 2 5 10 20 --repeat 20
+"""
+import argparse
+import itertools
+import time
+from unittest.mock import patch
+
+from benchmarks.common import percentile, print_table, setup_django, teardown_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--baskets", type=int, nargs="+", default=[1, 2, 5, 10, 20])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--stripe-latency", type=float, default=150)
+    args = parser.parse_args()
+
+    old_config = setup_django()
+
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIClient
+
+    from books.models import Book
+
+    session_ids = itertools.count()
+    calls = {"stripe": 0, "notifications": 0}
+
+    def fake_session_create(**kwargs):
+        calls["stripe"] += 1
+        time.sleep(args.stripe_latency / 1000)
+        session_id = f"cs_bench_{next(session_ids)}"
+        return {
+            "id": session_id,
+            "url": f"https://checkout.stripe.test/{session_id}",
+            "amount_total": sum(
+                item["price_data"]["unit_amount"] for item in kwargs["line_items"]
+            ),
+        }
+
+    def fake_send_notification(message):
+        calls["notifications"] += 1
+
+    rows = []
+    try:
+        user = get_user_model().objects.create_user("bench@library.com", "password")
+        books = Book.objects.bulk_create(
+            Book(
+                title=f"Book {number}",
+                author="Bench",
+                cover="Hard",
+                inventory=10 ** 6,
+                daily_fee=1,
+            )
+            for number in range(max(args.baskets))
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+
+        def one_by_one(basket):
+            for book in basket:
+                response = client.post(
+                    "/api/borrowings/borrowings/",
+                    {"expected_return_date": "2099-01-01", "book_id": book.id},
+                )
+                assert response.status_code == 201, response.content
+
+        def checkout(basket):
+            response = client.post(
+                "/api/borrowings/borrowings/checkout/",
+                {
+                    "expected_return_date": "2099-01-01",
+                    "books": [book.id for book in basket],
+                },
+                format="json",
+            )
+            assert response.status_code == 201, response.content
+
+        with patch("stripe.checkout.Session.create", fake_session_create), \
+                patch("borrowings.notification.send_notification", fake_send_notification):
+            for size in args.baskets:
+                basket = books[:size]
+
+                for mode, borrow in (("one by one", one_by_one), ("checkout", checkout)):
+                    latencies = []
+                    calls.update(stripe=0, notifications=0)
+
+                    with CaptureQueriesContext(connection) as queries:
+                        for _ in range(args.repeat):
+                            started = time.perf_counter()
+                            borrow(basket)
+                            latencies.append((time.perf_counter() - started) * 1000)
+
+                    rows.append({
+                        "books": size,
+                        "mode": mode,
+                        "p50": percentile(latencies, 50),
+                        "p99": percentile(latencies, 99),
+                        "queries": len(queries) / args.repeat,
+                        "stripe_calls": calls["stripe"] / args.repeat,
+                        "notifications": calls["notifications"] / args.repeat,
+                    })
+    finally:
+        teardown_django(old_config)
+
+    print_table(
+        f"Basket checkout, Stripe latency {args.stripe_latency:.0f} ms, "
+        f"per basket",
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
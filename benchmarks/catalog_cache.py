@@ -0,0 +1,91 @@
+"""
+Catalog cache under a read-mostly mix.
+
+Seeds ``--books`` books and replays ``--calls`` requests on ``--workers``
+threads: skewed detail and list page reads with ``--borrow-ratio`` of
+them taking and returning a copy, with the cache disabled and enabled.
+Uses Redis when REDIS_URL is set, the local memory cache otherwise.
+
+    REDIS_URL=redis://localhost:6379/0 python -m benchmarks.catalog_cache
+"""
+import argparse
+import random
+from unittest.mock import patch
+
+from benchmarks.common import print_table, run_concurrently, setup_django, teardown_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=10_000)
+    parser.add_argument("--calls", type=int, default=5_000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--borrow-ratio", type=float, default=0.05)
+    args = parser.parse_args()
+
+    old_config = setup_django()
+
+    from django.core.cache import cache as django_cache
+    from django.db import connection, transaction
+    from rest_framework.test import APIClient
+
+    from books import cache
+    from books.inventory import return_copy, take_copy
+    from books.models import Book
+
+    rows = []
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO books_book (title, author, cover, inventory, daily_fee) "
+                "SELECT 'Book ' || i, 'Author ' || i, 'Hard', 1000000, 1 "
+                "FROM generate_series(1, %s) i",
+                [args.books],
+            )
+        book_ids = list(Book.objects.values_list("id", flat=True))
+        generator = random.Random(42)
+
+        def request():
+            client = APIClient()
+            roll = generator.random()
+            # a few popular books get most of the traffic
+            book_id = book_ids[int(generator.paretovariate(1.2)) % len(book_ids)]
+
+            if roll < args.borrow_ratio:
+                book = Book(id=book_id, title="")
+                with transaction.atomic():
+                    take_copy(book)
+                with transaction.atomic():
+                    return_copy(book)
+            elif roll < 0.7:
+                client.get(f"/api/books/books/{book_id}/")
+            else:
+                client.get("/api/books/books/", {"cover": "Hard"})
+
+        def no_cache(key, compute, timeout):
+            return compute()
+
+        with patch.object(cache, "read_through", no_cache):
+            rows.append({
+                "mode": "no cache",
+                **run_concurrently(request, args.calls, args.workers),
+                "hit_ratio": 0.0,
+            })
+
+        django_cache.clear()
+        rows.append({
+            "mode": "catalog cache",
+            **run_concurrently(request, args.calls, args.workers),
+            "hit_ratio": cache.get_stats()["hit_ratio"],
+        })
+    finally:
+        teardown_django(old_config)
+
+    print_table(
+        f"Catalog reads, {args.books} books, {args.borrow_ratio:.0%} borrow/return",
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Helpers shared by the benchmark scripts.
+
+Benchmarks run against a throwaway test database created the same way
+``manage.py test`` does, so they never touch the real data. Run them
+from the project root, e.g. ``python -m benchmarks.borrowing_create``.
+"""
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+
+
+def setup_django():
+    """Configures Django and creates the test database"""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "library_project.settings")
+    django.setup()
+
+    from django.test.utils import setup_databases, setup_test_environment
+
+    setup_test_environment(debug=False)
+    return setup_databases(verbosity=0, interactive=False)
+
+
+def teardown_django(old_config) -> None:
+    """Destroys the test database created by setup_django"""
+    from django.test.utils import teardown_databases, teardown_test_environment
+
+    teardown_databases(old_config, verbosity=0)
+    teardown_test_environment()
+
+
+def percentile(values: list, percent: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_concurrently(func, calls: int, workers: int) -> dict:
+    """
+    Runs ``func`` ``calls`` times on ``workers`` threads and returns
+    throughput and latency statistics in milliseconds
+    """
+    from django.db import connection
+
+    latencies = []
+    lock = threading.Lock()
+
+    def timed(_):
+        started = time.perf_counter()
+        try:
+            func()
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies.append(elapsed)
+            connection.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(timed, range(calls)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "calls": calls,
+        "seconds": elapsed,
+        "per_second": calls / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "mean": statistics.mean(latencies),
+    }
+
+
+def print_table(title: str, rows: list[dict]) -> None:
+    """Prints a list of result dicts as an aligned text table"""
+    if not rows:
+        return
+
+    columns = list(rows[0])
+    cells = [
+        [
+            f"{row[column]:.2f}" if isinstance(row[column], float) else str(row[column])
+            for column in columns
+        ]
+        for row in rows
+    ]
+    widths = [
+        max(len(column), *(len(line[i]) for line in cells))
+        for i, column in enumerate(columns)
+    ]
+
+    print(f"\n{title}")
+    print("  ".join(column.ljust(widths[i]) for i, column in enumerate(columns)))
+    for line in cells:
+        print("  ".join(cell.ljust(widths[i]) for i, cell in enumerate(line)))
@@ -0,0 +1,80 @@
+"""
+Conditional GETs of books and borrowings on a synthetic data set.
+
+Seeds ``--rows`` books, borrowings and payments like
+``benchmarks/list_endpoints.py`` and replays a client refreshing the
+books list, a book, its borrowings list and a borrowing ``--repeat``
+times: without validators, as every refresh was answered before, and
+with the ETag of the previous response in If-None-Match, answered with
+304 Not Modified while nothing changed.
+
+    python -m benchmarks.conditional_get --rows 1000000
+"""
+import argparse
+import time
+
+from benchmarks.common import percentile, print_table, setup_django, teardown_django
+from benchmarks.list_endpoints import seed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    old_config = setup_django()
+
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    from borrowings.models import Borrowing
+
+    rows = []
+    try:
+        seed(args.rows)
+        borrowing = Borrowing.objects.select_related("user_id").order_by("-id").first()
+        client = APIClient()
+        client.force_authenticate(borrowing.user_id)
+        urls = [
+            ("books list", reverse("books:book-list")),
+            ("book", reverse("books:book-detail", args=[borrowing.book_id_id])),
+            ("borrowings list", reverse("borrowings:borrowing-list")),
+            ("borrowing", reverse("borrowings:borrowing-detail", args=[borrowing.id])),
+        ]
+
+        for endpoint, url in urls:
+            etag = client.get(url)["ETag"]
+
+            for refresh, headers in [
+                ("unconditional (before)", {}),
+                ("If-None-Match", {"HTTP_IF_NONE_MATCH": etag}),
+            ]:
+                measured = []
+                sent = 0
+                with CaptureQueriesContext(connection) as queries:
+                    for _ in range(args.repeat):
+                        started = time.perf_counter()
+                        response = client.get(url, **headers)
+                        measured.append((time.perf_counter() - started) * 1000)
+                        sent += len(response.content)
+
+                rows.append({
+                    "endpoint": endpoint,
+                    "refresh": refresh,
+                    "status": response.status_code,
+                    "bytes": sent // args.repeat,
+                    "queries": len(queries) / args.repeat,
+                    "p50_ms": percentile(measured, 50),
+                    "p99_ms": percentile(measured, 99),
+                })
+    finally:
+        teardown_django(old_config)
+
+    print_table(f"Refreshes, {args.rows} rows per table", rows)
+
+
+if __name__ == "__main__":
+    main()
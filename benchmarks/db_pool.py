@@ -0,0 +1,202 @@
+"""
+Requests/second and database connections with and without the pool.
+
+Serves the project over HTTP on a fixed pool of ``--threads`` threads,
+like a gunicorn worker, and sends ``--calls`` authenticated requests to
+``/api/borrowings/borrowings/`` from ``--workers`` client threads with a
+new connection per request, persistent connections (CONN_MAX_AGE) and
+the pooled backend (DB_POOL) of ``--pool-sizes`` connections. Reports
+the sessions opened on PostgreSQL and the peak number of connections.
+
+    python -m benchmarks.db_pool --threads 32 --pool-sizes 8 32
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import print_table, run_concurrently, setup_django, teardown_django
+
+
+def sessions(cursor) -> int:
+    """Sessions opened on the database so far"""
+    cursor.execute("SELECT pg_stat_clear_snapshot()")
+    cursor.execute(
+        "SELECT sessions FROM pg_stat_database WHERE datname = current_database()"
+    )
+    return cursor.fetchone()[0]
+
+
+def peak_connections(stop: threading.Event, peak: list[int], main_pid: int) -> None:
+    """
+    Highest number of connections to the database until ``stop`` is set,
+    without those of this and the main thread
+    """
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        while not stop.wait(0.02):
+            cursor.execute(
+                "SELECT count(*) FROM pg_stat_activity"
+                " WHERE datname = current_database()"
+                " AND pid NOT IN (pg_backend_pid(), %s)",
+                [main_pid],
+            )
+            peak[0] = max(peak[0], cursor.fetchone()[0])
+
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=5_000)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[8, 32])
+    args = parser.parse_args()
+
+    old_config = setup_django()
+
+    import requests
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer
+    from django.db import connection, connections
+    from django.utils import timezone
+
+    from books.models import Book
+    from borrowings.models import Borrowing
+    from library_project.pooled_postgresql.pool import close_pools
+    from user.serializers import TokenObtainPairSerializer
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    class PooledWSGIServer(WSGIServer):
+        """Answers on a fixed pool of threads, like gunicorn --threads"""
+
+        request_queue_size = 1024
+
+        def __init__(self, address, threads):
+            super().__init__(address, QuietHandler)
+            self.executor = ThreadPoolExecutor(threads)
+
+        def process_request(self, request, client_address):
+            self.executor.submit(self.process, request, client_address)
+
+        def process(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+        def close_connections(self, threads):
+            """Closes the persistent connection of every server thread"""
+            barrier = threading.Barrier(threads)
+
+            def close():
+                barrier.wait()
+                connection.close()
+
+            for future in [self.executor.submit(close) for _ in range(threads)]:
+                future.result()
+
+    database = connections.settings["default"]
+    plain = {key: database[key] for key in ("ENGINE", "CONN_MAX_AGE")}
+    modes = {
+        "new connection per request": {"CONN_MAX_AGE": 0},
+        "persistent, CONN_MAX_AGE=60": {"CONN_MAX_AGE": 60},
+        **{
+            f"pool, max_size={size}": {
+                "ENGINE": "library_project.pooled_postgresql",
+                "CONN_MAX_AGE": 0,
+                "OPTIONS": {
+                    **database["OPTIONS"],
+                    "pool": {"min_size": 2, "max_size": size, "timeout": 30},
+                },
+            }
+            for size in args.pool_sizes
+        },
+    }
+    options = database["OPTIONS"]
+
+    rows = []
+    try:
+        settings.ALLOWED_HOSTS = ["127.0.0.1"]
+        user = get_user_model().objects.create_user("bench@library.com", "password")
+        token = str(TokenObtainPairSerializer.get_token(user).access_token)
+        book = Book.objects.create(
+            title="Book", author="Bench", cover="Hard", inventory=0, daily_fee=1
+        )
+        Borrowing.objects.bulk_create(
+            Borrowing(
+                book_id=book, user_id=user, expected_return_date=timezone.now()
+            )
+            for _ in range(20)
+        )
+        local = threading.local()
+
+        for mode, overrides in modes.items():
+            database.update({**plain, "OPTIONS": options, **overrides})
+            server = PooledWSGIServer(("127.0.0.1", 0), args.threads)
+            server.set_app(WSGIHandler())
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            url = f"http://127.0.0.1:{server.server_address[1]}/api/borrowings/borrowings/"
+
+            def request():
+                if not hasattr(local, "session"):
+                    local.session = requests.Session()
+                    local.session.headers["Authorization"] = f"Bearer {token}"
+
+                response = local.session.get(url)
+                assert response.status_code == 200, response.status_code
+
+            with connection.cursor() as cursor:
+                sessions_before = sessions(cursor)
+                cursor.execute("SELECT pg_backend_pid()")
+                main_pid = cursor.fetchone()[0]
+
+            stop, peak = threading.Event(), [0]
+            sampler = threading.Thread(
+                target=peak_connections, args=(stop, peak, main_pid)
+            )
+            sampler.start()
+            result = run_concurrently(request, args.calls, args.workers)
+            stop.set()
+            sampler.join()
+
+            server.shutdown()
+            server.close_connections(args.threads)
+            server.executor.shutdown()
+            server.server_close()
+            close_pools()
+            # sessions are counted when they end
+            time.sleep(1)
+
+            with connection.cursor() as cursor:
+                # the sampler opened one session
+                opened = sessions(cursor) - sessions_before - 1
+
+            rows.append({
+                "mode": mode,
+                **result,
+                "sessions": opened,
+                "connections": peak[0],
+            })
+    finally:
+        database.update({**plain, "OPTIONS": options})
+        teardown_django(old_config)
+
+    print_table(
+        f"GET /api/borrowings/borrowings/, {args.calls} calls, "
+        f"{args.workers} clients, {args.threads} server threads",
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
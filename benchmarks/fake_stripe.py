@@ -0,0 +1,310 @@
+"""
+Local stand-ins for the Stripe API and its webhook deliveries.
+
+``FakeStripeServer`` answers checkout session creation with some latency
+and lists the events added with ``add_events``, point ``STRIPE_API_BASE``
+at it. ``FakeGateway`` does the same in process,
+set ``PAYMENT_GATEWAY=benchmarks.fake_stripe.FakeGateway``. The helpers below build checkout session
+events, sign them like Stripe does with the webhook secret and post them
+in bulk from several threads.
+
+    python -m benchmarks.fake_stripe --url http://127.0.0.1:8000/api/borrowings/webhooks/stripe/ \
+        --secret whsec_test --sessions cs_1 cs_2
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+UNIT_AMOUNT = re.compile(r"line_items\[(\d+)]\[price_data]\[unit_amount]")
+
+
+class FakeStripeServer(ThreadingHTTPServer):
+    """Creates checkout sessions after ``latency`` milliseconds"""
+
+    daemon_threads = True
+    request_queue_size = 4096
+
+    def __init__(self, port: int = 0, latency: float = 0):
+        super().__init__(("127.0.0.1", port), StripeHandler)
+        self.latency = latency / 1000
+        self.lock = threading.Lock()
+        self.session_ids = itertools.count(1)
+        self.calls = 0
+        # events oldest first, like they were created
+        self.events = []
+        self.event_positions = {}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "FakeStripeServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def add_events(self, events: list[dict]) -> None:
+        """Adds events created after the ones the server holds"""
+        with self.lock:
+            for event in sorted(events, key=lambda event: event["created"]):
+                self.event_positions[event["id"]] = len(self.events)
+                self.events.append(event)
+
+    def list_events(
+            self,
+            types: list[str],
+            created_gte: int,
+            starting_after: str | None,
+            limit: int,
+    ) -> dict:
+        """Page of /v1/events, newest first"""
+        with self.lock:
+            position = self.event_positions.get(starting_after, len(self.events))
+            data = []
+
+            for index in range(position - 1, -1, -1):
+                event = self.events[index]
+
+                if event["created"] < created_gte or len(data) > limit:
+                    break
+
+                if not types or event["type"] in types:
+                    data.append(event)
+
+        return {
+            "object": "list",
+            "url": "/v1/events",
+            "data": data[:limit],
+            "has_more": len(data) > limit,
+        }
+
+
+class StripeHandler(BaseHTTPRequestHandler):
+    server: FakeStripeServer
+
+    def do_GET(self):
+        url = urlparse(self.path)
+
+        if url.path != "/v1/events":
+            return self.reply(404, {"error": {"type": "invalid_request_error"}})
+
+        params = parse_qs(url.query)
+        self.reply(200, self.server.list_events(
+            types=[
+                values[0] for key, values in params.items()
+                if key.startswith("types[")
+            ],
+            created_gte=int(params.get("created[gte]", ["0"])[0]),
+            starting_after=params.get("starting_after", [None])[0],
+            limit=int(params.get("limit", ["10"])[0]),
+        ))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        params = parse_qs(self.rfile.read(length).decode())
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if urlparse(self.path).path != "/v1/checkout/sessions":
+            return self.reply(404, {"error": {"type": "invalid_request_error"}})
+
+        amount_total = 0
+        for key, values in params.items():
+            match = UNIT_AMOUNT.fullmatch(key)
+            if match:
+                quantity = params.get(f"line_items[{match[1]}][quantity]", ["1"])
+                amount_total += int(values[0]) * int(quantity[0])
+
+        with self.server.lock:
+            self.server.calls += 1
+            session_id = f"cs_fake_{next(self.server.session_ids)}"
+
+        self.reply(200, {
+            "id": session_id,
+            "object": "checkout.session",
+            "amount_total": amount_total,
+            "currency": "usd",
+            "mode": "payment",
+            "payment_status": "unpaid",
+            "url": f"{self.server.url}/pay/{session_id}",
+        })
+
+    def reply(self, code: int, payload: dict) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeGateway:
+    """
+    In-process payment gateway. A call takes ``latency`` seconds, but not
+    longer than its timeout like a real request, and fails with the
+    ``failure_rate`` probability. Benchmarks set the class attributes.
+    """
+
+    transient_errors = (TimeoutError, ConnectionError)
+    latency = 0.0
+    failure_rate = 0.0
+    calls = 0
+    lock = threading.Lock()
+
+    def create_checkout_session(
+            self,
+            line_items: list[dict],
+            success_url: str,
+            cancel_url: str,
+            idempotency_key: str,
+            timeout: float,
+    ) -> dict:
+        with FakeGateway.lock:
+            FakeGateway.calls += 1
+
+        if self.latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("payment gateway timed out")
+
+        time.sleep(self.latency)
+
+        return self._session(line_items, idempotency_key)
+
+    async def acreate_checkout_session(
+            self,
+            line_items: list[dict],
+            success_url: str,
+            cancel_url: str,
+            idempotency_key: str,
+            timeout: float,
+    ) -> dict:
+        with FakeGateway.lock:
+            FakeGateway.calls += 1
+
+        if self.latency > timeout:
+            await asyncio.sleep(timeout)
+            raise TimeoutError("payment gateway timed out")
+
+        await asyncio.sleep(self.latency)
+
+        return self._session(line_items, idempotency_key)
+
+    def _session(self, line_items: list[dict], idempotency_key: str) -> dict:
+        if random.random() < self.failure_rate:
+            raise ConnectionError("payment gateway failed")
+
+        session_id = f"cs_fake_{idempotency_key}"
+        return {
+            "id": session_id,
+            "object": "checkout.session",
+            "amount_total": sum(
+                item["price_data"]["unit_amount"] * item["quantity"]
+                for item in line_items
+            ),
+            "url": f"https://checkout.stripe.test/{session_id}",
+        }
+
+
+def checkout_event(
+        session_id: str,
+        event_type: str = "checkout.session.completed",
+        payment_status: str = "paid",
+        event_id: str | None = None,
+        created: int | None = None,
+) -> dict:
+    return {
+        "id": event_id or f"evt_{uuid.uuid4().hex}",
+        "object": "event",
+        "type": event_type,
+        "created": created or int(time.time()),
+        "data": {
+            "object": {
+                "id": session_id,
+                "object": "checkout.session",
+                "payment_status": payment_status,
+            },
+        },
+    }
+
+
+def sign(payload: str, secret: str, timestamp: int | None = None) -> str:
+    """Stripe-Signature header of the payload"""
+    timestamp = timestamp or int(time.time())
+    signature = hmac.new(
+        secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+    ).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def send_events(
+        post: Callable[[str, str], int],
+        events: list[dict],
+        secret: str,
+        workers: int = 8,
+) -> list[int]:
+    """
+    Posts every event with ``post(payload, signature)`` from ``workers``
+    threads and returns the status codes. One worker posts from the
+    calling thread, so it shares its database connection.
+    """
+    def send(event):
+        payload = json.dumps(event)
+        return post(payload, sign(payload, secret))
+
+    if workers <= 1:
+        return [send(event) for event in events]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(send, events))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--secret", required=True)
+    parser.add_argument("--sessions", nargs="+", required=True)
+    parser.add_argument("--type", default="checkout.session.completed")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    session = requests.Session()
+
+    def post(payload, signature):
+        return session.post(
+            args.url,
+            data=payload,
+            headers={
+                "Content-Type": "application/json",
+                "Stripe-Signature": signature,
+            },
+            timeout=10,
+        ).status_code
+
+    statuses = send_events(
+        post,
+        [checkout_event(session_id, args.type) for session_id in args.sessions],
+        args.secret,
+        args.workers,
+    )
+    print({code: statuses.count(code) for code in set(statuses)})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Local stand-in for the Telegram Bot API ``sendMessage`` method.
+
+Counts received messages, can add latency to every call and answers
+with 429 when more than ``--rate-limit`` messages arrive per second.
+
+    python -m benchmarks.fake_telegram --port 8081 --latency 100
+    TELEGRAM_API_URL=http://127.0.0.1:8081 python manage.py runserver
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeTelegramServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency: float = 0, rate_limit: int = 0):
+        super().__init__(("127.0.0.1", port), TelegramHandler)
+        self.latency = latency / 1000
+        self.rate_limit = rate_limit
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.messages = []
+        self.rejected = 0
+        self._window = (0, 0)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "FakeTelegramServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def is_rate_limited(self) -> bool:
+        if not self.rate_limit:
+            return False
+
+        with self.lock:
+            second, count = self._window
+            now = int(time.monotonic())
+
+            if second != now:
+                second, count = now, 0
+
+            self._window = (second, count + 1)
+            return count >= self.rate_limit
+
+
+class TelegramHandler(BaseHTTPRequestHandler):
+    server: FakeTelegramServer
+
+    def do_GET(self):
+        self.handle_send_message(parse_qs(urlparse(self.path).query))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode()
+        self.handle_send_message(parse_qs(body))
+
+    def handle_send_message(self, params: dict) -> None:
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if not urlparse(self.path).path.endswith("/sendMessage"):
+            return self.reply(404, {"ok": False, "error_code": 404})
+
+        if self.server.is_rate_limited():
+            with self.server.lock:
+                self.server.rejected += 1
+            return self.reply(
+                429,
+                {"ok": False, "error_code": 429, "parameters": {"retry_after": 1}},
+            )
+
+        with self.server.lock:
+            self.server.calls += 1
+            self.server.messages.append(params.get("text", [""])[0])
+
+        self.reply(200, {"ok": True, "result": {}})
+
+    def reply(self, code: int, payload: dict) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--rate-limit", type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeTelegramServer(args.port, args.latency, args.rate_limit)
+    print(f"Fake Telegram API on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{server.calls} calls, {server.rejected} rate limited")
+
+
+if __name__ == "__main__":
+    main()
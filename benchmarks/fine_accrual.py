@@ -0,0 +1,135 @@
+"""
+Fine accrual and the outstanding fines total on a synthetic data set.
+
+Seeds ``--borrowings`` active borrowings with SQL, due over the last
+``--overdue-days`` days and the next 30, and times the first
+accrue_fines() run, which accrues every overdue borrowing like a full
+recompute, and the runs ``--interval`` minutes later, which only touch
+the borrowings that became overdue by another day. The outstanding
+total is summed up from the stored fines, as every run does, read from
+the cache and computed from the borrowings, all must agree.
+
+    python -m benchmarks.fine_accrual --borrowings 500000 --interval 10
+"""
+import argparse
+import time
+from datetime import timedelta
+
+from benchmarks.common import print_table, setup_django, teardown_django
+
+
+def seed(borrowings: int, overdue_days: int) -> None:
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO books_book (title, author, cover, inventory, daily_fee) "
+            "SELECT 'Book ' || i, 'Author', 'Hard', 10, (i % 300 + 1) / 100.0 "
+            "FROM generate_series(1, 1000) i"
+        )
+        cursor.execute(
+            "INSERT INTO borrowings_borrowing (borrow_date, expected_return_date, "
+            "book_id_id, user_id_id) "
+            "SELECT now() - interval '90 days', "
+            "now() - random() * %s * interval '1 day' + interval '30 days', "
+            "(SELECT max(id) FROM books_book) - i %% 1000, "
+            "(SELECT min(id) FROM user_user) "
+            "FROM generate_series(1, %s) i",
+            [overdue_days + 30, borrowings],
+        )
+        cursor.execute("ANALYZE")
+
+
+def timed(func) -> tuple:
+    started = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--borrowings", type=int, default=500_000)
+    parser.add_argument("--overdue-days", type=int, default=60)
+    parser.add_argument("--interval", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=6)
+    args = parser.parse_args()
+
+    old_config = setup_django()
+
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.utils import timezone
+
+    from borrowings.fines import (
+        FINE_MULTIPLIER,
+        accrue_fines,
+        outstanding_fines,
+        refresh_outstanding_fines,
+    )
+
+    rows = []
+    try:
+        get_user_model().objects.create_user("bench@library.com", "password")
+        seed(args.borrowings, args.overdue_days)
+        now = timezone.now()
+
+        updated, ms = timed(lambda: accrue_fines(now))
+        rows.append({"run": "first run", "updated": updated, "ms": ms})
+
+        with connection.cursor() as cursor:
+            # autovacuum would follow an update of this many rows
+            cursor.execute("VACUUM ANALYZE borrowings_borrowing")
+
+        for run in range(1, args.runs + 1):
+            last_run = now + timedelta(minutes=args.interval * run)
+            updated, ms = timed(lambda: accrue_fines(last_run))
+            rows.append({
+                "run": f"after {args.interval * run} minutes",
+                "updated": updated,
+                "ms": ms,
+            })
+
+        def computed_total():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT sum(floor(extract(epoch FROM %s - expected_return_date)"
+                    " / 86400) * book.daily_fee * %s) "
+                    "FROM borrowings_borrowing AS borrowing "
+                    "JOIN books_book AS book ON book.id = borrowing.book_id_id "
+                    "WHERE actual_return_date IS NULL "
+                    "AND expected_return_date <= %s - interval '24 hours'",
+                    [last_run, FINE_MULTIPLIER, last_run],
+                )
+                return cursor.fetchone()[0]
+
+        stored, ms = timed(refresh_outstanding_fines)
+        rows.append({
+            "run": "outstanding, sum of stored fines",
+            "updated": stored,
+            "ms": ms,
+        })
+        cached, ms = timed(outstanding_fines)
+        rows.append({
+            "run": "outstanding, cached by the last run",
+            "updated": cached,
+            "ms": ms,
+        })
+        computed, ms = timed(computed_total)
+        assert stored == cached == computed, (stored, cached, computed)
+        rows.append({
+            "run": "outstanding, computed from borrowings",
+            "updated": computed,
+            "ms": ms,
+        })
+    finally:
+        teardown_django(old_config)
+
+    print_table(
+        f"Fine accrual, {args.borrowings} active borrowings, "
+        f"due over the last {args.overdue_days} days and the next 30",
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Catalog import throughput.
+
+Writes ``--rows`` synthetic books to a CSV file and imports it with the
+``import_books`` command (COPY into a staging table and an upsert),
+imports updates of all of them by id, then loads ``--orm-rows`` of them
+with ``loaddata`` and with ``Book.save()`` one at a time, and reports
+rows/second and the time each way would take for the whole file.
+
+    python -m benchmarks.import_books --rows 1000000 --orm-rows 5000
+"""
+import argparse
+import csv
+import json
+import os
+import tempfile
+import time
+from io import StringIO
+
+from benchmarks.common import print_table, setup_django, teardown_django
+
+
+def write_catalog(path: str, rows: int, first_id: int | None = None) -> None:
+    """New books, or updates of the books from ``first_id`` on"""
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["id", "title", "author", "cover", "inventory", "daily_fee"])
+        writer.writerows(
+            [
+                "" if first_id is None else first_id + number - 1,
+                f"Book {number}",
+                f"Author {number % 1000}",
+                "Hard" if number % 3 else "Soft",
+                number % 10,
+                f"{number % 500 / 100:.2f}",
+            ]
+            for number in range(1, rows + 1)
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--orm-rows", type=int, default=5_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    old_config = setup_django()
+
+    from django.core.management import call_command
+
+    from books.models import Book
+
+    rows = []
+    directory = tempfile.TemporaryDirectory()
+    try:
+        path = os.path.join(directory.name, "catalog.csv")
+        write_catalog(path, args.rows)
+        Book.objects.all().delete()
+
+        def timed(load, count):
+            started = time.perf_counter()
+            load()
+            seconds = time.perf_counter() - started
+            return {
+                "rows": count,
+                "seconds": seconds,
+                "rows_s": count / seconds,
+                "full_file_s": args.rows * seconds / count,
+            }
+
+        rows.append({
+            "method": "import_books (COPY + upsert)",
+            **timed(
+                lambda: call_command(
+                    "import_books", path,
+                    "--batch-size", str(args.batch_size),
+                    stdout=StringIO(),
+                ),
+                args.rows,
+            ),
+        })
+        assert Book.objects.count() == args.rows
+
+        updates = os.path.join(directory.name, "updates.csv")
+        write_catalog(updates, args.rows, Book.objects.order_by("id").first().id)
+        rows.append({
+            "method": "import_books, updates by id",
+            **timed(
+                lambda: call_command(
+                    "import_books", updates,
+                    "--batch-size", str(args.batch_size),
+                    stdout=StringIO(),
+                ),
+                args.rows,
+            ),
+        })
+
+        sample = list(Book.objects.order_by("id")[:args.orm_rows])
+        fixture = os.path.join(directory.name, "catalog.json")
+        with open(fixture, "w") as file:
+            json.dump(
+                [
+                    {
+                        "model": "books.book",
+                        "pk": book.id,
+                        "fields": {
+                            "title": book.title,
+                            "author": book.author,
+                            "cover": book.cover,
+                            "inventory": book.inventory,
+                            "daily_fee": str(book.daily_fee),
+                        },
+                    }
+                    for book in sample
+                ],
+                file,
+            )
+
+        rows.append({
+            "method": "loaddata",
+            **timed(
+                lambda: call_command("loaddata", fixture, verbosity=0),
+                len(sample),
+            ),
+        })
+
+        def save_one_by_one():
+            for book in sample:
+                book.pk = None
+                book.save()
+
+        rows.append({
+            "method": "Book.save() one by one",
+            **timed(save_one_by_one, len(sample)),
+        })
+    finally:
+        directory.cleanup()
+        teardown_django(old_config)
+
+    print_table(f"Catalog import, {args.rows} rows", rows)
+
+
+if __name__ == "__main__":
+    main()
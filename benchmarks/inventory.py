@@ -0,0 +1,142 @@
+"""
+Inventory accounting of one hot book under concurrent borrows and returns.
+
+Runs ``--calls`` borrows of a book with ``--copies`` copies on
+``--workers`` threads with the read-modify-write save of the inventory
+done before and with the atomic conditional UPDATE of
+``books.inventory``, then borrow/return pairs and borrowing create
+requests, and reports the throughput and the copies left, which must
+never go below zero.
+
+    python -m benchmarks.inventory --calls 400 --copies 100 --workers 32
+"""
+import argparse
+import threading
+
+from benchmarks.common import (
+    print_table,
+    run_concurrently,
+    setup_django,
+    teardown_django,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--copies", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=32)
+    args = parser.parse_args()
+
+    old_config = setup_django()
+
+    from unittest.mock import patch
+
+    from django.contrib.auth import get_user_model
+    from django.db import IntegrityError
+    from rest_framework.test import APIClient
+
+    from books.inventory import OutOfStock, return_copy, take_copy
+    from books.models import Book
+
+    user = get_user_model().objects.create_user("bench@library.com", "password")
+    lock = threading.Lock()
+    rows = []
+
+    def sample_book(copies: int) -> Book:
+        return Book.objects.create(
+            title="Hot book",
+            author="Bench",
+            cover="Hard",
+            inventory=copies,
+            daily_fee=1,
+        )
+
+    def measure(name: str, func, book: Book, borrowed: list) -> None:
+        result = run_concurrently(func, args.calls, args.workers)
+        rows.append({
+            "operation": name,
+            "per_second": result["per_second"],
+            "p99_ms": result["p99"],
+            "borrowed": len(borrowed),
+            "copies_left": Book.objects.get(pk=book.pk).inventory,
+        })
+
+    def legacy_borrow(book: Book, borrowed: list):
+        def borrow():
+            copy = Book.objects.get(pk=book.pk)
+
+            if copy.inventory > 0:
+                copy.inventory -= 1
+                try:
+                    copy.save(update_fields=["inventory"])
+                except IntegrityError:
+                    return
+
+                with lock:
+                    borrowed.append(copy.pk)
+
+        return borrow
+
+    def atomic_borrow(book: Book, borrowed: list):
+        def borrow():
+            try:
+                take_copy(Book(id=book.id, title=book.title))
+            except OutOfStock:
+                return
+
+            with lock:
+                borrowed.append(book.pk)
+
+        return borrow
+
+    def borrow_and_return(book: Book, borrowed: list):
+        def borrow():
+            copy = Book(id=book.id, title=book.title)
+            try:
+                take_copy(copy)
+            except OutOfStock:
+                return
+            return_copy(copy)
+
+        return borrow
+
+    def borrowing_request(book: Book, borrowed: list):
+        def borrow():
+            client = APIClient()
+            client.force_authenticate(user)
+            response = client.post(
+                "/api/borrowings/borrowings/",
+                {"expected_return_date": "2099-12-12", "book_id": book.id},
+            )
+
+            if response.status_code == 201:
+                with lock:
+                    borrowed.append(response.data["id"])
+
+        return borrow
+
+    try:
+        with patch("borrowings.serializers.send_borrowing_create_message"), \
+                patch("borrowings.serializers.attach_session_or_defer"):
+            for name, borrow in [
+                ("borrow, read-modify-write (before)", legacy_borrow),
+                ("borrow, conditional UPDATE", atomic_borrow),
+                ("borrow and return", borrow_and_return),
+                ("borrowing create request", borrowing_request),
+            ]:
+                book = sample_book(args.copies)
+                borrowed = []
+                measure(name, borrow(book, borrowed), book, borrowed)
+    finally:
+        teardown_django(old_config)
+
+    print_table(
+        f"{args.calls} calls on one book with {args.copies} copies, "
+        f"{args.workers} workers",
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
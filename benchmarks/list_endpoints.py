@@ -0,0 +1,166 @@
+"""
+List endpoints on a synthetic data set.
+
+Seeds ``--rows`` books, borrowings and payments with SQL, then measures
+latency and peak Python memory of the first and a deep page of the
+keyset paginated books, borrowings and payments lists, of the estimated
+count, and of what paging cost before: the whole unpaginated list (only
+up to ``--legacy-max`` rows), an OFFSET page and an exact COUNT(*).
+
+    python -m benchmarks.list_endpoints --rows 100000
+    python -m benchmarks.list_endpoints --rows 10000000 --repeat 5
+"""
+import argparse
+import base64
+import time
+import tracemalloc
+
+from benchmarks.common import percentile, print_table, setup_django, teardown_django
+
+
+def seed(rows: int) -> None:
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO user_user (password, is_superuser, email, first_name, "
+            "last_name, is_staff, is_active, date_joined) "
+            "SELECT '', false, 'reader' || i || '@library.com', '', '', "
+            "false, true, now() FROM generate_series(1, 10000) i"
+        )
+        cursor.execute(
+            "INSERT INTO books_book (title, author, cover, inventory, daily_fee) "
+            "SELECT 'Book ' || i, 'Author ' || i, 'Hard', 10, 1 "
+            "FROM generate_series(1, %s::bigint) i",
+            [rows],
+        )
+        cursor.execute(
+            "INSERT INTO borrowings_borrowing (borrow_date, expected_return_date, "
+            "actual_return_date, book_id_id, user_id_id) "
+            "SELECT now(), now() + interval '7 days', NULL, "
+            "(SELECT min(id) FROM books_book) + i %% %s, "
+            "(SELECT min(id) FROM user_user) + i %% 10000 "
+            "FROM generate_series(1, %s::bigint) i",
+            [rows, rows],
+        )
+        cursor.execute(
+            "INSERT INTO borrowings_payment (status, type, session_url, "
+            "session_id, to_pay, borrowing_id_id) "
+            "SELECT 'PAID', 'PAYMENT', 'https://checkout.stripe.com/' || id, "
+            "'cs_' || id, 7, id FROM borrowings_borrowing"
+        )
+        cursor.execute("ANALYZE")
+
+
+def cursor_at(position: int) -> str:
+    """The cursor DRF would put in a next link after ``position``"""
+    return base64.b64encode(f"p={position}".encode()).decode()
+
+
+def measure(func, repeat: int) -> dict:
+    """Latency of ``repeat`` calls, then peak memory of one traced call"""
+    if repeat > 1:
+        func()
+
+    latencies = []
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "peak_mb": peak / 2 ** 20,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--legacy-max", type=int, default=100_000)
+    args = parser.parse_args()
+
+    old_config = setup_django()
+
+    from django.contrib.auth import get_user_model
+    from django.db.models import Max, Min
+    from rest_framework import status
+    from rest_framework.test import APIClient
+
+    from books.models import Book
+    from books.serializers import BooksSerializer
+    from borrowings.models import Borrowing, Payment
+    from borrowings.serializers import BorrowingSerializer, PaymentSerializer
+
+    endpoints = (
+        ("books", "/api/books/books/", Book.objects.all(), BooksSerializer, "id"),
+        (
+            "borrowings",
+            "/api/borrowings/borrowings/",
+            Borrowing.objects.select_related("book_id", "user_id"),
+            BorrowingSerializer,
+            "-id",
+        ),
+        (
+            "payments",
+            "/api/borrowings/payments/",
+            Payment.objects.all(),
+            PaymentSerializer,
+            "-id",
+        ),
+    )
+
+    rows = []
+    try:
+        started = time.perf_counter()
+        seed(args.rows)
+        print(f"Seeded {args.rows} rows per table in {time.perf_counter() - started:.1f}s")
+
+        client = APIClient()
+        client.force_authenticate(
+            get_user_model().objects.create_superuser("admin@bench.com", "password")
+        )
+
+        for name, url, queryset, serializer_class, ordering in endpoints:
+            bounds = queryset.aggregate(first=Min("id"), last=Max("id"))
+            middle = (bounds["first"] + bounds["last"]) // 2
+
+            def get(**params):
+                response = client.get(url, params)
+                assert response.status_code == status.HTTP_200_OK, response.data
+                return response
+
+            cases = {
+                "first page": lambda: get(),
+                "deep page (cursor)": lambda: get(cursor=cursor_at(middle)),
+                "first page + estimated count": lambda: get(count="estimate"),
+                "deep page (OFFSET)": lambda: serializer_class(
+                    queryset.order_by(ordering)[args.rows // 2:args.rows // 2 + 20],
+                    many=True,
+                ).data,
+                "exact COUNT(*)": lambda: queryset.count(),
+            }
+            if args.rows <= args.legacy_max:
+                cases["whole list (before)"] = lambda: serializer_class(
+                    queryset, many=True
+                ).data
+
+            for case, func in cases.items():
+                repeat = 1 if case == "whole list (before)" else args.repeat
+                rows.append({"endpoint": name, "case": case, **measure(func, repeat)})
+    finally:
+        teardown_django(old_config)
+
+    print_table(f"List endpoints, {args.rows} rows per table", rows)
+
+
+if __name__ == "__main__":
+    main()
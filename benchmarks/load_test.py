@@ -0,0 +1,399 @@
+"""
+End-to-end load test of the API.
+
+Serves the project over HTTP on a throwaway test database together with
+an in-process Celery worker, the fake Stripe API and the fake Telegram
+server, then runs a synthetic request mix of ``--workers`` patrons for
+``--duration`` seconds, or replays a recorded request log once. Reports
+throughput, p50/p95/p99 latency and database queries per request of
+every endpoint.
+
+    python -m benchmarks.load_test --duration 30 --workers 16 \\
+        --mix browse=40,detail=25,search=10,borrow=10,return=8,pay=7
+    python -m benchmarks.load_test --replay requests.log.jsonl
+
+Every line of a request log is a JSON object with ``method``, ``path``
+and optional ``body``, ``user`` (a patron number) and ``endpoint`` (the
+name to report it under). ``--output`` saves the results and
+``--baseline`` compares p99 with saved results, e.g. of the previous
+release.
+
+``--url`` runs against a server that is already running instead. Start
+it with ``QUERY_COUNT_HEADER=True`` (for the query counts), point its
+``STRIPE_API_BASE`` and ``TELEGRAM_API_URL`` at the fakes on
+``--stripe-port`` and ``--telegram-port`` and set its
+``STRIPE_WEBHOOK_SECRET`` to ``--webhook-secret``.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import threading
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from benchmarks.common import percentile, print_table, setup_django, teardown_django
+from benchmarks.fake_stripe import FakeStripeServer, checkout_event, sign
+from benchmarks.fake_telegram import FakeTelegramServer
+
+DEFAULT_MIX = "browse=40,detail=25,search=10,borrow=10,return=8,pay=7"
+WORDS = (
+    "river", "night", "garden", "shadow", "winter", "stone", "empire",
+    "silver", "ocean", "forest", "crown", "glass", "storm", "letters",
+)
+ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+class Patron:
+    """One virtual patron with its own session, borrowings and payments"""
+
+    def __init__(self, number: int, base_url: str, books: list[int], seed: int):
+        self.number = number
+        self.base_url = base_url
+        self.books = books
+        self.random = random.Random(seed + number)
+        self.http = requests.Session()
+        self.samples = []
+        self.active = []
+        self.unpaid = []
+
+    def sign_in(self) -> None:
+        credentials = {
+            "email": f"patron{self.number}.{uuid.uuid4().hex[:8]}@load.test",
+            "password": "load-test-password",
+        }
+        self.http.post(f"{self.base_url}/api/users/", json=credentials).raise_for_status()
+        response = self.http.post(f"{self.base_url}/api/users/token/", json=credentials)
+        response.raise_for_status()
+        self.http.headers["Authorization"] = f"Bearer {response.json()['access']}"
+
+    def call(self, endpoint: str, method: str, path: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base_url + path, **kwargs)
+        except requests.RequestException:
+            response = None
+        latency = (time.perf_counter() - started) * 1000
+
+        queries = response is not None and response.headers.get("X-DB-Queries")
+        self.samples.append((
+            endpoint,
+            latency,
+            response.status_code if response is not None else 0,
+            int(queries) if queries else None,
+        ))
+        return response
+
+    def browse(self):
+        self.call("GET /api/books/books/", "GET", "/api/books/books/")
+
+    def detail(self):
+        book_id = self.random.choice(self.books)
+        self.call("GET /api/books/books/<id>/", "GET", f"/api/books/books/{book_id}/")
+
+    def search(self):
+        self.call(
+            "GET /api/books/books/?search=",
+            "GET",
+            "/api/books/books/",
+            params={"search": self.random.choice(WORDS)},
+        )
+
+    def borrow(self):
+        expected_return_date = datetime.now(timezone.utc) + timedelta(days=7)
+        response = self.call(
+            "POST /api/borrowings/borrowings/",
+            "POST",
+            "/api/borrowings/borrowings/",
+            json={
+                "book_id": self.random.choice(self.books),
+                "expected_return_date": expected_return_date.isoformat(),
+            },
+        )
+
+        if response is not None and response.status_code == 201:
+            self.active.append(response.json()["id"])
+            self.unpaid.append(response.json()["id"])
+
+    def return_book(self):
+        if not self.active:
+            return self.borrow()
+
+        borrowing_id = self.active.pop(self.random.randrange(len(self.active)))
+        self.call(
+            "POST /api/borrowings/borrowings/<id>/return/",
+            "POST",
+            f"/api/borrowings/borrowings/{borrowing_id}/return/",
+        )
+
+    def pay(self, webhook_secret: str):
+        if not self.unpaid:
+            return self.borrow()
+
+        borrowing_id = self.unpaid.pop(0)
+        response = self.call(
+            "GET /api/borrowings/borrowings/<id>/payment/",
+            "GET",
+            f"/api/borrowings/borrowings/{borrowing_id}/payment/",
+        )
+
+        if response is None or response.status_code != 200:
+            # the session is created by Celery in the deferred mode
+            self.unpaid.append(borrowing_id)
+            return
+
+        session_id = response.json()["session_id"]
+        payload = json.dumps(checkout_event(session_id))
+        self.call(
+            "POST /api/borrowings/webhooks/stripe/",
+            "POST",
+            "/api/borrowings/webhooks/stripe/",
+            data=payload,
+            headers={
+                "Content-Type": "application/json",
+                "Stripe-Signature": sign(payload, webhook_secret),
+            },
+        )
+        self.call(
+            "GET /api/borrowings/borrowings/<id>/success/",
+            "GET",
+            f"/api/borrowings/borrowings/{borrowing_id}/success/",
+            params={"session_id": session_id},
+        )
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+
+    for part in mix.split(","):
+        action, _, weight = part.partition("=")
+        weights[action.strip()] = float(weight)
+
+    return weights
+
+
+def run_mix(patrons: list[Patron], mix: dict, duration: float, webhook_secret: str):
+    actions = {
+        "browse": Patron.browse,
+        "detail": Patron.detail,
+        "search": Patron.search,
+        "borrow": Patron.borrow,
+        "return": Patron.return_book,
+        "pay": lambda patron: patron.pay(webhook_secret),
+    }
+    unknown = set(mix) - set(actions)
+    if unknown:
+        raise SystemExit(f"Unknown actions in --mix: {', '.join(sorted(unknown))}")
+
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    deadline = time.monotonic() + duration
+
+    def work(patron):
+        while time.monotonic() < deadline:
+            actions[patron.random.choices(names, weights)[0]](patron)
+
+    run_patrons(patrons, work)
+
+
+def replay(patrons: list[Patron], path: str):
+    """Sends the requests of a log, every patron its own lines in order"""
+    lines = {patron.number: [] for patron in patrons}
+
+    with open(path) as file:
+        for index, line in enumerate(file):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            lines[record.get("user", index) % len(patrons)].append(record)
+
+    def work(patron):
+        for record in lines[patron.number]:
+            patron.call(
+                record.get("endpoint")
+                or f"{record['method']} {ID_SEGMENT.sub('/<id>', record['path'].split('?')[0])}",
+                record["method"],
+                record["path"],
+                json=record.get("body"),
+            )
+
+    run_patrons(patrons, work)
+
+
+def run_patrons(patrons: list[Patron], work) -> None:
+    threads = [threading.Thread(target=work, args=(patron,)) for patron in patrons]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def summarize(samples: list[tuple], seconds: float) -> list[dict]:
+    by_endpoint = {"all": samples}
+    for sample in samples:
+        by_endpoint.setdefault(sample[0], []).append(sample)
+
+    rows = []
+    for endpoint, endpoint_samples in sorted(by_endpoint.items()):
+        latencies = [latency for _, latency, _, _ in endpoint_samples]
+        statuses = [status for _, _, status, _ in endpoint_samples]
+        queries = [count for _, _, _, count in endpoint_samples if count is not None]
+        rows.append({
+            "endpoint": endpoint,
+            "requests": len(endpoint_samples),
+            "per_second": len(endpoint_samples) / seconds,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "queries": statistics.fmean(queries) if queries else "",
+            "4xx": sum(400 <= status < 500 for status in statuses),
+            "errors": sum(status == 0 or status >= 500 for status in statuses),
+        })
+
+    return rows
+
+
+def compare(rows: list[dict], baseline_path: str) -> list[dict]:
+    with open(baseline_path) as file:
+        baseline = {row["endpoint"]: row for row in json.load(file)["rows"]}
+
+    for row in rows:
+        before = baseline.get(row["endpoint"])
+        row["p99_change"] = (
+            f"{row['p99'] / before['p99'] - 1:+.0%}"
+            if before and before["p99"] else ""
+        )
+
+    return rows
+
+
+@contextmanager
+def local_stack(args, stripe: FakeStripeServer, telegram: FakeTelegramServer):
+    """Test database, HTTP server and Celery worker of this project"""
+    os.environ.update({
+        "QUERY_COUNT_HEADER": "True",
+        "STRIPE_API_BASE": stripe.url,
+        "STRIPE_API_KEY": os.getenv("STRIPE_API_KEY") or "sk_test_load",
+        "STRIPE_WEBHOOK_SECRET": args.webhook_secret,
+        "TELEGRAM_API_URL": telegram.url,
+        "TELEGRAM_TOKEN": "load-test",
+        "CHAT_ID": "1",
+        "CELERY_BROKER_URL": "memory://",
+    })
+    old_config = setup_django()
+
+    from celery.contrib.testing.worker import start_worker
+    from django.conf import settings
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+
+    from books.models import Book
+    from library_project.celery import app
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    settings.ALLOWED_HOSTS = ["127.0.0.1"]
+    server = ThreadedWSGIServer(("127.0.0.1", args.port), QuietHandler)
+    server.daemon_threads = True
+    server.set_app(WSGIHandler())
+
+    try:
+        Book.objects.bulk_create(
+            Book(
+                title=f"{WORDS[number % len(WORDS)]} {WORDS[number * 7 % len(WORDS)]} {number}",
+                author=f"Author {number % 100}",
+                cover="Hard",
+                inventory=10 ** 6,
+                daily_fee=1,
+            )
+            for number in range(args.books)
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        with start_worker(app, perform_ping_check=False, loglevel="ERROR"):
+            yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+        teardown_django(old_config)
+
+
+def book_ids(base_url: str) -> list[int]:
+    response = requests.get(f"{base_url}/api/books/books/", params={"page_size": 100})
+    response.raise_for_status()
+    return [book["id"] for book in response.json()["results"]]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--replay", help="Request log (JSON Lines) to replay.")
+    parser.add_argument("--books", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stripe-latency", type=float, default=150)
+    parser.add_argument("--telegram-latency", type=float, default=100)
+    parser.add_argument("--url", help="Base url of a running server.")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--stripe-port", type=int, default=0)
+    parser.add_argument("--telegram-port", type=int, default=0)
+    parser.add_argument("--webhook-secret", default="whsec_load_test")
+    parser.add_argument("--output", help="Save the results to this JSON file.")
+    parser.add_argument("--baseline", help="Compare with results saved by --output.")
+    args = parser.parse_args()
+
+    stripe = FakeStripeServer(args.stripe_port, args.stripe_latency).start()
+    telegram = FakeTelegramServer(args.telegram_port, args.telegram_latency).start()
+    print(f"Fake Stripe API on {stripe.url}, fake Telegram API on {telegram.url}")
+
+    with ExitStack() as stack:
+        base_url = args.url or stack.enter_context(local_stack(args, stripe, telegram))
+        books = book_ids(base_url)
+        patrons = [
+            Patron(number, base_url, books, args.seed)
+            for number in range(args.workers)
+        ]
+        for patron in patrons:
+            patron.sign_in()
+
+        started = time.perf_counter()
+        if args.replay:
+            replay(patrons, args.replay)
+        else:
+            run_mix(patrons, parse_mix(args.mix), args.duration, args.webhook_secret)
+        seconds = time.perf_counter() - started
+
+        # let the worker send what the last requests queued
+        time.sleep(1)
+
+    rows = summarize([sample for patron in patrons for sample in patron.samples], seconds)
+    if args.baseline:
+        rows = compare(rows, args.baseline)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"args": vars(args), "rows": rows}, file, indent=2)
+
+    print_table(
+        f"Load test, {args.workers} patrons, {seconds:.0f} s, Stripe "
+        f"{args.stripe_latency:.0f} ms, Telegram {args.telegram_latency:.0f} ms",
+        rows,
+    )
+    print(
+        f"\nStripe sessions created: {stripe.calls}, "
+        f"Telegram messages: {telegram.calls}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Admin notification delivery against the local fake Telegram server.
+
+Measures the latency a request pays per notification (blocking
+``requests.get`` before, Redis enqueue now) and the delivery throughput
+of the batched queue flush. Needs REDIS_URL to point to a Redis server.
+
+    python -m benchmarks.notifications --messages 500 --latency 100
+"""
+import argparse
+import os
+import statistics
+import time
+from unittest.mock import patch
+
+import django
+import requests
+
+from benchmarks.common import print_table
+from benchmarks.fake_telegram import FakeTelegramServer
+
+
+def timed_calls(func, messages: list[str]) -> list[float]:
+    latencies = []
+    for message in messages:
+        started = time.perf_counter()
+        func(message)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=100)
+    parser.add_argument("--min-interval", type=float, default=0)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "library_project.settings")
+    django.setup()
+
+    from django.test import override_settings
+
+    from borrowings.notification import QUEUE_KEY, enqueue_notification, flush_queue
+    from library_project.redis_client import get_redis
+
+    if get_redis() is None:
+        parser.error("REDIS_URL is not set")
+
+    server = FakeTelegramServer(latency=args.latency).start()
+    messages = [
+        f"New borrowing created by user{i}@library.com: \n"
+        f"Book: Book #{i} & co, \nbook left: {i % 7}"
+        for i in range(args.messages)
+    ]
+
+    def legacy_send(message):
+        requests.get(
+            f"{server.url}/botTOKEN/sendMessage?chat_id=1&text={message}"
+        )
+
+    with override_settings(
+            CHAT_ID="1",
+            TELEGRAM_TOKEN="TOKEN",
+            TELEGRAM_API_URL=server.url,
+            NOTIFICATION_MIN_INTERVAL=args.min_interval,
+    ), patch("borrowings.tasks.flush_notifications.apply_async"):
+        get_redis().delete(QUEUE_KEY)
+
+        legacy_latency = timed_calls(legacy_send, messages)
+        legacy_calls, server.calls = server.calls, 0
+
+        queued_latency = timed_calls(enqueue_notification, messages)
+
+        started = time.perf_counter()
+        delivered = flush_queue()
+        flush_seconds = time.perf_counter() - started
+
+    print_table(
+        f"{args.messages} notifications, Telegram latency {args.latency:.0f} ms",
+        [
+            {
+                "mode": "blocking requests.get",
+                "request_ms_mean": statistics.mean(legacy_latency),
+                "request_ms_max": max(legacy_latency),
+                "http_calls": legacy_calls,
+                "delivered_per_s": args.messages / (sum(legacy_latency) / 1000),
+            },
+            {
+                "mode": "queued + batched flush",
+                "request_ms_mean": statistics.mean(queued_latency),
+                "request_ms_max": max(queued_latency),
+                "http_calls": server.calls,
+                "delivered_per_s": delivered / flush_seconds,
+            },
+        ],
+    )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
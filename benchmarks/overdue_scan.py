@@ -0,0 +1,138 @@
+"""
+Overdue scan on a synthetic data set.
+
+Seeds ``--rows`` borrowings with SQL (about two thirds active, half of
+those overdue) and compares the legacy per-row loop, measured on a
+sample and extrapolated, with the streaming range scan run serially and
+fanned out over ``--workers`` forked processes standing in for Celery
+prefork workers.
+
+    python -m benchmarks.overdue_scan --rows 1000000 --workers 8
+"""
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import patch
+
+from benchmarks.common import print_table, setup_django, teardown_django
+
+
+def scan(bounds):
+    from borrowings.tasks import scan_overdue_range
+
+    return scan_overdue_range(*bounds)
+
+
+def seed(rows: int, users: int, books: int) -> None:
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT coalesce(max(id), 0) FROM user_user")
+        first_user = cursor.fetchone()[0] + 1
+        cursor.execute("SELECT coalesce(max(id), 0) FROM books_book")
+        first_book = cursor.fetchone()[0] + 1
+
+        cursor.execute(
+            "INSERT INTO user_user (password, is_superuser, email, first_name, "
+            "last_name, is_staff, is_active, date_joined) "
+            "SELECT '', false, 'reader' || i || '@library.com', '', '', "
+            "false, true, now() FROM generate_series(1, %s) i",
+            [users],
+        )
+        cursor.execute(
+            "INSERT INTO books_book (title, author, cover, inventory, daily_fee) "
+            "SELECT 'Book ' || i, 'Author ' || i, 'Hard', 10, 1 "
+            "FROM generate_series(1, %s) i",
+            [books],
+        )
+        cursor.execute(
+            "INSERT INTO borrowings_borrowing (borrow_date, expected_return_date, "
+            "actual_return_date, book_id_id, user_id_id) "
+            "SELECT now() - interval '60 days', "
+            "now() + (i %% 60 - 30) * interval '1 day', "
+            "CASE WHEN i %% 3 = 0 THEN now() END, "
+            "%s + i %% %s, %s + i %% %s FROM generate_series(1, %s) i",
+            [first_book, books, first_user, users, rows],
+        )
+        cursor.execute("ANALYZE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--legacy-rows", type=int, default=2_000)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    old_config = setup_django()
+
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    from borrowings import tasks
+
+    def legacy_scan(cutoff, limit):
+        for borrowing in tasks.overdue_borrowings(cutoff)[:limit]:
+            tasks.format_overdue_borrowing(
+                borrowing.id,
+                borrowing.user_id.email,
+                borrowing.book_id.title,
+                borrowing.expected_return_date,
+            )
+
+    rows = []
+    try:
+        started = time.perf_counter()
+        seed(args.rows, users=10_000, books=50_000)
+        print(f"Seeded {args.rows} borrowings in {time.perf_counter() - started:.1f}s")
+
+        with patch.object(tasks, "chord") as chord, \
+                patch.object(tasks, "send_overdue_digest"):
+            tasks.check_overdue_borrowings()
+        ranges = [signature.args for signature in chord.call_args.args[0]]
+        cutoff = ranges[0][2]
+        overdue = tasks.overdue_borrowings(cutoff).count()
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            legacy_scan(cutoff, args.legacy_rows)
+            seconds = time.perf_counter() - started
+        rows.append({
+            "mode": f"legacy loop (extrapolated from {args.legacy_rows})",
+            "seconds": seconds * overdue / args.legacy_rows,
+            "rows_per_s": args.legacy_rows / seconds,
+            "queries": round(len(queries) * overdue / args.legacy_rows),
+        })
+
+        for name, workers in (("streaming, 1 worker", 1),
+                              (f"streaming, {args.workers} workers", args.workers)):
+            # forked workers must open their own database connections
+            connection.close()
+            started = time.perf_counter()
+            with ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("fork"),
+            ) as executor:
+                results = list(executor.map(scan, ranges))
+            seconds = time.perf_counter() - started
+
+            assert sum(result["count"] for result in results) == overdue
+            rows.append({
+                "mode": name,
+                "seconds": seconds,
+                "rows_per_s": overdue / seconds,
+                "queries": len(ranges) + 1,
+            })
+    finally:
+        teardown_django(old_config)
+
+    print_table(
+        f"Overdue scan: {args.rows} borrowings, {overdue} overdue, "
+        f"{len(ranges)} ranges",
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Borrowing create while the payment provider is healthy, flaky, slow or down.
+
+Runs ``--calls`` borrowings from ``--workers`` threads against the
+in-process ``FakeGateway`` called directly, as before, with the Stripe
+default timeout of 80 s and no retries ("unguarded"), and through the
+gateway with timeouts, retries and the circuit breaker, deferring or
+failing fast while it is open. Reports latency and how every borrowing
+ended: a session created in the request, deferred to Celery, 503 or 500.
+
+    python -m benchmarks.payment_gateway --calls 64 --workers 16
+"""
+import argparse
+import threading
+import uuid
+from contextlib import nullcontext
+from unittest.mock import patch
+
+from benchmarks.common import print_table, run_concurrently, setup_django, teardown_django
+from benchmarks.fake_stripe import FakeGateway
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=150, help="ms")
+    parser.add_argument("--slow-latency", type=float, default=10, help="s")
+    args = parser.parse_args()
+
+    old_config = setup_django()
+
+    from django.contrib.auth import get_user_model
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+
+    from books.models import Book
+    from borrowings.models import Payment
+
+    scenarios = {
+        "healthy": (args.latency / 1000, 0.0),
+        "flaky (30% errors)": (args.latency / 1000, 0.3),
+        "slow": (args.slow_latency, 0.0),
+        "down": (args.latency / 1000, 1.0),
+    }
+    gateway_settings = {"PAYMENT_GATEWAY": "benchmarks.fake_stripe.FakeGateway"}
+    modes = {
+        "unguarded": (
+            override_settings(
+                **gateway_settings,
+                PAYMENT_GATEWAY_TIMEOUT=80,
+                PAYMENT_GATEWAY_DEADLINE=80,
+                PAYMENT_GATEWAY_RETRIES=0,
+            ),
+            # before the gateway sessions were created by a bare client
+            patch(
+                "borrowings.stripe.get_gateway",
+                lambda: UnguardedGateway(FakeGateway()),
+            ),
+        ),
+        "guarded, defer": (
+            override_settings(**gateway_settings, PAYMENT_GATEWAY_FALLBACK="defer"),
+            nullcontext(),
+        ),
+        "guarded, fail fast": (
+            override_settings(**gateway_settings, PAYMENT_GATEWAY_FALLBACK="fail"),
+            nullcontext(),
+        ),
+    }
+
+    rows = []
+    try:
+        user = get_user_model().objects.create_user("bench@library.com", "password")
+        book = Book.objects.create(
+            title="Book", author="Bench", cover="Hard", inventory=10 ** 6, daily_fee=1
+        )
+
+        for scenario, (latency, failure_rate) in scenarios.items():
+            for mode, (settings_override, gateway_patch) in modes.items():
+                FakeGateway.latency = latency
+                FakeGateway.failure_rate = failure_rate
+                FakeGateway.calls = 0
+                statuses = []
+                deferred = []
+                lock = threading.Lock()
+
+                def borrow():
+                    client = APIClient(raise_request_exception=False)
+                    client.force_authenticate(user)
+                    response = client.post(
+                        "/api/borrowings/borrowings/",
+                        {"expected_return_date": "2099-01-01", "book_id": book.id},
+                    )
+                    with lock:
+                        statuses.append(response.status_code)
+
+                Payment.objects.all().delete()
+                with settings_override, gateway_patch, \
+                        patch("borrowings.serializers.send_borrowing_create_message"), \
+                        patch(
+                            "borrowings.tasks.create_payment_session.apply_async",
+                            lambda *args, **kwargs: deferred.append(args),
+                        ):
+                    result = run_concurrently(borrow, args.calls, args.workers)
+
+                rows.append({
+                    "provider": scenario,
+                    "mode": mode,
+                    "per_second": result["per_second"],
+                    "p50": result["p50"],
+                    "p99": result["p99"],
+                    "session": Payment.objects.filter(session_url__isnull=False).count(),
+                    "deferred": len(deferred),
+                    "503": statuses.count(503),
+                    "500": statuses.count(500),
+                    "gateway_calls": FakeGateway.calls,
+                })
+    finally:
+        teardown_django(old_config)
+
+    print_table(
+        f"Borrowing create, {args.calls} calls, {args.workers} workers",
+        rows,
+    )
+
+
+class UnguardedGateway:
+    """Calls the gateway once with the 80 s default timeout, errors reach the view"""
+
+    def __init__(self, gateway):
+        self.gateway = gateway
+
+    def create_checkout_session(self, line_items, success_url, cancel_url):
+        return self.gateway.create_checkout_session(
+            line_items=line_items,
+            success_url=success_url,
+            cancel_url=cancel_url,
+            idempotency_key=uuid.uuid4().hex,
+            timeout=80,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Payment reconciliation against a local fake Stripe holding many sessions.
+
+Seeds ``--sessions`` pending payments with SQL and gives
+``benchmarks/fake_stripe.py`` one checkout session event per payment,
+a fifth of them expired. The first run pages through all of them once
+with one UPDATE per event and again with one UPDATE per page, then
+``--new`` events arrive and an incremental run applies only those, and a
+last run finds nothing new.
+
+    python -m benchmarks.payment_reconciliation --sessions 100000 --new 1000
+"""
+import argparse
+import time
+from unittest.mock import patch
+
+from benchmarks.common import print_table, setup_django, teardown_django
+from benchmarks.fake_stripe import FakeStripeServer, checkout_event
+
+
+def seed(payments: int) -> None:
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO books_book (title, author, cover, inventory, daily_fee) "
+            "VALUES ('Book', 'Author', 'Hard', 10, 1)"
+        )
+        cursor.execute(
+            "INSERT INTO borrowings_borrowing (borrow_date, expected_return_date, "
+            "book_id_id, user_id_id) "
+            "SELECT now(), now() + interval '7 days', "
+            "(SELECT max(id) FROM books_book), (SELECT min(id) FROM user_user) "
+            "FROM generate_series(1, %s) i",
+            [payments],
+        )
+        cursor.execute(
+            "INSERT INTO borrowings_payment (status, type, session_url, "
+            "session_id, to_pay, borrowing_id_id) "
+            "SELECT 'PENDING', 'PAYMENT', 'https://checkout.stripe.com/' || id, "
+            "'cs_bench_' || id, 7, id FROM borrowings_borrowing "
+            "WHERE book_id_id = (SELECT max(id) FROM books_book)"
+        )
+        cursor.execute("ANALYZE")
+
+
+def events(session_ids: list[str], created: int) -> list[dict]:
+    """One event per session, created a second apart before ``created``"""
+    return [
+        checkout_event(
+            session_id,
+            "checkout.session.expired" if number % 5 == 0 else
+            "checkout.session.completed",
+            created=created - len(session_ids) + number,
+        )
+        for number, session_id in enumerate(session_ids)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=100_000)
+    parser.add_argument("--new", type=int, default=1_000)
+    args = parser.parse_args()
+
+    old_config = setup_django()
+
+    import stripe
+    from django.contrib.auth import get_user_model
+    from django.test import override_settings
+
+    from borrowings import reconciliation
+    from borrowings.models import Payment, StripeEventWatermark
+    from borrowings.webhooks import apply_events
+
+    server = FakeStripeServer().start()
+    rows = []
+
+    def run(stage: str) -> None:
+        started = time.perf_counter()
+        result = reconciliation.reconcile_payments()
+        seconds = time.perf_counter() - started
+        rows.append({
+            "stage": stage,
+            **result,
+            "seconds": seconds,
+            "events_per_second": result["events"] / seconds,
+        })
+
+    def apply_one_by_one(stripe_events):
+        return sum(apply_events([event]) for event in stripe_events)
+
+    try:
+        get_user_model().objects.create_user("bench@library.com", "password")
+        seed(args.sessions + args.new)
+        seeded = Payment.objects.filter(session_id__startswith="cs_bench_")
+        session_ids = list(
+            seeded.order_by("id").values_list("session_id", flat=True)
+        )
+        now = int(time.time())
+        server.add_events(events(session_ids[:args.sessions], now - args.new))
+
+        with override_settings(
+                PAYMENT_GATEWAY="borrowings.payment_gateway.StripeGateway"
+        ), patch.multiple(stripe, api_base=server.url, api_key="sk_bench"), \
+                patch("borrowings.webhooks.send_notification"):
+            with patch.object(reconciliation, "apply_events", apply_one_by_one):
+                run("first run, UPDATE per event")
+
+            seeded.update(status="PENDING")
+            StripeEventWatermark.objects.all().delete()
+            run("first run, UPDATE per page")
+
+            server.add_events(events(session_ids[args.sessions:], now))
+            run(f"incremental run, {args.new} new events")
+            run("incremental run, nothing new")
+
+            assert not seeded.filter(status="PENDING").exists()
+    finally:
+        server.shutdown()
+        server.server_close()
+        teardown_django(old_config)
+
+    print_table(
+        f"Payment reconciliation, {args.sessions} sessions on the provider, "
+        f"{len(server.events)} events",
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Serialization and rendering throughput of the list endpoints.
+
+Seeds ``--rows`` books, borrowings and payments with SQL and reports
+rows/second for the DRF ModelSerializer with JSONRenderer and for the
+values fast path with ORJSONRenderer: serializing rows already fetched,
+rendering, and both including the query.
+
+    python -m benchmarks.serialization --rows 20000
+"""
+import argparse
+import time
+
+from benchmarks.common import print_table, setup_django, teardown_django
+from benchmarks.list_endpoints import seed
+
+
+def rows_per_second(func, rows: int, repeat: int) -> float:
+    best = float("inf")
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+
+    return rows / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    old_config = setup_django()
+
+    from rest_framework.renderers import JSONRenderer
+
+    from books.models import Book
+    from books.serializers import BooksSerializer
+    from borrowings.models import Borrowing, Payment
+    from borrowings.serializers import BorrowingSerializer, PaymentSerializer
+    from library_project.eager_loading import eager_load
+    from library_project.fast_serializers import get_values_serializer
+    from library_project.renderers import ORJSONRenderer
+
+    results = []
+    try:
+        seed(args.rows)
+
+        for name, model, serializer_class in (
+                ("books", Book, BooksSerializer),
+                ("borrowings", Borrowing, BorrowingSerializer),
+                ("payments", Payment, PaymentSerializer),
+        ):
+            queryset = eager_load(model.objects.order_by("-id"), serializer_class)[:args.rows]
+            fast = get_values_serializer(serializer_class)
+            instances = list(queryset)
+            values = list(fast.values(queryset))
+            count = len(values)
+
+            drf_data = serializer_class(instances, many=True).data
+            fast_data = fast.to_representation(values)
+            assert JSONRenderer().render(drf_data) == ORJSONRenderer().render(fast_data)
+
+            def drf_serialize():
+                return serializer_class(instances, many=True).data
+
+            def fast_serialize():
+                return fast.to_representation(values)
+
+            def drf_end_to_end():
+                return JSONRenderer().render(
+                    serializer_class(list(queryset), many=True).data
+                )
+
+            def fast_end_to_end():
+                return ORJSONRenderer().render(
+                    fast.to_representation(fast.values(queryset))
+                )
+
+            for path, serialize, render, end_to_end in (
+                    ("ModelSerializer + json", drf_serialize,
+                     lambda: JSONRenderer().render(drf_data), drf_end_to_end),
+                    ("values + orjson", fast_serialize,
+                     lambda: ORJSONRenderer().render(fast_data), fast_end_to_end),
+            ):
+                results.append({
+                    "endpoint": name,
+                    "path": path,
+                    "serialize_rows_s": rows_per_second(serialize, count, args.repeat),
+                    "render_rows_s": rows_per_second(render, count, args.repeat),
+                    "with_query_rows_s": rows_per_second(end_to_end, count, args.repeat),
+                })
+    finally:
+        teardown_django(old_config)
+
+    print_table(f"Serialization throughput, {args.rows} rows", results)
+
+
+if __name__ == "__main__":
+    main()
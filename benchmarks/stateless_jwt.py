@@ -0,0 +1,78 @@
+"""
+Authenticated catalog reads with and without the stateless JWT user.
+
+Issues tokens for ``--users`` users and sends ``--calls`` authenticated
+requests to ``/api/books/books/`` from ``--workers`` threads, loading
+the user of every request from the database and resolving it from the
+token claims (``JWT_STATELESS_USER``). Uses Redis when REDIS_URL is set,
+the local memory cache otherwise.
+
+    REDIS_URL=redis://localhost:6379/0 python -m benchmarks.stateless_jwt
+"""
+import argparse
+import itertools
+
+from benchmarks.common import print_table, run_concurrently, setup_django, teardown_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--calls", type=int, default=5_000)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    old_config = setup_django()
+
+    from django.contrib.auth import get_user_model
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test import override_settings
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIClient
+
+    from user.serializers import TokenObtainPairSerializer
+
+    rows = []
+    try:
+        tokens = itertools.cycle([
+            str(TokenObtainPairSerializer.get_token(
+                get_user_model().objects.create_user(
+                    f"reader{number}@library.com", "password"
+                )
+            ).access_token)
+            for number in range(args.users)
+        ])
+
+        def request():
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {next(tokens)}")
+            response = client.get("/api/books/books/")
+            assert response.status_code == 200, response.status_code
+
+        for mode, stateless in (("database user", False), ("stateless user", True)):
+            cache.clear()
+            with override_settings(JWT_STATELESS_USER=stateless):
+                # warm the catalog and user version caches
+                for _ in range(args.users):
+                    request()
+
+                with CaptureQueriesContext(connection) as queries:
+                    request()
+
+                rows.append({
+                    "mode": mode,
+                    **run_concurrently(request, args.calls, args.workers),
+                    "queries": len(queries),
+                })
+    finally:
+        teardown_django(old_config)
+
+    print_table(
+        f"GET /api/books/books/, {args.calls} calls, {args.workers} workers",
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
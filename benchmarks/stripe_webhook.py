@@ -0,0 +1,153 @@
+"""
+Stripe webhook ingestion on a synthetic data set.
+
+Seeds ``--payments`` pending payments with SQL, posts one signed
+``checkout.session.completed`` event per payment through
+``benchmarks/fake_stripe.py`` from ``--workers`` threads, applies them
+with the batch task and then reads the success page. The success page
+before the webhook is emulated by a Session.retrieve stub sleeping
+``--stripe-latency`` ms followed by the payment update.
+
+    python -m benchmarks.stripe_webhook --payments 20000 --workers 8
+"""
+import argparse
+import time
+from unittest.mock import patch
+
+from benchmarks.common import print_table, run_concurrently, setup_django, teardown_django
+from benchmarks.fake_stripe import checkout_event, send_events
+
+SECRET = "whsec_benchmark"
+
+
+def seed(payments: int) -> None:
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO books_book (title, author, cover, inventory, daily_fee) "
+            "VALUES ('Book', 'Author', 'Hard', 10, 1)"
+        )
+        cursor.execute(
+            "INSERT INTO borrowings_borrowing (borrow_date, expected_return_date, "
+            "book_id_id, user_id_id) "
+            "SELECT now(), now() + interval '7 days', "
+            "(SELECT max(id) FROM books_book), (SELECT min(id) FROM user_user) "
+            "FROM generate_series(1, %s) i",
+            [payments],
+        )
+        cursor.execute(
+            "INSERT INTO borrowings_payment (status, type, session_url, "
+            "session_id, to_pay, borrowing_id_id) "
+            "SELECT 'PENDING', 'PAYMENT', 'https://checkout.stripe.com/' || id, "
+            "'cs_bench_' || id, 7, id FROM borrowings_borrowing"
+        )
+        cursor.execute("ANALYZE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--payments", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--stripe-latency", type=float, default=300)
+    parser.add_argument("--page-calls", type=int, default=400)
+    args = parser.parse_args()
+
+    old_config = setup_django()
+
+    from django.contrib.auth import get_user_model
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+
+    from borrowings.models import Payment
+    from borrowings.webhooks import process_events
+
+    rows = []
+    try:
+        admin = get_user_model().objects.create_superuser("admin@bench.com", "password")
+        seed(args.payments)
+        payments = list(Payment.objects.values_list("session_id", "borrowing_id"))
+
+        def post(payload, signature):
+            return APIClient().post(
+                "/api/borrowings/webhooks/stripe/",
+                payload,
+                content_type="application/json",
+                HTTP_STRIPE_SIGNATURE=signature,
+            ).status_code
+
+        def retrieve(session_id):
+            time.sleep(args.stripe_latency / 1000)
+            return {"payment_status": "paid"}
+
+        sample = iter(payments * 2)
+
+        def success_before():
+            session_id, _ = next(sample)
+            payment = Payment.objects.get(session_id=session_id)
+            if retrieve(session_id)["payment_status"] == "paid":
+                payment.status = "PAID"
+                payment.save()
+
+        def success_after():
+            session_id, borrowing_id = next(sample)
+            client = APIClient()
+            client.force_authenticate(admin)
+            client.get(
+                f"/api/borrowings/borrowings/{borrowing_id}/success/",
+                {"session_id": session_id},
+            )
+
+        with override_settings(STRIPE_WEBHOOK_SECRET=SECRET), \
+                patch("borrowings.tasks.process_stripe_events.apply_async"), \
+                patch("borrowings.webhooks.send_notification"):
+            rows.append({
+                "stage": "success page, Session.retrieve per request",
+                **run_concurrently(success_before, args.page_calls, args.workers),
+            })
+            Payment.objects.update(status="PENDING")
+
+            started = time.perf_counter()
+            statuses = send_events(
+                post,
+                [checkout_event(session_id) for session_id, _ in payments],
+                SECRET,
+                args.workers,
+            )
+            seconds = time.perf_counter() - started
+            assert set(statuses) == {200}, set(statuses)
+            rows.append({
+                "stage": "webhook ingestion",
+                "calls": len(payments),
+                "seconds": seconds,
+                "per_second": len(payments) / seconds,
+            })
+
+            started = time.perf_counter()
+            processed = process_events()
+            seconds = time.perf_counter() - started
+            assert processed == len(payments)
+            assert not Payment.objects.exclude(status="PAID").exists()
+            rows.append({
+                "stage": "batch processing",
+                "calls": processed,
+                "seconds": seconds,
+                "per_second": processed / seconds,
+            })
+
+            rows.append({
+                "stage": "success page, local state",
+                **run_concurrently(success_after, args.page_calls, args.workers),
+            })
+    finally:
+        teardown_django(old_config)
+
+    columns = ("stage", "calls", "seconds", "per_second", "p50", "p99")
+    print_table(
+        f"Stripe webhook, {args.payments} payments, {args.workers} workers",
+        [{column: row.get(column, "") for column in columns} for row in rows],
+    )
+
+
+if __name__ == "__main__":
+    main()
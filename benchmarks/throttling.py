@@ -0,0 +1,124 @@
+"""
+Token bucket throttles and the external call cap under concurrent load.
+
+``--workers`` threads send ``--calls`` requests of one user to a
+throttled endpoint at once and count how many the buckets let through
+(without throttling all of them reached Stripe and Telegram), with the
+latency each decision adds to a request. Then every worker makes
+external calls of ``--call-ms`` in the slots of
+EXTERNAL_CALL_CONCURRENCY and the peak of calls running at once is
+compared to the cap. Needs REDIS_URL to point to a Redis server.
+
+    REDIS_URL=redis://localhost:6379/0 python -m benchmarks.throttling
+"""
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+
+from benchmarks.common import percentile, print_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=5_000)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--rate", default="100/min")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--call-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "library_project.settings")
+    django.setup()
+
+    from django.test import override_settings
+
+    from library_project import throttling
+    from library_project.redis_client import get_redis
+
+    client = get_redis()
+
+    if client is None:
+        parser.error("REDIS_URL is not set")
+
+    for key in client.scan_iter("throttle:*"):
+        client.delete(key)
+
+    rates = {"user": "1000000/min", "borrowing": args.rate}
+    latencies = []
+    allowed = 0
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def request(_):
+        nonlocal allowed
+        started = time.perf_counter()
+        wait = throttling.take_tokens("bench", "borrowing")
+        elapsed = (time.perf_counter() - started) * 1000
+
+        with lock:
+            latencies.append(elapsed)
+            allowed += not wait
+
+    def external_call(_):
+        nonlocal running, peak
+
+        while (holder := throttling.acquire_slot()) is None:
+            time.sleep(0.001)
+
+        with lock:
+            running += 1
+            peak = max(peak, running)
+
+        time.sleep(args.call_ms / 1000)
+
+        with lock:
+            running -= 1
+
+        throttling.release_slot(holder)
+
+    with override_settings(
+            THROTTLE_RATES=rates, EXTERNAL_CALL_CONCURRENCY=args.concurrency
+    ):
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            list(executor.map(request, range(args.calls)))
+
+        print_table(
+            f"{args.calls} requests of one user on {args.workers} threads, "
+            f"rate {args.rate}",
+            [
+                {
+                    "throttling": "none (before)",
+                    "allowed": args.calls,
+                    "p50_ms": 0.0,
+                    "p99_ms": 0.0,
+                },
+                {
+                    "throttling": "token buckets",
+                    "allowed": allowed,
+                    "p50_ms": percentile(latencies, 50),
+                    "p99_ms": percentile(latencies, 99),
+                },
+            ],
+        )
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            list(executor.map(external_call, range(args.workers * 10)))
+
+        print_table(
+            f"{args.workers * 10} external calls of {args.call_ms} ms",
+            [{
+                "cap": args.concurrency,
+                "peak_at_once": peak,
+                "seconds": time.perf_counter() - started,
+            }],
+        )
+
+
+if __name__ == "__main__":
+    main()
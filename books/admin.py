@@ -1,5 +1,22 @@
 from django.contrib import admin
 
 from books.models import Book
+from books.search import search_books
+from library_project.pagination import EstimatedCountPaginator
 
-admin.site.register(Book)
+
+@admin.register(Book)
+class BookAdmin(admin.ModelAdmin):
+    list_display = ("id", "title", "author", "cover", "inventory", "daily_fee")
+    list_filter = ("cover",)
+    search_fields = ("title", "author")
+    ordering = ("id",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        """Searches like the catalog, with its full-text and trigram indexes"""
+        if not search_term.strip():
+            return queryset, False
+
+        return search_books(queryset, search_term), False
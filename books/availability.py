@@ -0,0 +1,150 @@
+"""
+Availability projection of the catalog: active loans, next expected
+return and total borrowings of every book (BookAvailability).
+
+Borrowings and returns change it in their own transaction, after the
+inventory change has locked the book row and dropped the cached book,
+so concurrent loans of a book apply one after another. Anything else
+that changes borrowings (admin edits, deletes) lets it drift:
+reconcile() recomputes a range of books from their borrowings and
+rewrites only the rows that differ.
+"""
+from collections import Counter
+
+from django.db import connection
+
+from books import cache
+from books.models import Book, BookAvailability
+from borrowings.models import Borrowing
+
+AVAILABILITY = BookAvailability._meta.db_table
+BORROWING = Borrowing._meta.db_table
+BORROWING_BOOK = Borrowing._meta.get_field("book_id").column
+
+
+def create_availability(book_ids: list[int]) -> None:
+    """Empty projection of new books"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {AVAILABILITY} "
+            "(book_id, active_loans, total_borrowings) "
+            "SELECT id, 0, 0 FROM unnest(%s::bigint[]) AS book (id) "
+            "ON CONFLICT (book_id) DO NOTHING",
+            [book_ids],
+        )
+
+
+def record_borrowings(borrowings: list[Borrowing]) -> None:
+    """Counts new borrowings in the projection of their books"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {AVAILABILITY} AS availability "
+            "(book_id, active_loans, total_borrowings, next_expected_return) "
+            "SELECT book_id, count(*), count(*), min(expected_return_date) "
+            "FROM unnest(%s::bigint[], %s::timestamptz[]) "
+            "AS loan (book_id, expected_return_date) "
+            "GROUP BY book_id ORDER BY book_id "
+            "ON CONFLICT (book_id) DO UPDATE SET "
+            "active_loans = availability.active_loans + EXCLUDED.active_loans, "
+            "total_borrowings = "
+            "availability.total_borrowings + EXCLUDED.total_borrowings, "
+            # LEAST skips the NULL of a book with no active loans
+            "next_expected_return = LEAST("
+            "availability.next_expected_return, EXCLUDED.next_expected_return)",
+            [
+                [borrowing.book_id_id for borrowing in borrowings],
+                [borrowing.expected_return_date for borrowing in borrowings],
+            ],
+        )
+
+
+def record_return(borrowing: Borrowing) -> None:
+    """
+    Takes a returned borrowing out of the active loans of its book. The
+    next expected return is looked up again only when it was this one.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {AVAILABILITY} SET active_loans = active_loans - 1, "
+            "next_expected_return = CASE "
+            "WHEN next_expected_return < %s THEN next_expected_return "
+            f"ELSE (SELECT min(expected_return_date) FROM {BORROWING} "
+            f"WHERE {BORROWING_BOOK} = %s AND actual_return_date IS NULL) "
+            "END "
+            "WHERE book_id = %s",
+            [borrowing.expected_return_date, borrowing.book_id_id, borrowing.book_id_id],
+        )
+
+
+def record_returns(borrowings: list[Borrowing]) -> None:
+    """
+    Takes many returned borrowings out of the active loans of their
+    books, their next expected return is looked up again
+    """
+    returned = Counter(borrowing.book_id_id for borrowing in borrowings)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {AVAILABILITY} AS availability "
+            "SET active_loans = availability.active_loans - returned.loans, "
+            "next_expected_return = (SELECT min(expected_return_date) "
+            f"FROM {BORROWING} WHERE {BORROWING_BOOK} = availability.book_id "
+            "AND actual_return_date IS NULL) "
+            "FROM unnest(%s::bigint[], %s::int[]) AS returned (book_id, loans) "
+            "WHERE availability.book_id = returned.book_id",
+            [list(returned), list(returned.values())],
+        )
+
+
+def reconcile(first_id: int, last_id: int) -> list[int]:
+    """
+    Recomputes the projection of the books with ids in the range from
+    their borrowings, creates the missing rows and returns the ids of
+    the books whose projection was wrong. Must run in a transaction.
+    """
+    with connection.cursor() as cursor:
+        # locked books can not be borrowed or returned until the end of
+        # the transaction, so the recount below sees every loan that
+        # was recorded in the projection and no newer one
+        cursor.execute(
+            f"SELECT id FROM {Book._meta.db_table} "
+            "WHERE id BETWEEN %s AND %s ORDER BY id FOR SHARE",
+            [first_id, last_id],
+        )
+        cursor.execute(
+            f"INSERT INTO {AVAILABILITY} AS availability "
+            "(book_id, active_loans, next_expected_return, total_borrowings) "
+            "SELECT book.id, "
+            "count(borrowing.id) FILTER (WHERE actual_return_date IS NULL), "
+            "min(expected_return_date) FILTER (WHERE actual_return_date IS NULL), "
+            "count(borrowing.id) "
+            f"FROM {Book._meta.db_table} AS book "
+            f"LEFT JOIN {BORROWING} AS borrowing "
+            f"ON borrowing.{BORROWING_BOOK} = book.id "
+            "WHERE book.id BETWEEN %s AND %s "
+            "GROUP BY book.id ORDER BY book.id "
+            "ON CONFLICT (book_id) DO UPDATE SET "
+            "active_loans = EXCLUDED.active_loans, "
+            "next_expected_return = EXCLUDED.next_expected_return, "
+            "total_borrowings = EXCLUDED.total_borrowings "
+            "WHERE (availability.active_loans, availability.next_expected_return, "
+            "availability.total_borrowings) IS DISTINCT FROM "
+            "(EXCLUDED.active_loans, EXCLUDED.next_expected_return, "
+            "EXCLUDED.total_borrowings) "
+            "RETURNING book_id",
+            [first_id, last_id],
+        )
+        repaired = [book_id for book_id, in cursor.fetchall()]
+
+        if repaired:
+            # the availability is part of the representation of a book
+            cursor.execute(
+                f"UPDATE {Book._meta.db_table} SET updated_at = now() "
+                "WHERE id = ANY(%s)",
+                [repaired],
+            )
+
+    for book_id in repaired:
+        cache.invalidate_inventory(book_id)
+
+    return repaired
@@ -0,0 +1,165 @@
+"""
+Read-through cache of the serialized book catalog.
+
+Book details and list pages are cached under keys that contain a version
+number. Changing a book bumps its version and the catalog version, so
+the old entries are never read again and simply expire. Borrowings and
+returns bump only the version of the book, list pages show their
+inventory at most ``CATALOG_CACHE_MAX_STALENESS`` seconds late. The
+entries hold the conditional GET validators of the data with it.
+"""
+import hashlib
+import time
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+CATALOG_VERSION_KEY = "catalog:version"
+HITS_KEY = "catalog:stats:hits"
+MISSES_KEY = "catalog:stats:misses"
+LOCK_POLL_INTERVAL = 0.05
+
+
+def _get_version(key: str) -> int:
+    version = cache.get(key)
+
+    if version is None:
+        # a missing version is a new one, so entries left under an
+        # evicted counter can not be read again after it restarts
+        version = time.time_ns()
+        cache.add(key, version, timeout=None)
+        version = cache.get(key, version)
+
+    return version
+
+
+def _bump_version(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def _book_version_key(book_id: int) -> str:
+    return f"catalog:book:{book_id}:version"
+
+
+def _count(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def _bump_after_commit(*keys: str) -> None:
+    """
+    Bumps now, so the rest of this transaction reads fresh entries, and
+    again after commit, dropping what concurrent readers cached from the
+    data before the commit
+    """
+    for key in keys:
+        _bump_version(key)
+
+    transaction.on_commit(lambda: [_bump_version(key) for key in keys])
+
+
+def invalidate_book(book_id: int) -> None:
+    """Book data changed, drops its detail and every list page"""
+    _bump_after_commit(_book_version_key(book_id), CATALOG_VERSION_KEY)
+
+
+def invalidate_inventory(book_id: int) -> None:
+    """Inventory of the book changed, drops its detail only"""
+    _bump_after_commit(_book_version_key(book_id))
+
+
+def invalidate_books(book_ids: list[int]) -> None:
+    """
+    Many books changed at once, drops their details and every list page.
+    Deleted versions start again from a new value, like evicted ones.
+    """
+    keys = [_book_version_key(book_id) for book_id in book_ids]
+    cache.delete_many(keys)
+    _bump_version(CATALOG_VERSION_KEY)
+
+    def after_commit():
+        cache.delete_many(keys)
+        _bump_version(CATALOG_VERSION_KEY)
+
+    transaction.on_commit(after_commit)
+
+
+def read_through(key: str, compute: Callable[[], Any], timeout: int) -> Any:
+    """
+    Cached value of the key, computed on a miss. Only one process computes
+    a missing key at a time, the others wait for its result for up to
+    ``CATALOG_CACHE_LOCK_TIMEOUT`` seconds instead of all hitting the
+    database at once.
+    """
+    value = cache.get(key)
+
+    if value is not None:
+        _count(HITS_KEY)
+        return value
+
+    _count(MISSES_KEY)
+    lock_key = f"{key}:lock"
+    deadline = time.monotonic() + settings.CATALOG_CACHE_LOCK_TIMEOUT
+
+    while not cache.add(lock_key, 1, timeout=settings.CATALOG_CACHE_LOCK_TIMEOUT):
+        if time.monotonic() > deadline:
+            return compute()
+
+        time.sleep(LOCK_POLL_INTERVAL)
+        value = cache.get(key)
+
+        if value is not None:
+            return value
+
+    try:
+        value = compute()
+        cache.set(key, value, timeout=timeout)
+    finally:
+        cache.delete(lock_key)
+
+    return value
+
+
+def get_book(book_id: int, compute: Callable[[], Any]) -> Any:
+    version = _get_version(_book_version_key(book_id))
+
+    return read_through(
+        f"catalog:detail:{book_id}:v{version}",
+        compute,
+        settings.CATALOG_CACHE_TIMEOUT,
+    )
+
+
+def get_list_page(url: str, compute: Callable[[], Any]) -> Any:
+    """List page cached by its full url, which holds filters and cursor"""
+    version = _get_version(CATALOG_VERSION_KEY)
+    digest = hashlib.sha1(url.encode()).hexdigest()
+
+    return read_through(
+        f"catalog:page:v{version}:{digest}",
+        compute,
+        settings.CATALOG_CACHE_MAX_STALENESS,
+    )
+
+
+def get_stats() -> dict:
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / total if total else 0.0,
+    }
+
+
+def reset_stats() -> None:
+    cache.delete_many([HITS_KEY, MISSES_KEY])
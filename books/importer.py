@@ -0,0 +1,219 @@
+"""
+Bulk import of the book catalog.
+
+Records are read from CSV or JSON Lines, copied in batches with
+PostgreSQL ``COPY`` into a staging table of text columns, validated there
+with one statement per batch and upserted into ``books_book``: records
+with an ``id`` update the book with that id or create it, records
+without one create new books. A catalog should either have ids or not,
+a book created without one may take an id that comes later in the file.
+Every batch is committed together with
+the ``BookImport`` checkpoint, so an interrupted import resumes after
+the last committed batch.
+"""
+import csv
+import io
+import itertools
+from typing import IO, Callable, Iterable, Iterator
+
+import orjson
+from django.db import connection, transaction
+from django.utils import timezone
+
+from books import cache
+from books.availability import create_availability
+from books.models import Book, BookImport
+
+COLUMNS = ("id", "title", "author", "cover", "inventory", "daily_fee")
+REQUIRED_COLUMNS = COLUMNS[1:]
+STAGING_TABLE = "book_import_staging"
+
+
+class ImportFormatError(Exception):
+    """The input can not be read as a book catalog"""
+
+
+def read_csv(stream: IO[str]) -> Iterator[tuple]:
+    reader = csv.DictReader(stream)
+    missing = set(REQUIRED_COLUMNS) - set(reader.fieldnames or ())
+
+    if missing:
+        raise ImportFormatError(f"Missing columns: {', '.join(sorted(missing))}")
+
+    for record in reader:
+        yield tuple(record.get(column) for column in COLUMNS) + (None,)
+
+
+def read_jsonl(stream: IO[str]) -> Iterator[tuple]:
+    for line in stream:
+        if not line.strip():
+            continue
+
+        try:
+            record = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            yield (None,) * len(COLUMNS) + ("invalid JSON",)
+            continue
+
+        if not isinstance(record, dict):
+            yield (None,) * len(COLUMNS) + ("invalid JSON",)
+            continue
+
+        yield tuple(
+            None if record.get(column) is None else str(record[column])
+            for column in COLUMNS
+        ) + (None,)
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl}
+
+
+def _stage(cursor, first_line: int, records: list[tuple]) -> None:
+    cursor.execute(
+        f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} ("
+        "line bigint, id text, title text, author text, cover text, "
+        "inventory text, daily_fee text, error text)"
+    )
+    cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(
+        (line, *record)
+        for line, record in enumerate(records, start=first_line)
+    )
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {STAGING_TABLE} "
+        "(line, id, title, author, cover, inventory, daily_fee, error) "
+        "FROM STDIN WITH (FORMAT csv)",
+        buffer,
+    )
+
+
+def _validate(cursor) -> None:
+    """Marks the staged records a book can not be made of"""
+    title_length = Book._meta.get_field("title").max_length
+    author_length = Book._meta.get_field("author").max_length
+    daily_fee = Book._meta.get_field("daily_fee")
+    integer_digits = daily_fee.max_digits - daily_fee.decimal_places
+
+    cursor.execute(
+        f"UPDATE {STAGING_TABLE} SET error = CASE "
+        "WHEN coalesce(id, '') !~ '^[0-9]{0,18}$' THEN 'invalid id' "
+        "WHEN length(coalesce(title, '')) NOT BETWEEN 1 AND %s "
+        "THEN 'invalid title' "
+        "WHEN length(coalesce(author, '')) NOT BETWEEN 1 AND %s "
+        "THEN 'invalid author' "
+        "WHEN cover IS NULL OR cover <> ALL(%s) THEN 'invalid cover' "
+        "WHEN coalesce(inventory, '') !~ '^[0-9]{1,9}$' "
+        "THEN 'invalid inventory' "
+        "WHEN coalesce(daily_fee, '') !~ %s THEN 'invalid daily_fee' "
+        "END "
+        "WHERE error IS NULL",
+        [
+            title_length,
+            author_length,
+            Book.CoverChoice.values,
+            rf"^[0-9]{{1,{integer_digits}}}(\.[0-9]{{1,{daily_fee.decimal_places}}})?$",
+        ],
+    )
+
+
+def _upsert(cursor) -> tuple[int, list[int]]:
+    """
+    Writes the valid staged records to the catalog, the last record
+    of an id wins. Returns the number of written books and the ids of
+    the updated ones.
+    """
+    table = Book._meta.db_table
+
+    cursor.execute(
+        f"INSERT INTO {table} (id, title, author, cover, inventory, daily_fee) "
+        "SELECT DISTINCT ON (id::bigint) id::bigint, title, author, cover, "
+        "inventory::integer, daily_fee::numeric "
+        f"FROM {STAGING_TABLE} WHERE error IS NULL AND id <> '' "
+        "ORDER BY id::bigint, line DESC "
+        "ON CONFLICT (id) DO UPDATE SET title = EXCLUDED.title, "
+        "author = EXCLUDED.author, cover = EXCLUDED.cover, "
+        "inventory = EXCLUDED.inventory, daily_fee = EXCLUDED.daily_fee, "
+        "updated_at = now() "
+        # xmax is set on rows that existed before, so these were updated
+        "RETURNING id, xmax <> 0"
+    )
+    rows = cursor.fetchall()
+    updated = [book_id for book_id, is_updated in rows if is_updated]
+    created = [book_id for book_id, is_updated in rows if not is_updated]
+
+    if rows:
+        last_id = max(book_id for book_id, _ in rows)
+        # the id sequence must not hand out the imported ids again
+        cursor.execute(
+            "SELECT setval(pg_get_serial_sequence(%s, 'id'), %s) "
+            "WHERE %s > coalesce(pg_sequence_last_value("
+            "pg_get_serial_sequence(%s, 'id')::regclass), 0)",
+            [table, last_id, last_id, table],
+        )
+
+    cursor.execute(
+        f"INSERT INTO {table} (title, author, cover, inventory, daily_fee) "
+        "SELECT title, author, cover, inventory::integer, daily_fee::numeric "
+        f"FROM {STAGING_TABLE} "
+        "WHERE error IS NULL AND coalesce(id, '') = '' ORDER BY line "
+        "RETURNING id"
+    )
+    created.extend(book_id for book_id, in cursor.fetchall())
+    create_availability(created)
+
+    return len(created) + len(updated), updated
+
+
+def _rejects(cursor) -> list[tuple[int, str]]:
+    cursor.execute(
+        f"SELECT line, error FROM {STAGING_TABLE} "
+        "WHERE error IS NOT NULL ORDER BY line"
+    )
+    return cursor.fetchall()
+
+
+def import_batch(job: BookImport, records: list[tuple]) -> list[tuple[int, str]]:
+    """
+    Imports a batch of records read after ``job.position`` and moves the
+    checkpoint past them. Returns the rejected record numbers and reasons.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        _stage(cursor, job.position + 1, records)
+        _validate(cursor)
+        imported, updated = _upsert(cursor)
+        rejects = _rejects(cursor)
+
+        if updated:
+            cache.invalidate_books(updated)
+
+        job.position += len(records)
+        job.imported += imported
+        job.rejected += len(rejects)
+        job.save(update_fields=["position", "imported", "rejected"])
+
+    return rejects
+
+
+def import_books(
+        job: BookImport,
+        records: Iterable[tuple],
+        batch_size: int,
+        on_batch: Callable[[BookImport, list[tuple[int, str]]], None],
+) -> BookImport:
+    """
+    Imports the records after the checkpoint of the job, calling
+    ``on_batch(job, rejects)`` after every committed batch
+    """
+    records = itertools.islice(records, job.position, None)
+
+    while batch := list(itertools.islice(records, batch_size)):
+        on_batch(job, import_batch(job, batch))
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=["finished_at"])
+
+    return job
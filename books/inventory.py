@@ -0,0 +1,120 @@
+from collections import Counter
+
+from django.db import connection
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from books import cache
+from books.models import Book
+
+
+class OutOfStock(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "This book is out of stock."
+    default_code = "out_of_stock"
+
+
+def _change_inventory(book_id: int, delta: int) -> int | None:
+    """
+    Changes the inventory with one conditional UPDATE and returns
+    the new value, or None if the book had no copy to take.
+    The book_inventory_non_negative constraint guards the same rule.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {Book._meta.db_table} "
+            "SET inventory = inventory + %s, updated_at = now() "
+            "WHERE id = %s AND inventory + %s >= 0 "
+            "RETURNING inventory",
+            [delta, book_id, delta],
+        )
+        row = cursor.fetchone()
+
+    if row is None:
+        return None
+
+    cache.invalidate_inventory(book_id)
+    return row[0]
+
+
+def take_copy(book: Book) -> Book:
+    """Takes one copy of the book, raises OutOfStock if none is left"""
+    inventory = _change_inventory(book.id, -1)
+
+    if inventory is None:
+        raise OutOfStock(f"Do not enough {book.title} book in inventory")
+
+    book.inventory = inventory
+    return book
+
+
+def take_copies(books: list[Book]) -> list[Book]:
+    """
+    Takes one copy of every book, a book listed twice gives two copies.
+    All or nothing: raises OutOfStock naming the books that have not
+    enough copies left, the caller's transaction must roll back then.
+    """
+    wanted = Counter(book.id for book in books)
+    table = Book._meta.db_table
+
+    with connection.cursor() as cursor:
+        # rows are locked in id order, so concurrent checkouts of the
+        # same books wait for each other instead of deadlocking
+        cursor.execute(
+            f"SELECT id FROM {table} WHERE id = ANY(%s) ORDER BY id FOR UPDATE",
+            [list(wanted)],
+        )
+        cursor.execute(
+            f"UPDATE {table} AS book "
+            "SET inventory = book.inventory - wanted.copies, updated_at = now() "
+            "FROM unnest(%s::bigint[], %s::int[]) AS wanted (id, copies) "
+            "WHERE book.id = wanted.id AND book.inventory >= wanted.copies "
+            "RETURNING book.id, book.inventory",
+            [list(wanted), list(wanted.values())],
+        )
+        inventory = dict(cursor.fetchall())
+
+    missing = dict.fromkeys(
+        book.title for book in books if book.id not in inventory
+    )
+    if missing:
+        raise OutOfStock(
+            f"Do not enough {', '.join(missing)} book in inventory"
+        )
+
+    for book_id in wanted:
+        cache.invalidate_inventory(book_id)
+
+    for book in books:
+        book.inventory = inventory[book.id]
+
+    return books
+
+
+def return_copy(book: Book) -> Book:
+    """Puts one copy of the book back to the inventory"""
+    book.inventory = _change_inventory(book.id, 1)
+    return book
+
+
+def return_copies(book_ids: list[int]) -> None:
+    """Puts one copy of every book back, a book listed twice gets two"""
+    returned = Counter(book_ids)
+    table = Book._meta.db_table
+
+    with connection.cursor() as cursor:
+        # locked in id order like take_copies
+        cursor.execute(
+            f"SELECT id FROM {table} WHERE id = ANY(%s) ORDER BY id FOR UPDATE",
+            [sorted(returned)],
+        )
+        cursor.execute(
+            f"UPDATE {table} AS book "
+            "SET inventory = book.inventory + returned.copies, updated_at = now() "
+            "FROM unnest(%s::bigint[], %s::int[]) AS returned (id, copies) "
+            "WHERE book.id = returned.id",
+            [list(returned), list(returned.values())],
+        )
+
+    for book_id in returned:
+        cache.invalidate_inventory(book_id)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from books import cache
+
+
+class Command(BaseCommand):
+    """Django command that reports the hit ratio of the catalog cache"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Start counting hits and misses from zero.",
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        stats = cache.get_stats()
+        self.stdout.write(
+            f"Hits: {stats['hits']}, misses: {stats['misses']}, "
+            f"hit ratio: {stats['hit_ratio']:.1%}"
+        )
+
+        if options["reset"]:
+            cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
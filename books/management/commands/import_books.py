@@ -0,0 +1,130 @@
+import csv
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from books.importer import READERS, ImportFormatError, import_books
+from books.models import BookImport
+
+
+class Command(BaseCommand):
+    """Django command that imports the book catalog from CSV or JSON Lines"""
+
+    help = (
+        "Imports books with the id, title, author, cover, inventory and "
+        "daily_fee columns. Books with an id are updated or created with "
+        "that id, the others are created."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSON Lines file.")
+        parser.add_argument(
+            "--format",
+            choices=sorted(READERS),
+            help="Format of the file, by default taken from its extension.",
+        )
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Continue an interrupted import of the same file.",
+        )
+        parser.add_argument(
+            "--rejects",
+            help="Write the rejected record numbers and reasons to this CSV file.",
+        )
+
+    def get_job(self, path: str, resume: bool) -> BookImport:
+        stat = os.stat(path)
+        job, created = BookImport.objects.get_or_create(
+            source=path,
+            defaults={"size": stat.st_size, "modified": stat.st_mtime},
+        )
+
+        if resume and not created:
+            if (job.size, job.modified) != (stat.st_size, stat.st_mtime):
+                raise CommandError(
+                    f"{path} changed since the interrupted import, "
+                    "import it again without --resume."
+                )
+            return job
+
+        job.size = stat.st_size
+        job.modified = stat.st_mtime
+        job.position = job.imported = job.rejected = 0
+        job.started_at = timezone.now()
+        job.finished_at = None
+        job.save()
+
+        return job
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        path = os.path.abspath(options["path"])
+        file_format = (
+            options["format"] or os.path.splitext(path)[1].lstrip(".").lower()
+        )
+
+        if file_format not in READERS:
+            raise CommandError(
+                f"Unknown format {file_format!r}, use --format "
+                f"{' or '.join(sorted(READERS))}."
+            )
+
+        try:
+            job = self.get_job(path, options["resume"])
+        except FileNotFoundError:
+            raise CommandError(f"{path} does not exist.")
+
+        if job.finished_at:
+            self.stdout.write(f"{path} is already imported.")
+            return
+
+        rejects_file = None
+        if options["rejects"]:
+            rejects_file = open(
+                options["rejects"],
+                "a" if job.position else "w",
+                newline="",
+            )
+        rejects_writer = rejects_file and csv.writer(rejects_file)
+
+        if job.position:
+            self.stdout.write(f"Resuming after record {job.position}.")
+
+        started = time.perf_counter()
+        start_position = job.position
+
+        def on_batch(job, rejects):
+            if rejects_writer:
+                rejects_writer.writerows(rejects)
+
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{job.position} records: {job.imported} imported, "
+                f"{job.rejected} rejected, "
+                f"{(job.position - start_position) / elapsed:,.0f} records/s"
+            )
+
+        try:
+            with open(path, newline="", encoding="utf-8-sig") as stream:
+                import_books(
+                    job,
+                    READERS[file_format](stream),
+                    options["batch_size"],
+                    on_batch,
+                )
+        except ImportFormatError as error:
+            raise CommandError(str(error))
+        finally:
+            if rejects_file:
+                rejects_file.close()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {job.imported} books, rejected {job.rejected} "
+                f"records in {time.perf_counter() - started:.1f} s."
+            )
+        )
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.3 on 2026-10-18 07:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0004_book_import'),
+        ('borrowings', '0009_borrowing_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookAvailability',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='availability', serialize=False, to='books.book')),
+                ('active_loans', models.IntegerField(default=0)),
+                ('next_expected_return', models.DateTimeField(blank=True, null=True)),
+                ('total_borrowings', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunSQL(
+            """
+            INSERT INTO books_bookavailability
+                (book_id, active_loans, next_expected_return, total_borrowings)
+            SELECT book.id,
+                count(borrowing.id) FILTER (WHERE actual_return_date IS NULL),
+                min(expected_return_date) FILTER (WHERE actual_return_date IS NULL),
+                count(borrowing.id)
+            FROM books_book AS book
+            LEFT JOIN borrowings_borrowing AS borrowing
+                ON borrowing.book_id_id = book.id
+            GROUP BY book.id
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
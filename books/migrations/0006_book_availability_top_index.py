@@ -0,0 +1,20 @@
+# Generated by Django 4.2.3 on 2026-10-18 07:33
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # the index is built concurrently, which can not run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('books', '0005_book_availability'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='bookavailability',
+            index=models.Index(fields=['-total_borrowings', 'book'], name='book_availability_top_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.3 on 2026-10-18 08:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0006_book_availability_top_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        # books inserted by SQL, like the import, get the time of the insert
+        migrations.RunSQL(
+            "ALTER TABLE books_book ALTER COLUMN updated_at SET DEFAULT now()",
+            "ALTER TABLE books_book ALTER COLUMN updated_at DROP DEFAULT",
+        ),
+    ]
@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 from django.core.validators import MinValueValidator
 from django.db import models
 from rest_framework.exceptions import ValidationError
@@ -13,6 +15,32 @@ class Book(models.Model):
     cover = models.CharField(max_length=50, choices=CoverChoice.choices)
     inventory = models.IntegerField(validators=[MinValueValidator(0)])
     daily_fee = models.DecimalField(max_digits=6, decimal_places=2)
+    # also set by the SQL that changes the inventory, for conditional GETs
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            GinIndex(
+                SearchVector("title", "author", config="simple"),
+                name="book_search_vector_idx",
+            ),
+            GinIndex(
+                fields=["title"],
+                name="book_title_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+            GinIndex(
+                fields=["author"],
+                name="book_author_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(inventory__gte=0),
+                name="book_inventory_non_negative",
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.title
@@ -32,3 +60,49 @@ class Book(models.Model):
         return super(Book, self).save(
             force_insert, force_update, using, update_fields
         )
+
+
+class BookAvailability(models.Model):
+    """
+    Loans of a book, kept by every borrowing and return in their
+    transaction (books/availability.py) and repaired when it drifts by
+    the reconcile_availability task
+    """
+
+    book = models.OneToOneField(
+        Book,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="availability",
+    )
+    active_loans = models.IntegerField(default=0)
+    next_expected_return = models.DateTimeField(null=True, blank=True)
+    total_borrowings = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # most borrowed books of the analytics
+            models.Index(
+                fields=["-total_borrowings", "book"],
+                name="book_availability_top_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Availability of book {self.book_id}"
+
+
+class BookImport(models.Model):
+    """Progress of an import_books run, committed with every batch"""
+
+    source = models.CharField(max_length=500, unique=True)
+    size = models.BigIntegerField()
+    modified = models.FloatField()
+    position = models.BigIntegerField(default=0)
+    imported = models.BigIntegerField(default=0)
+    rejected = models.BigIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return self.source
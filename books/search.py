@@ -0,0 +1,39 @@
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramWordSimilarity,
+)
+from django.db.models import F, Q, QuerySet
+from django.db.models.functions import Greatest
+
+# The "simple" configuration does no stemming, so titles in any language
+# match the same way. It must stay equal to the book_search_vector_idx one.
+SEARCH_CONFIG = "simple"
+
+
+def search_books(queryset: QuerySet, term: str) -> QuerySet:
+    """
+    Full-text search over title and author ordered by rank. When no book
+    matches every word, falls back to trigram word similarity, which
+    finds titles and authors written with typos.
+    """
+    query = SearchQuery(term, config=SEARCH_CONFIG, search_type="websearch")
+    matches = queryset.annotate(
+        search=SearchVector("title", "author", config=SEARCH_CONFIG),
+    ).filter(search=query)
+
+    if matches.exists():
+        return matches.annotate(
+            rank=SearchRank(F("search"), query),
+        ).order_by("-rank", "id")
+
+    return queryset.filter(
+        Q(title__trigram_word_similar=term)
+        | Q(author__trigram_word_similar=term)
+    ).annotate(
+        similarity=Greatest(
+            TrigramWordSimilarity(term, "title"),
+            TrigramWordSimilarity(term, "author"),
+        ),
+    ).order_by("-similarity", "id")
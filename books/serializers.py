@@ -1,9 +1,25 @@
 from rest_framework import serializers
 
-from books.models import Book
+from books.models import Book, BookAvailability
+
+
+class BookAvailabilitySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BookAvailability
+        fields = ("active_loans", "next_expected_return", "total_borrowings")
 
 
 class BooksSerializer(serializers.ModelSerializer):
+    availability = BookAvailabilitySerializer(read_only=True)
+
     class Meta:
         model = Book
-        fields = ("id", "title", "author", "cover", "inventory", "daily_fee")
+        fields = (
+            "id",
+            "title",
+            "author",
+            "cover",
+            "inventory",
+            "daily_fee",
+            "availability",
+        )
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from books import cache
+from books.availability import create_availability
+from books.models import Book
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_cached_book(sender, instance, **kwargs):
+    cache.invalidate_book(instance.id)
+
+
+@receiver(post_save, sender=Book)
+def create_book_availability(sender, instance, created, raw, **kwargs):
+    # fixtures may be loaded before the projection table exists,
+    # reconcile_availability creates the rows of their books
+    if created and not raw:
+        create_availability([instance.id])
@@ -0,0 +1,49 @@
+import logging
+
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from books.availability import reconcile
+from books.models import Book
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_CURSOR_KEY = "availability:reconcile:cursor"
+
+
+@shared_task
+def reconcile_availability() -> int:
+    """
+    Checks the availability projection of the next
+    ``AVAILABILITY_RECONCILE_BATCH_SIZE`` books after the cursor and
+    repairs the rows that drifted, going around the whole catalog over
+    successive runs. Returns the number of repaired books.
+    """
+    first_id = cache.get(RECONCILE_CURSOR_KEY, 0)
+    book_ids = list(
+        Book.objects.filter(id__gte=first_id).order_by("id").values_list(
+            "id", flat=True
+        )[:settings.AVAILABILITY_RECONCILE_BATCH_SIZE]
+    )
+
+    if not book_ids:
+        cache.set(RECONCILE_CURSOR_KEY, 0, timeout=None)
+        return 0
+
+    with transaction.atomic():
+        repaired = reconcile(book_ids[0], book_ids[-1])
+
+    if len(book_ids) < settings.AVAILABILITY_RECONCILE_BATCH_SIZE:
+        # the end of the catalog, the next run starts over
+        cache.set(RECONCILE_CURSOR_KEY, 0, timeout=None)
+    else:
+        cache.set(RECONCILE_CURSOR_KEY, book_ids[-1] + 1, timeout=None)
+
+    if repaired:
+        logger.warning(
+            "Repaired the availability of %s books: %s", len(repaired), repaired
+        )
+
+    return len(repaired)
@@ -0,0 +1,126 @@
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books.models import Book, BookAvailability
+from books.tasks import reconcile_availability
+from borrowings.models import Borrowing
+
+BORROWING_URL = reverse("borrowings:borrowing-list")
+
+
+def sample_book(**params):
+    defaults = {
+        "title": "Harry Potter",
+        "author": "J.K. Rowling",
+        "cover": "Hard",
+        "inventory": 5,
+        "daily_fee": 1,
+    }
+    defaults.update(params)
+
+    return Book.objects.create(**defaults)
+
+
+def availability(book):
+    return BookAvailability.objects.values(
+        "active_loans", "next_expected_return", "total_borrowings"
+    ).get(book=book)
+
+
+@override_settings(
+    PAYMENT_GATEWAY="borrowings.tests.test_payment_gateway.FlakyGateway"
+)
+@patch("borrowings.serializers.send_borrowing_create_message")
+class AvailabilityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "reader@library.com", "password"
+        )
+        self.client.force_authenticate(self.user)
+        self.book = sample_book()
+
+    def borrow(self, expected_return_date):
+        response = self.client.post(
+            BORROWING_URL,
+            {"book_id": self.book.id, "expected_return_date": expected_return_date},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        return response.data["id"]
+
+    def test_borrowings_and_returns_update_the_projection(self, send_message):
+        first = self.borrow("2099-12-01T00:00:00Z")
+        self.borrow("2099-12-20T00:00:00Z")
+
+        self.assertEqual(availability(self.book), {
+            "active_loans": 2,
+            "next_expected_return": datetime(2099, 12, 1, tzinfo=timezone.utc),
+            "total_borrowings": 2,
+        })
+
+        response = self.client.post(
+            reverse("borrowings:borrowing-return-book", args=[first])
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(availability(self.book), {
+            "active_loans": 1,
+            "next_expected_return": datetime(2099, 12, 20, tzinfo=timezone.utc),
+            "total_borrowings": 2,
+        })
+
+    def test_book_shows_its_availability(self, send_message):
+        self.borrow("2099-12-01T00:00:00Z")
+
+        response = self.client.get(
+            reverse("books:book-detail", args=[self.book.id])
+        )
+
+        book_availability = response.data["availability"]
+        self.assertEqual(book_availability["active_loans"], 1)
+        self.assertEqual(book_availability["total_borrowings"], 1)
+        self.assertEqual(
+            parse_datetime(book_availability["next_expected_return"]),
+            datetime(2099, 12, 1, tzinfo=timezone.utc),
+        )
+
+    @override_settings(AVAILABILITY_RECONCILE_BATCH_SIZE=2)
+    def test_reconciliation_repairs_drift_batch_by_batch(self, send_message):
+        self.borrow("2099-12-01T00:00:00Z")
+        second_book, third_book = sample_book(), sample_book()
+        # borrowings created around the projection and a lost row
+        Borrowing.objects.create(
+            book_id=third_book,
+            user_id=self.user,
+            expected_return_date=datetime(2099, 1, 1, tzinfo=timezone.utc),
+        )
+        BookAvailability.objects.filter(book=self.book).update(active_loans=5)
+        BookAvailability.objects.filter(book=second_book).delete()
+        cache.set("availability:reconcile:cursor", self.book.id)
+
+        self.assertEqual(reconcile_availability(), 2)
+        self.assertEqual(availability(self.book)["active_loans"], 1)
+        self.assertEqual(availability(second_book)["total_borrowings"], 0)
+        self.assertEqual(availability(third_book)["active_loans"], 0)
+
+        self.assertEqual(reconcile_availability(), 1)
+        self.assertEqual(availability(third_book), {
+            "active_loans": 1,
+            "next_expected_return": datetime(2099, 1, 1, tzinfo=timezone.utc),
+            "total_borrowings": 1,
+        })
+        self.assertEqual(cache.get("availability:reconcile:cursor"), 0)
+
+        cache.set("availability:reconcile:cursor", self.book.id)
+
+        self.assertEqual(reconcile_availability(), 0)
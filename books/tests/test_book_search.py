@@ -0,0 +1,67 @@
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books.models import Book
+
+BOOK_URL = reverse("books:book-list")
+
+
+def sample_book(**params):
+    defaults = {
+        "title": "Harry Potter and the Chamber of Secrets",
+        "author": "J.K. Rowling",
+        "cover": "Hard",
+        "inventory": 5,
+        "daily_fee": 0.5,
+    }
+    defaults.update(params)
+
+    return Book.objects.create(**defaults)
+
+
+class BookSearchApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        # the catalog fixture is loaded by a data migration
+        Book.objects.all().delete()
+        self.potter = sample_book()
+        self.hobbit = sample_book(
+            title="The Hobbit", author="J.R.R. Tolkien", cover="Soft"
+        )
+        self.rings = sample_book(
+            title="The Fellowship of the Ring",
+            author="J.R.R. Tolkien",
+            inventory=0,
+        )
+
+    def search(self, **params):
+        response = self.client.get(BOOK_URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [book["id"] for book in response.data["results"]]
+
+    def test_search_by_title(self):
+        self.assertEqual(self.search(search="potter"), [self.potter.id])
+
+    def test_search_by_author(self):
+        self.assertEqual(
+            sorted(self.search(search="tolkien")),
+            sorted([self.hobbit.id, self.rings.id]),
+        )
+
+    def test_search_tolerates_typos(self):
+        self.assertEqual(self.search(search="hobit"), [self.hobbit.id])
+        self.assertEqual(self.search(search="Tolkein")[:1], [self.hobbit.id])
+
+    def test_search_ranks_most_relevant_first(self):
+        sample_book(title="Ring of Fire", author="Johnny Cash")
+
+        self.assertEqual(self.search(search="fellowship ring")[0], self.rings.id)
+
+    def test_filter_by_cover_and_stock(self):
+        self.assertEqual(self.search(cover="soft"), [self.hobbit.id])
+        self.assertNotIn(self.rings.id, self.search(in_stock="1"))
+        self.assertEqual(
+            self.search(search="tolkien", in_stock="1"), [self.hobbit.id]
+        )
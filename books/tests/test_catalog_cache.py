@@ -0,0 +1,142 @@
+import threading
+import time
+
+from django.core.cache import cache as django_cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books import cache
+from books.inventory import return_copy, take_copy
+from books.models import Book
+
+BOOK_URL = reverse("books:book-list")
+
+
+def detail_url(book_id):
+    return reverse("books:book-detail", args=[book_id])
+
+
+def sample_book(**params):
+    defaults = {
+        "title": "Harry Potter",
+        "author": "J.K. Rowling",
+        "cover": "Hard",
+        "inventory": 5,
+        "daily_fee": 0.5,
+    }
+    defaults.update(params)
+
+    return Book.objects.create(**defaults)
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        django_cache.clear()
+        # the catalog fixture is loaded by a data migration
+        Book.objects.all().delete()
+        self.book = sample_book()
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_cached_detail_and_list_skip_the_database(self):
+        self.get(detail_url(self.book.id))
+        self.get(BOOK_URL)
+
+        with self.assertNumQueries(0):
+            detail = self.get(detail_url(self.book.id))
+            page = self.get(BOOK_URL)
+
+        self.assertEqual(detail["title"], "Harry Potter")
+        self.assertEqual(page["results"][0]["id"], self.book.id)
+
+    def test_book_save_and_delete_invalidate_detail_and_list(self):
+        self.get(detail_url(self.book.id))
+        self.get(BOOK_URL)
+
+        self.book.title = "The Hobbit"
+        self.book.save()
+
+        self.assertEqual(self.get(detail_url(self.book.id))["title"], "The Hobbit")
+        self.assertEqual(self.get(BOOK_URL)["results"][0]["title"], "The Hobbit")
+
+        self.book.delete()
+
+        response = self.client.get(detail_url(self.book.id))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.get(BOOK_URL)["results"], [])
+
+    def test_inventory_change_invalidates_detail_only(self):
+        self.get(detail_url(self.book.id))
+        self.get(BOOK_URL)
+
+        take_copy(self.book)
+
+        self.assertEqual(self.get(detail_url(self.book.id))["inventory"], 4)
+        self.assertEqual(self.get(BOOK_URL)["results"][0]["inventory"], 5)
+
+        return_copy(self.book)
+
+        self.assertEqual(self.get(detail_url(self.book.id))["inventory"], 5)
+
+    @override_settings(CATALOG_CACHE_MAX_STALENESS=0)
+    def test_list_inventory_is_not_staler_than_the_bound(self):
+        self.get(BOOK_URL)
+
+        take_copy(self.book)
+
+        self.assertEqual(self.get(BOOK_URL)["results"][0]["inventory"], 4)
+
+    def test_version_is_bumped_again_after_commit(self):
+        key = f"catalog:book:{self.book.id}:version"
+        version = django_cache.get(key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            take_copy(self.book)
+
+        self.assertEqual(django_cache.get(key), version + 2)
+
+    def test_hit_ratio(self):
+        cache.reset_stats()
+
+        for _ in range(4):
+            self.get(detail_url(self.book.id))
+
+        self.assertEqual(
+            cache.get_stats(), {"hits": 3, "misses": 1, "hit_ratio": 0.75}
+        )
+
+
+class CatalogCacheStampedeTests(TestCase):
+    def setUp(self):
+        django_cache.clear()
+
+    def test_concurrent_misses_compute_once(self):
+        computed = []
+
+        def compute():
+            computed.append(1)
+            time.sleep(0.2)
+            return {"id": 1}
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    cache.read_through("catalog:test", compute, 60)
+                )
+            )
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(computed), 1)
+        self.assertEqual(results, [{"id": 1}] * 8)
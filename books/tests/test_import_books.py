@@ -0,0 +1,150 @@
+import csv
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from books import importer
+from books.models import Book, BookAvailability, BookImport
+
+HEADER = ["id", "title", "author", "cover", "inventory", "daily_fee"]
+
+
+class ImportBooksTests(TestCase):
+    def setUp(self):
+        # the catalog fixture is loaded by a data migration
+        Book.objects.all().delete()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write_csv(self, rows, name="books.csv"):
+        path = os.path.join(self.directory.name, name)
+
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(HEADER)
+            writer.writerows(rows)
+
+        return path
+
+    def import_books(self, path, *args):
+        stdout = StringIO()
+        call_command("import_books", path, *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_import_creates_books_and_rejects_invalid_records(self):
+        path = self.write_csv([
+            ["", "Dune", "Frank Herbert", "Hard", "3", "0.50"],
+            ["", "Emma", "Jane Austen", "Soft", "1", "1"],
+            ["", "", "No title", "Hard", "1", "1"],
+            ["", "Ulysses", "James Joyce", "Paper", "1", "1"],
+            ["", "Beloved", "Toni Morrison", "Hard", "-1", "1"],
+            ["x", "Dracula", "Bram Stoker", "Hard", "1", "1"],
+            ["", "Hamlet", "William Shakespeare", "Hard", "1", "12345"],
+        ])
+        rejects = os.path.join(self.directory.name, "rejects.csv")
+
+        output = self.import_books(path, "--batch-size", "3", "--rejects", rejects)
+
+        self.assertIn("Imported 2 books, rejected 5 records", output)
+        self.assertEqual(
+            sorted(Book.objects.values_list("title", "inventory")),
+            [("Dune", 3), ("Emma", 1)],
+        )
+        with open(rejects) as file:
+            self.assertEqual(list(csv.reader(file)), [
+                ["3", "invalid title"],
+                ["4", "invalid cover"],
+                ["5", "invalid inventory"],
+                ["6", "invalid id"],
+                ["7", "invalid daily_fee"],
+            ])
+
+    def test_records_with_id_are_upserted(self):
+        book = Book.objects.create(
+            title="Old", author="Author", cover="Hard", inventory=1, daily_fee=1
+        )
+        path = self.write_csv([
+            [book.id, "First", "Author", "Soft", "5", "2"],
+            [book.id, "Second", "Author", "Soft", "7", "2"],
+            [book.id + 100, "New", "Author", "Hard", "1", "1"],
+        ])
+
+        self.import_books(path)
+
+        book.refresh_from_db()
+        self.assertEqual((book.title, book.inventory), ("Second", 7))
+        self.assertTrue(
+            BookAvailability.objects.filter(book_id=book.id + 100).exists()
+        )
+        self.assertGreater(
+            Book.objects.create(
+                title="Next", author="Author", cover="Hard",
+                inventory=1, daily_fee=1,
+            ).id,
+            book.id + 100,
+        )
+
+    def test_import_jsonl(self):
+        path = os.path.join(self.directory.name, "books.jsonl")
+
+        with open(path, "w") as file:
+            file.write(
+                '{"title": "Dune", "author": "Frank Herbert", "cover": "Hard", '
+                '"inventory": 3, "daily_fee": 0.5}\n'
+                "\n"
+                "not json\n"
+            )
+
+        output = self.import_books(path)
+
+        self.assertIn("Imported 1 books, rejected 1 records", output)
+        self.assertEqual(Book.objects.get().daily_fee, 0.5)
+
+    def test_resume_continues_after_last_committed_batch(self):
+        path = self.write_csv(
+            [["", f"Book {number}", "Author", "Hard", "1", "1"] for number in range(10)]
+        )
+        upsert = importer._upsert
+        calls = []
+
+        def failing_upsert(cursor):
+            calls.append(1)
+            if len(calls) == 3:
+                raise RuntimeError("connection lost")
+            return upsert(cursor)
+
+        with patch("books.importer._upsert", failing_upsert), \
+                self.assertRaises(RuntimeError):
+            self.import_books(path, "--batch-size", "3")
+
+        self.assertEqual(Book.objects.count(), 6)
+        self.assertEqual(BookImport.objects.get().position, 6)
+
+        output = self.import_books(path, "--batch-size", "3", "--resume")
+
+        self.assertIn("Resuming after record 6", output)
+        self.assertEqual(
+            sorted(Book.objects.values_list("title", flat=True)),
+            sorted(f"Book {number}" for number in range(10)),
+        )
+        self.assertIn("already imported", self.import_books(path, "--resume"))
+
+    def test_resume_refuses_changed_file(self):
+        path = self.write_csv([["", "Dune", "Frank Herbert", "Hard", "3", "1"]])
+        BookImport.objects.create(source=path, size=1, modified=0, position=1)
+
+        with self.assertRaises(CommandError):
+            self.import_books(path, "--resume")
+
+    def test_missing_columns(self):
+        path = os.path.join(self.directory.name, "books.csv")
+
+        with open(path, "w") as file:
+            file.write("title,author\nDune,Frank Herbert\n")
+
+        with self.assertRaisesMessage(CommandError, "cover, daily_fee, inventory"):
+            self.import_books(path)
@@ -1,22 +1,127 @@
-from drf_spectacular.utils import extend_schema_view, extend_schema
+from typing import Any
+
+from drf_spectacular.utils import extend_schema_view, extend_schema, OpenApiParameter
 from rest_framework import viewsets
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.request import Request
+from rest_framework.response import Response
 
+from books import cache
 from books.models import Book
 from books.permissions import IsAdminOrIfUserReadOnly
+from books.search import search_books
 from books.serializers import BooksSerializer
+from library_project.conditional import ConditionalGetMixin
+from library_project.eager_loading import EagerLoadingMixin
+from library_project.fast_serializers import ValuesListMixin
+from library_project.pagination import CatalogPagination, SearchResultsPagination
+from user.authentication import StatelessJWTAuthentication
 
 
 @extend_schema_view(
-    list=extend_schema(description="All books endpoint in the library"),
     retrieve=extend_schema(description="Specific book endpoint in library"),
     create=extend_schema(description="Creating book endpoint"),
     update=extend_schema(description="Updating book endpoint"),
     partial_update=extend_schema(description="Partially update book endpoint"),
     destroy=extend_schema(description="Delete book endpoint"),
 )
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(
+    ConditionalGetMixin,
+    EagerLoadingMixin,
+    ValuesListMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Book.objects.all()
     serializer_class = BooksSerializer
     permission_classes = (IsAdminOrIfUserReadOnly,)
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (StatelessJWTAuthentication,)
+    pagination_class = CatalogPagination
+
+    @property
+    def paginator(self):
+        if self.request.query_params.get("search"):
+            # search results are ordered by rank, not by a cursor key
+            self.pagination_class = SearchResultsPagination
+
+        return super().paginator
+
+    def get_queryset(self):
+        queryset = self.queryset
+
+        if self.action != "list":
+            return queryset
+
+        cover = self.request.query_params.get("cover")
+        in_stock = self.request.query_params.get("in_stock")
+        search = self.request.query_params.get("search")
+
+        if cover:
+            queryset = queryset.filter(cover__iexact=cover)
+
+        if in_stock == "1":
+            queryset = queryset.filter(inventory__gt=0)
+
+        if search:
+            queryset = search_books(queryset, search)
+
+        return queryset
+
+    @extend_schema(
+        description="All books endpoint in the library",
+        parameters=[
+            OpenApiParameter(
+                name="search",
+                description=(
+                    "Search by title and author, tolerant to typos, "
+                    "most relevant first (ex. ?search=harry poter)."
+                ),
+                required=False,
+                type=str,
+            ),
+            OpenApiParameter(
+                name="cover",
+                description="Filter by cover (ex. ?cover=Hard).",
+                required=False,
+                type=str,
+            ),
+            OpenApiParameter(
+                name="in_stock",
+                description="Only books with copies left (ex. ?in_stock=1).",
+                required=False,
+                type=str,
+            ),
+            OpenApiParameter(
+                name="count",
+                description=(
+                    "Add the estimated number of books to the page "
+                    "(ex. ?count=estimate)."
+                ),
+                required=False,
+                type=str,
+            ),
+        ],
+    )
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        # the validators are cached with the page they were computed for,
+        # so a cached page is revalidated without the database
+        list_page = super(ConditionalGetMixin, self).list
+        validators, page = cache.get_list_page(
+            request.build_absolute_uri(),
+            lambda: (
+                self.page_validators(request),
+                list_page(request, *args, **kwargs).data,
+            ),
+        )
+
+        return self.conditional(request, validators, lambda: Response(page))
+
+    def retrieve(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        book = super(ConditionalGetMixin, self).retrieve
+
+        def compute():
+            validators = self.detail_validators(request)
+            # a missing book raises Http404 here, which is not cached
+            return validators, book(request, *args, **kwargs).data
+
+        validators, data = cache.get_book(self.kwargs["pk"], compute)
+
+        return self.conditional(request, validators, lambda: Response(data))
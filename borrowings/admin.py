@@ -1,6 +1,140 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db import transaction
+from django.utils import timezone
 
+from borrowings import tasks
 from borrowings.models import Borrowing, Payment
+from borrowings.returns import close_borrowings, create_fines
+from library_project.pagination import EstimatedCountPaginator
 
-admin.site.register(Borrowing)
-admin.site.register(Payment)
+
+class IndexedSearchMixin:
+    """
+    Searches by id, or by the exact value of ``exact_search_field``,
+    with index lookups instead of the icontains scans of the admin
+    """
+
+    exact_search_field = None
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+
+        if not term:
+            return queryset, False
+
+        if term.isdigit():
+            return queryset.filter(pk=term), False
+
+        return queryset.filter(**{self.exact_search_field: term}), False
+
+
+class BorrowingStateFilter(admin.SimpleListFilter):
+    """Active, overdue or returned, each served by a partial index"""
+
+    title = "state"
+    parameter_name = "state"
+
+    def lookups(self, request, model_admin):
+        return (
+            ("active", "Active"),
+            ("overdue", "Overdue"),
+            ("returned", "Returned"),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == "active":
+            return queryset.filter(actual_return_date__isnull=True)
+
+        if self.value() == "overdue":
+            return queryset.filter(
+                actual_return_date__isnull=True,
+                expected_return_date__lt=timezone.now(),
+            )
+
+        if self.value() == "returned":
+            return queryset.filter(actual_return_date__isnull=False)
+
+        return queryset
+
+
+@admin.register(Borrowing)
+class BorrowingAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    list_display = (
+        "id",
+        "book_id",
+        "user_id",
+        "borrow_date",
+        "expected_return_date",
+        "actual_return_date",
+        "accrued_fine",
+    )
+    list_select_related = ("book_id", "user_id")
+    list_filter = (BorrowingStateFilter,)
+    autocomplete_fields = ("book_id", "user_id")
+    readonly_fields = ("fine_days", "accrued_fine", "fine_accrues_at")
+    search_fields = ("=id", "=user_id__email")
+    search_help_text = "Borrowing id or exact email of the reader"
+    exact_search_field = "user_id__email"
+    ordering = ("-id",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ("mark_returned",)
+
+    def save_model(self, request, obj, form, change):
+        if change and "expected_return_date" in form.changed_data:
+            # the fine is accrued again from the new date by the next run
+            obj.fine_days = 0
+            obj.accrued_fine = 0
+            obj.fine_accrues_at = None
+
+        super().save_model(request, obj, form, change)
+
+    @admin.action(description="Mark selected borrowings as returned")
+    def mark_returned(self, request, queryset):
+        """
+        Returns the active borrowings of the selection with set-based
+        queries and charges the fines of the late ones
+        """
+        # a borrowing is only returned together with its fine
+        with transaction.atomic():
+            closed = close_borrowings(queryset)
+            fines = create_fines(closed)
+
+            for fine in fines:
+                transaction.on_commit(
+                    lambda fine_id=fine.id: tasks.create_payment_session.delay(
+                        fine_id
+                    )
+                )
+
+        self.message_user(
+            request,
+            f"{len(closed)} borrowings returned, {len(fines)} fines charged.",
+            messages.SUCCESS,
+        )
+
+
+@admin.register(Payment)
+class PaymentAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    list_display = ("id", "borrowing_id", "type", "status", "to_pay")
+    list_select_related = ("borrowing_id",)
+    list_filter = ("status", "type")
+    raw_id_fields = ("borrowing_id",)
+    search_fields = ("=id", "=session_id")
+    search_help_text = "Payment id or Stripe session id"
+    exact_search_field = "session_id"
+    ordering = ("-id",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ("cancel_pending",)
+
+    @admin.action(description="Cancel selected pending payments")
+    def cancel_pending(self, request, queryset):
+        """Expires the pending payments of the selection with one UPDATE"""
+        cancelled = queryset.filter(
+            status=Payment.StatusChoice.PENDING
+        ).update(status=Payment.StatusChoice.EXPIRED)
+
+        self.message_user(
+            request, f"{cancelled} pending payments cancelled.", messages.SUCCESS
+        )
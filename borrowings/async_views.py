@@ -0,0 +1,239 @@
+"""
+Async versions of the borrowing actions that wait on the payment
+provider: return, success and cancel.
+
+The ASGI application serves them in place of the BorrowingViewSet actions
+(library_project/asgi_urls.py), WSGI deployments keep the viewset. They
+authenticate, scope borrowings and respond like the viewset, but a return
+waits for the fine session on the async gateway client with the database
+connection closed, so one process holds many of them without a thread or
+a connection each. The database is only used inside database_slot().
+They take the tokens and external call slot of the viewset actions.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, Throttled
+
+from borrowings.models import Borrowing, Payment
+from borrowings.returns import close_borrowing, create_fine
+from borrowings.serializers import BorrowingSerializer
+from borrowings.stripe import aattach_session_or_defer
+from library_project.async_db import database_slot
+from library_project.renderers import ORJSONRenderer
+from library_project.throttling import (
+    acquire_slot,
+    release_slot,
+    retry_after,
+    take_tokens,
+)
+from user.authentication import StatelessJWTAuthentication
+
+
+def _response(data, status_code: int = status.HTTP_200_OK, **headers) -> HttpResponse:
+    return HttpResponse(
+        ORJSONRenderer().render(data),
+        status=status_code,
+        content_type="application/json",
+        headers=headers,
+    )
+
+
+async def _authenticate(request: HttpRequest):
+    """User of the request and None, or None and the 401 response"""
+    authentication = StatelessJWTAuthentication()
+    challenge = {"WWW-Authenticate": authentication.authenticate_header(request)}
+
+    try:
+        result = await sync_to_async(authentication.authenticate)(request)
+    except AuthenticationFailed as error:
+        detail = error.detail
+
+        if not isinstance(detail, dict):
+            detail = {"detail": detail}
+
+        return None, _response(detail, status.HTTP_401_UNAUTHORIZED, **challenge)
+
+    if result is None:
+        return None, _response(
+            {"detail": "Authentication credentials were not provided."},
+            status.HTTP_401_UNAUTHORIZED,
+            **challenge,
+        )
+
+    return result[0], None
+
+
+def _borrowings(request: HttpRequest, user):
+    """Borrowings the user may see, as in BorrowingViewSet.get_queryset"""
+    queryset = Borrowing.objects.all()
+
+    if user.is_staff == 1:
+        user_id = request.GET.get("user_id")
+
+        if user_id:
+            queryset = queryset.filter(user_id=user_id)
+
+        return queryset
+
+    queryset = queryset.filter(user_id=user.id)
+
+    if request.GET.get("is_active") == "1":
+        queryset = queryset.filter(actual_return_date__isnull=True)
+
+    return queryset
+
+
+def _not_allowed(request: HttpRequest, method: str) -> HttpResponse:
+    return _response(
+        {"detail": f'Method "{request.method}" not allowed.'},
+        status.HTTP_405_METHOD_NOT_ALLOWED,
+        Allow=f"{method}, OPTIONS",
+    )
+
+
+def _not_found() -> HttpResponse:
+    return _response({"detail": "Not found."}, status.HTTP_404_NOT_FOUND)
+
+
+def _throttled(wait: float) -> HttpResponse:
+    error = Throttled(wait)
+
+    return _response(
+        {"detail": error.detail},
+        error.status_code,
+        **{"Retry-After": retry_after(wait)},
+    )
+
+
+async def _throttle(user, scope: str) -> HttpResponse | None:
+    """The 429 response when the user has no token of ``scope`` left"""
+    wait = await sync_to_async(take_tokens)(str(user.pk), scope)
+
+    return _throttled(wait) if wait else None
+
+
+async def return_book(request: HttpRequest, pk: int) -> HttpResponse:
+    if request.method != "POST":
+        return _not_allowed(request, "POST")
+
+    holder = None
+
+    try:
+        async with database_slot():
+            user, error = await _authenticate(request)
+
+            if error:
+                return error
+
+            error = await _throttle(user, "return")
+
+            if error:
+                return error
+
+            holder = await sync_to_async(acquire_slot)()
+
+            if holder is None:
+                return _throttled(settings.EXTERNAL_CALL_RETRY_AFTER)
+
+            borrowing = await _borrowings(request, user).select_related(
+                "book_id", "user_id"
+            ).filter(pk=pk).afirst()
+
+            if borrowing is None:
+                return _not_found()
+
+            if not await sync_to_async(close_borrowing)(borrowing):
+                return _response(
+                    {"error": "You can not return already returned book."},
+                    status.HTTP_403_FORBIDDEN,
+                )
+
+            payment = await sync_to_async(create_fine)(borrowing)
+
+        if payment:
+            # the provider is waited on without holding a database connection
+            await aattach_session_or_defer(payment)
+
+        return _response({"success": "You are return your borrowing book."})
+    finally:
+        if holder is not None:
+            await sync_to_async(release_slot)(holder)
+
+
+# csrf_exempt does not wrap async views yet, JWT requests carry no CSRF
+# token like in the DRF views
+return_book.csrf_exempt = True
+
+
+async def _borrowing_payment(request: HttpRequest, pk: int):
+    """Borrowing and payment of the session_id, or the error response"""
+    if request.method != "GET":
+        return None, None, _not_allowed(request, "GET")
+
+    async with database_slot():
+        return await _find_borrowing_payment(request, pk)
+
+
+async def _find_borrowing_payment(request: HttpRequest, pk: int):
+    user, error = await _authenticate(request)
+
+    if not error:
+        error = await _throttle(user, "payment")
+
+    if error:
+        return None, None, error
+
+    borrowing = await _borrowings(request, user).filter(pk=pk).afirst()
+
+    if borrowing is None:
+        return None, None, _not_found()
+
+    payment = await Payment.objects.filter(
+        borrowing_id=borrowing,
+        session_id=request.GET.get("session_id"),
+    ).afirst()
+
+    if payment is None:
+        return None, None, _response(
+            {"error": "Borrowing has no such payment."},
+            status.HTTP_404_NOT_FOUND,
+        )
+
+    return borrowing, payment, None
+
+
+async def borrowing_is_successfully_paid(request: HttpRequest, pk: int) -> HttpResponse:
+    borrowing, payment, error = await _borrowing_payment(request, pk)
+
+    if error:
+        return error
+
+    if payment.status == "PAID":
+        return _response(BorrowingSerializer(borrowing).data)
+
+    if payment.status == "PENDING":
+        return _response(
+            {"Pending": "Payment is not confirmed by Stripe yet."},
+            status.HTTP_202_ACCEPTED,
+        )
+
+    return _response(
+        {"Fail": "Payment wasn't successful."}, status.HTTP_400_BAD_REQUEST
+    )
+
+
+async def borrowing_payment_is_cancelled(request: HttpRequest, pk: int) -> HttpResponse:
+    borrowing, payment, error = await _borrowing_payment(request, pk)
+
+    if error:
+        return error
+
+    return _response(
+        {
+            "Cancel": f"The payment for the {borrowing} is cancelled. "
+                      f"Make sure to pay during 24 hours. Payment url: "
+                      f"{payment.session_url}. Thanks!"
+        }
+    )
@@ -0,0 +1,97 @@
+"""
+Fines of overdue borrowings.
+
+A borrowing owes FINE_MULTIPLIER times the daily fee of its book for
+every whole day it is overdue. accrue_fines() stores the fine of active
+borrowings on them with one UPDATE that only touches the borrowings
+whose overdue day count changed since they were last accrued: each one
+keeps when its next day is due (fine_accrues_at). Returning a borrowing
+reads the stored fine and adds the days since it was accrued. The total
+outstanding fine is summed up after every run and cached until the next
+one, so it is as fresh as the fines it adds up.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from books.models import Book
+from borrowings.models import Borrowing
+
+FINE_MULTIPLIER = 2
+OUTSTANDING_FINES_KEY = "fines:outstanding"
+BORROWING = Borrowing._meta.db_table
+BORROWING_BOOK = Borrowing._meta.get_field("book_id").column
+# whole days overdue at %(now)s, a day is 24 hours like in timedelta.days,
+# 0 for a borrowing whose expected return date was moved past it
+OVERDUE_DAYS = (
+    "GREATEST(floor(extract(epoch FROM %(now)s - borrowing.expected_return_date)"
+    " / 86400)::integer, 0)"
+)
+
+
+def accrue_fines(now=None) -> int:
+    """
+    Stores the fine of the active borrowings that became overdue or
+    whose next overdue day is due, returns how many were updated
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {BORROWING} AS borrowing SET "
+            "updated_at = now(), "
+            f"fine_days = {OVERDUE_DAYS}, "
+            f"accrued_fine = {OVERDUE_DAYS} * book.daily_fee * %(multiplier)s, "
+            "fine_accrues_at = borrowing.expected_return_date "
+            f"+ ({OVERDUE_DAYS} + 1) * interval '24 hours' "
+            f"FROM {Book._meta.db_table} AS book "
+            f"WHERE book.id = borrowing.{BORROWING_BOOK} "
+            "AND borrowing.actual_return_date IS NULL "
+            "AND (borrowing.fine_accrues_at <= %(now)s "
+            "OR borrowing.fine_accrues_at IS NULL "
+            "AND borrowing.expected_return_date <= %(now)s - interval '24 hours')",
+            {
+                "now": now or timezone.now(),
+                "multiplier": Decimal(FINE_MULTIPLIER),
+            },
+        )
+        return cursor.rowcount
+
+
+def fine_amount(borrowing: Borrowing) -> Decimal:
+    """
+    Fine of a returned borrowing: the accrued fine and the days overdue
+    since it was accrued
+    """
+    days = (borrowing.actual_return_date - borrowing.expected_return_date).days
+
+    return borrowing.accrued_fine + (
+        (days - borrowing.fine_days)
+        * borrowing.book_id.daily_fee
+        * FINE_MULTIPLIER
+    )
+
+
+def outstanding_fines() -> Decimal:
+    """
+    Fines accrued by the borrowings that are not returned yet, as of the
+    last accrual run
+    """
+    total = cache.get(OUTSTANDING_FINES_KEY)
+
+    if total is None:
+        total = refresh_outstanding_fines()
+
+    return total
+
+
+def refresh_outstanding_fines() -> Decimal:
+    """Sums up the stored fines of active borrowings and caches the total"""
+    total = Borrowing.objects.filter(
+        actual_return_date__isnull=True, fine_accrues_at__isnull=False
+    ).aggregate(total=Sum("accrued_fine"))["total"] or Decimal(0)
+    cache.set(OUTSTANDING_FINES_KEY, total, timeout=settings.FINE_ACCRUAL_INTERVAL)
+
+    return total
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from library_project.pooled_postgresql import pool
+
+
+class Command(BaseCommand):
+    """Django command that reports the database connection pools"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-age",
+            type=float,
+            default=60,
+            help="Skip pools that reported nothing for this many seconds.",
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        if not settings.DB_POOL:
+            self.stdout.write("Connection pooling is off (DB_POOL).")
+            return
+
+        stats = pool.get_stats(options["max_age"])
+
+        if not stats:
+            self.stdout.write("No pool has reported yet.")
+            return
+
+        for name, pool_stats in sorted(stats.items()):
+            saturation = pool_stats["peak_in_use"] / pool_stats["max_size"]
+            self.stdout.write(
+                f"{name}: {pool_stats['in_use']} in use, "
+                f"{pool_stats['idle']} idle, {pool_stats['waiting']} waiting, "
+                f"peak {pool_stats['peak_in_use']}/{pool_stats['max_size']} "
+                f"({saturation:.0%}), {pool_stats['waits']} of "
+                f"{pool_stats['checkouts']} checkouts waited "
+                f"{pool_stats['wait_ms']} ms in total, "
+                f"{pool_stats['timeouts']} timed out, "
+                f"{pool_stats['opened']} opened, {pool_stats['closed']} closed, "
+                f"{pool_stats['failed_checks']} failed health checks"
+            )
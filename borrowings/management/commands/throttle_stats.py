@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from library_project import throttling
+
+
+class Command(BaseCommand):
+    """Django command that reports the throttle decisions"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Start counting allowed and throttled requests from zero.",
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        stats = throttling.get_stats()
+
+        if not stats["scopes"]:
+            self.stdout.write("No request has been throttled or allowed yet.")
+
+        for scope, counts in sorted(stats["scopes"].items()):
+            total = counts["allowed"] + counts["throttled"]
+            self.stdout.write(
+                f"{scope}: {counts['allowed']} allowed, "
+                f"{counts['throttled']} throttled "
+                f"({counts['throttled'] / total:.1%})"
+            )
+
+        self.stdout.write(
+            f"External call slots in use: {stats['slots_in_use']}"
+        )
+
+        if options["reset"]:
+            throttling.reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
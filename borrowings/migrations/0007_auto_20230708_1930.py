@@ -1,12 +1,49 @@
 # Generated by Django 4.2.3 on 2023-07-08 16:30
+import json
 
+from django.conf import settings
+from django.core.management.color import no_style
 from django.db import migrations
 from django.db.migrations import RunPython
 
 
 def func(apps, schema_editor):
-    from django.core.management import call_command
-    call_command("loaddata", "fixture_data.json")
+    # the fixture is loaded into the historical models, the current ones
+    # may have columns that later migrations add
+    with open(settings.BASE_DIR / "fixture_data.json") as fixture:
+        objects = json.load(fixture)
+
+    models = set()
+
+    for data in objects:
+        model = apps.get_model(data["model"])
+        values = {}
+        many_to_many = {}
+
+        for name, value in data["fields"].items():
+            field = model._meta.get_field(name)
+
+            if field.many_to_many:
+                many_to_many[name] = value
+            elif field.is_relation:
+                values[field.attname] = field.target_field.to_python(value)
+            else:
+                values[field.attname] = field.to_python(value)
+
+        instance = model(pk=model._meta.pk.to_python(data["pk"]), **values)
+        # raw like loaddata: the fixture dates are kept, not auto_now
+        instance.save_base(raw=True)
+
+        for name, pks in many_to_many.items():
+            getattr(instance, name).set(pks)
+
+        models.add(model)
+
+    # the fixture rows have explicit ids, new rows must start after them
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), list(models)):
+            cursor.execute(sql)
 
 
 def reverse_func(apps, schema_editor):
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.3 on 2026-10-18 05:07
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # the payment index is built concurrently, which can not run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('borrowings', '0007_auto_20230708_1930'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=255, unique=True)),
+                ('type', models.CharField(max_length=100)),
+                ('session_id', models.CharField(max_length=500)),
+                ('payment_status', models.CharField(blank=True, max_length=50)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='status',
+            field=models.CharField(choices=[('Pending', 'Pending'), ('Paid', 'Paid'), ('Expired', 'Expired')], max_length=50),
+        ),
+        AddIndexConcurrently(
+            model_name='payment',
+            index=models.Index(fields=['session_id'], name='payment_session_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stripeevent',
+            index=models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['id'], name='stripe_event_pending_idx'),
+        ),
+    ]
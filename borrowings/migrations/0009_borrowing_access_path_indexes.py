@@ -0,0 +1,28 @@
+# Generated by Django 4.2.3 on 2026-10-18 05:17
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # indexes are built concurrently, which can not run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('borrowings', '0008_stripe_events'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='borrowing',
+            index=models.Index(fields=['user_id', '-id'], name='borrowing_user_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='borrowing',
+            index=models.Index(condition=models.Q(('actual_return_date__isnull', True)), fields=['user_id', '-id'], name='borrowing_user_active_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='borrowing',
+            index=models.Index(condition=models.Q(('actual_return_date__isnull', True)), fields=['expected_return_date', 'id'], name='borrowing_overdue_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.3 on 2026-10-18 07:23
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # the indexes are built concurrently, which can not run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('borrowings', '0011_stripe_event_watermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='borrowing',
+            name='accrued_fine',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='borrowing',
+            name='fine_accrues_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='borrowing',
+            name='fine_days',
+            field=models.IntegerField(default=0),
+        ),
+        # rows inserted without the new columns, by SQL or by the previous
+        # release while it is deployed, start with no fine
+        migrations.RunSQL(
+            """
+            ALTER TABLE borrowings_borrowing
+                ALTER COLUMN fine_days SET DEFAULT 0,
+                ALTER COLUMN accrued_fine SET DEFAULT 0
+            """,
+            """
+            ALTER TABLE borrowings_borrowing
+                ALTER COLUMN fine_days DROP DEFAULT,
+                ALTER COLUMN accrued_fine DROP DEFAULT
+            """,
+        ),
+        AddIndexConcurrently(
+            model_name='borrowing',
+            index=models.Index(condition=models.Q(('actual_return_date__isnull', True), ('fine_accrues_at__isnull', False)), fields=['fine_accrues_at'], include=['accrued_fine'], name='borrowing_fine_due_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='borrowing',
+            index=models.Index(condition=models.Q(('actual_return_date__isnull', True), ('fine_accrues_at__isnull', True)), fields=['expected_return_date'], name='borrowing_fine_new_idx'),
+        ),
+    ]
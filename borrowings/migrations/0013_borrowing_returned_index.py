@@ -0,0 +1,20 @@
+# Generated by Django 4.2.3 on 2026-10-18 07:33
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # the index is built concurrently, which can not run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('borrowings', '0012_borrowing_accrued_fine'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='borrowing',
+            index=models.Index(condition=models.Q(('actual_return_date__isnull', False)), fields=['actual_return_date'], name='borrowing_returned_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.3 on 2026-10-18 07:42
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # the indexes are built concurrently, which can not run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('borrowings', '0013_borrowing_returned_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('PAID', 'Paid'), ('EXPIRED', 'Expired')], max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='type',
+            field=models.CharField(choices=[('PAYMENT', 'Payment'), ('FINE', 'Fine')], max_length=50),
+        ),
+        AddIndexConcurrently(
+            model_name='borrowing',
+            index=models.Index(condition=models.Q(('actual_return_date__isnull', True)), fields=['-id'], name='borrowing_active_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='payment',
+            index=models.Index(fields=['status', '-id'], name='payment_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='payment',
+            index=models.Index(fields=['type', '-id'], name='payment_type_idx'),
+        ),
+    ]
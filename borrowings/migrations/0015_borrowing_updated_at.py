@@ -0,0 +1,26 @@
+# Generated by Django 4.2.3 on 2026-10-18 08:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrowings', '0014_admin_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='borrowing',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        # rows inserted without the column, by SQL or by the previous
+        # release while it is deployed, get the time of the insert
+        migrations.RunSQL(
+            "ALTER TABLE borrowings_borrowing ALTER COLUMN updated_at SET DEFAULT now()",
+            "ALTER TABLE borrowings_borrowing ALTER COLUMN updated_at DROP DEFAULT",
+        ),
+    ]
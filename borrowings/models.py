@@ -18,16 +18,82 @@ class Borrowing(models.Model):
         on_delete=models.CASCADE,
         related_name="borrowing"
     )
+    # fine of the whole overdue days counted by accrue_fines and when
+    # the next day is due
+    fine_days = models.IntegerField(default=0)
+    accrued_fine = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0
+    )
+    fine_accrues_at = models.DateTimeField(null=True, blank=True)
+    # also set by the SQL that returns borrowings and accrues fines, for
+    # conditional GETs
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # borrowings of a user in the keyset order of the list
+            models.Index(fields=["user_id", "-id"], name="borrowing_user_idx"),
+            models.Index(
+                fields=["user_id", "-id"],
+                condition=models.Q(actual_return_date__isnull=True),
+                name="borrowing_user_active_idx",
+            ),
+            # active borrowings of a book by due date, for its next
+            # expected return and who has it
+            models.Index(
+                fields=["book_id", "expected_return_date"],
+                condition=models.Q(actual_return_date__isnull=True),
+                name="borrowing_book_active_idx",
+            ),
+            # active borrowings in the order of the admin list
+            models.Index(
+                fields=["-id"],
+                condition=models.Q(actual_return_date__isnull=True),
+                name="borrowing_active_idx",
+            ),
+            # active borrowings by due date, for the overdue scan
+            models.Index(
+                fields=["expected_return_date", "id"],
+                condition=models.Q(actual_return_date__isnull=True),
+                name="borrowing_overdue_idx",
+            ),
+            # returns by date, for the circulation analytics
+            models.Index(
+                fields=["actual_return_date"],
+                condition=models.Q(actual_return_date__isnull=False),
+                name="borrowing_returned_idx",
+            ),
+            # active borrowings whose next fine day is due, with their
+            # fine for the outstanding total, and those with no fine yet
+            models.Index(
+                fields=["fine_accrues_at"],
+                include=["accrued_fine"],
+                condition=models.Q(
+                    actual_return_date__isnull=True,
+                    fine_accrues_at__isnull=False,
+                ),
+                name="borrowing_fine_due_idx",
+            ),
+            models.Index(
+                fields=["expected_return_date"],
+                condition=models.Q(
+                    actual_return_date__isnull=True,
+                    fine_accrues_at__isnull=True,
+                ),
+                name="borrowing_fine_new_idx",
+            ),
+        ]
 
 
 class Payment(models.Model):
     class StatusChoice(models.TextChoices):
-        PENDING = "Pending"
-        PAID = "Paid"
+        PENDING = "PENDING", "Pending"
+        PAID = "PAID", "Paid"
+        EXPIRED = "EXPIRED", "Expired"
 
     class TypeStatus(models.TextChoices):
-        PAYMENT = "Payment"
-        FINE = "Fine"
+        PAYMENT = "PAYMENT", "Payment"
+        FINE = "FINE", "Fine"
 
     status = models.CharField(max_length=50, choices=StatusChoice.choices)
     type = models.CharField(max_length=50, choices=TypeStatus.choices)
@@ -35,3 +101,39 @@ class Payment(models.Model):
     session_url = models.CharField(max_length=500, null=True, blank=True)
     session_id = models.CharField(max_length=500, null=True, blank=True)
     to_pay = models.DecimalField(decimal_places=2, max_digits=10)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["session_id"], name="payment_session_id_idx"),
+            # payments by status or type in the order of the admin list
+            models.Index(fields=["status", "-id"], name="payment_status_idx"),
+            models.Index(fields=["type", "-id"], name="payment_type_idx"),
+        ]
+
+
+class StripeEvent(models.Model):
+    """Checkout session event received by the Stripe webhook"""
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    session_id = models.CharField(max_length=500)
+    payment_status = models.CharField(max_length=50, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["id"],
+                condition=models.Q(processed_at__isnull=True),
+                name="stripe_event_pending_idx",
+            ),
+        ]
+
+
+class StripeEventWatermark(models.Model):
+    """Newest Stripe event applied by the payment reconciliation"""
+
+    event_id = models.CharField(max_length=255)
+    created = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
@@ -1,20 +1,212 @@
+import logging
+import os
+import time
+
+import redis
 import requests
+from django.conf import settings
+from django.db import transaction
+from requests.adapters import HTTPAdapter
 
 from borrowings.models import Borrowing
-from library_project.settings import TELEGRAM_TOKEN, CHAT_ID
+from library_project.redis_client import get_redis
 from user.models import User
 
+logger = logging.getLogger(__name__)
 
-def send_notification(message: str) -> None:
+QUEUE_KEY = "notifications:queue"
+FLUSH_SCHEDULED_KEY = "notifications:flush-scheduled"
+TELEGRAM_MESSAGE_LIMIT = 4096
+MESSAGE_SEPARATOR = "\n\n"
+
+_session = None
+_session_pid = None
+
+
+class NotificationDeliveryError(Exception):
+    """Telegram did not accept a batch, ``retry_after`` is in seconds"""
+
+    def __init__(self, undelivered: list[str], retry_after: int | None = None):
+        super().__init__(f"{len(undelivered)} notifications were not delivered")
+        self.undelivered = undelivered
+        self.retry_after = retry_after
+
+
+def get_session() -> requests.Session:
+    """HTTP session of the process, reused for every Telegram call"""
+    global _session, _session_pid
+
+    if _session is None or _session_pid != os.getpid():
+        _session = requests.Session()
+        _session.mount(
+            "https://",
+            HTTPAdapter(pool_maxsize=settings.NOTIFICATION_POOL_SIZE),
+        )
+        _session.mount(
+            "http://",
+            HTTPAdapter(pool_maxsize=settings.NOTIFICATION_POOL_SIZE),
+        )
+        _session_pid = os.getpid()
+
+    return _session
+
+
+def split_into_batches(messages: list[str]) -> list[list[str]]:
+    """
+    Groups messages so every group fits into one Telegram message.
+    Messages longer than the limit are cut into several parts.
+    """
+    batches = []
+    batch = []
+    size = 0
+
+    for message in messages:
+        parts = [
+            message[start:start + TELEGRAM_MESSAGE_LIMIT]
+            for start in range(0, len(message), TELEGRAM_MESSAGE_LIMIT)
+        ] or [""]
+
+        for part in parts:
+            extra = len(part) + (len(MESSAGE_SEPARATOR) if batch else 0)
+
+            if batch and size + extra > TELEGRAM_MESSAGE_LIMIT:
+                batches.append(batch)
+                batch, size, extra = [], 0, len(part)
+
+            batch.append(part)
+            size += extra
+
+    if batch:
+        batches.append(batch)
+
+    return batches
+
+
+def deliver(messages: list[str]) -> None:
+    """
+    Sends messages to the admin chat, coalesced into as few Telegram
+    messages as possible and paced by NOTIFICATION_MIN_INTERVAL
+    """
+    url = (
+        f"{settings.TELEGRAM_API_URL}/bot{settings.TELEGRAM_TOKEN}/sendMessage"
+    )
+    batches = split_into_batches(messages)
+
+    for index, batch in enumerate(batches):
+        if index:
+            time.sleep(settings.NOTIFICATION_MIN_INTERVAL)
+
+        undelivered = [part for rest in batches[index:] for part in rest]
+
+        try:
+            response = get_session().post(
+                url,
+                data={
+                    "chat_id": settings.CHAT_ID,
+                    "text": MESSAGE_SEPARATOR.join(batch),
+                },
+                timeout=settings.NOTIFICATION_TIMEOUT,
+            )
+        except requests.RequestException as error:
+            raise NotificationDeliveryError(undelivered) from error
+
+        if response.status_code == 429:
+            try:
+                retry_after = response.json().get("parameters", {}).get("retry_after")
+            except ValueError:
+                # not a Telegram answer, e.g. the error page of a proxy
+                retry_after = None
+
+            raise NotificationDeliveryError(undelivered, retry_after)
+
+        if response.status_code >= 500:
+            raise NotificationDeliveryError(undelivered)
+
+        if response.status_code >= 400:
+            # a rejected message will be rejected again, so it is dropped
+            logger.error("Telegram rejected a notification: %s", response.text)
+
+
+def flush_queue() -> int:
     """
-    Sends a message to admin
+    Delivers queued messages batch by batch until the queue is empty,
+    undelivered messages are put back to the head of the queue
     """
-    if CHAT_ID:
-        url = (
-            f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/"
-            f"sendMessage?chat_id={CHAT_ID}&text={message}"
+    client = get_redis()
+    delivered = 0
+
+    while True:
+        with client.pipeline() as pipe:
+            pipe.lrange(QUEUE_KEY, 0, settings.NOTIFICATION_BATCH_SIZE - 1)
+            pipe.ltrim(QUEUE_KEY, settings.NOTIFICATION_BATCH_SIZE, -1)
+            messages, _ = pipe.execute()
+
+        if not messages:
+            break
+
+        try:
+            deliver([message.decode() for message in messages])
+        except NotificationDeliveryError as error:
+            client.lpush(QUEUE_KEY, *reversed(error.undelivered))
+            raise
+        except Exception:
+            # which parts were sent is unknown, a duplicate is better than
+            # a lost message; the task is not retried, so the next queued
+            # message must be able to schedule a flush
+            client.lpush(QUEUE_KEY, *reversed(messages))
+            client.delete(FLUSH_SCHEDULED_KEY)
+            raise
+
+        delivered += len(messages)
+
+    client.delete(FLUSH_SCHEDULED_KEY)
+
+    # a message queued while the flag was still set has no flush scheduled
+    if client.llen(QUEUE_KEY):
+        schedule_flush(client)
+
+    return delivered
+
+
+def schedule_flush(client: redis.Redis) -> None:
+    """Schedules one flush task for all messages queued in the window"""
+    from borrowings.tasks import flush_notifications
+
+    if client.set(
+            FLUSH_SCHEDULED_KEY,
+            1,
+            nx=True,
+            ex=settings.NOTIFICATION_FLUSH_LOCK_TIMEOUT,
+    ):
+        flush_notifications.apply_async(
+            countdown=settings.NOTIFICATION_BATCH_DELAY
         )
-        requests.get(url)
+
+
+def enqueue_notification(message: str) -> None:
+    """Puts a message to the queue without waiting for Telegram"""
+    from borrowings.tasks import send_notifications
+
+    client = get_redis()
+
+    try:
+        if client is None:
+            send_notifications.delay([message])
+            return
+
+        client.rpush(QUEUE_KEY, message)
+        schedule_flush(client)
+    except Exception:
+        # a notification must never fail the request that caused it
+        logger.exception("Could not queue a notification")
+
+
+def send_notification(message: str) -> None:
+    """
+    Sends a message to admin once the current transaction is committed
+    """
+    if settings.CHAT_ID:
+        transaction.on_commit(lambda: enqueue_notification(message))
 
 
 def send_borrowing_create_message(
@@ -29,3 +221,20 @@ def send_borrowing_create_message(
 
     )
     send_notification(message)
+
+
+def send_checkout_message(
+        user: User, borrowings: list[Borrowing]
+) -> None:
+    """Sends one message for all borrowings of a bulk checkout"""
+    books = "".join(
+        f"Book: {borrowing.book_id.title}, "
+        f"book left: {borrowing.book_id.inventory}, \n"
+        for borrowing in borrowings
+    )
+    message = (
+        f"New checkout of {len(borrowings)} books by {user.email}: \n"
+        f"{books}"
+        f"Expected return date: {borrowings[0].expected_return_date}."
+    )
+    send_notification(message)
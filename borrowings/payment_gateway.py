@@ -0,0 +1,467 @@
+"""
+Client of the payment provider.
+
+``get_gateway()`` wraps the gateway class of ``PAYMENT_GATEWAY`` (Stripe by
+default, benchmarks swap in an in-process fake) with a deadline for the
+whole call, bounded retries with jittered backoff and a circuit breaker.
+After ``PAYMENT_GATEWAY_FAILURE_THRESHOLD`` failures in a row the breaker
+opens and calls fail at once with PaymentGatewayUnavailable until one
+trial call gets through ``PAYMENT_GATEWAY_RESET_TIMEOUT`` seconds later.
+The breaker is kept per process. Async views call the ``acreate_*``
+methods, which wait on the provider without holding a thread.
+"""
+import asyncio
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+import weakref
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+import httpx
+import requests
+import stripe
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+_gateway = None
+_gateway_key = None
+
+
+def encode_params(params: dict, prefix: str | None = None) -> list[tuple[str, str]]:
+    """
+    Form fields of nested Stripe params: dicts become ``key[name]``,
+    lists ``key[index]`` and None values are left out, as the Stripe
+    client sends them
+    """
+    fields = []
+
+    for name, value in params.items():
+        key = name if prefix is None else f"{prefix}[{name}]"
+
+        if value is None:
+            continue
+
+        if isinstance(value, (list, tuple)):
+            value = dict(enumerate(value))
+
+        if isinstance(value, dict):
+            fields.extend(encode_params(value, key))
+        elif isinstance(value, bool):
+            fields.append((key, str(value).lower()))
+        else:
+            fields.append((key, str(value)))
+
+    return fields
+
+
+class PaymentGatewayUnavailable(Exception):
+    """The provider is degraded, a session can only be created later"""
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` failures in a row and lets a single
+    trial call through ``reset_timeout`` seconds later, closing again
+    when it succeeds
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    @property
+    def is_open(self) -> bool:
+        """Calls are failed at once, no trial call is due yet"""
+        with self.lock:
+            return self.opened_at is not None and (
+                self.trial
+                or time.monotonic() - self.opened_at < self.reset_timeout
+            )
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+
+            if self.trial or time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+
+            self.trial = True
+            return True
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+
+            if self.trial or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+            self.trial = False
+
+
+class DeadlineRequestsClient(stripe.http_client.HTTPClient):
+    """
+    Stripe HTTP client on a pooled session, a request does not wait
+    longer than the deadline set for the current thread
+    """
+
+    name = "requests"
+
+    def __init__(self, session: requests.Session, timeout: float):
+        super().__init__()
+        self.session = session
+        self.timeout = timeout
+        self._deadline = threading.local()
+
+    def request(self, method, url, headers, post_data=None):
+        try:
+            response = self.session.request(
+                method,
+                url,
+                headers=headers,
+                data=post_data,
+                timeout=self.request_timeout(),
+            )
+            # reading the body may time out too
+            content = response.content
+        except requests.RequestException as error:
+            raise stripe.error.APIConnectionError(
+                f"Unexpected error communicating with Stripe. "
+                f"(Network error: {type(error).__name__}: {error})",
+                should_retry=isinstance(
+                    error, (requests.ConnectionError, requests.Timeout)
+                ),
+            ) from error
+
+        return content, response.status_code, response.headers
+
+    def request_timeout(self) -> float:
+        """Timeout of a request, at most what is left of the deadline"""
+        deadline = getattr(self._deadline, "value", None)
+
+        if deadline is None:
+            return self.timeout
+
+        return max(0.001, min(self.timeout, deadline - time.monotonic()))
+
+    def close(self) -> None:
+        self.session.close()
+
+    @contextmanager
+    def deadline(self, seconds: float):
+        self._deadline.value = time.monotonic() + seconds
+        try:
+            yield
+        finally:
+            self._deadline.value = None
+
+
+class StripeGateway:
+    """Creates Stripe checkout sessions through one pooled HTTP session"""
+
+    transient_errors = (
+        stripe.error.APIConnectionError,
+        stripe.error.APIError,
+        stripe.error.RateLimitError,
+    )
+
+    def __init__(self):
+        session = requests.Session()
+        session.mount(
+            "https://",
+            HTTPAdapter(pool_maxsize=settings.PAYMENT_GATEWAY_POOL_SIZE),
+        )
+        session.mount(
+            "http://",
+            HTTPAdapter(pool_maxsize=settings.PAYMENT_GATEWAY_POOL_SIZE),
+        )
+        self.client = DeadlineRequestsClient(
+            session, settings.PAYMENT_GATEWAY_TIMEOUT
+        )
+        stripe.default_http_client = self.client
+        # an async client is bound to the event loop it is used on
+        self.async_clients = weakref.WeakKeyDictionary()
+
+    def create_checkout_session(
+            self,
+            line_items: list[dict],
+            success_url: str,
+            cancel_url: str,
+            idempotency_key: str,
+            timeout: float,
+    ):
+        with self.client.deadline(timeout):
+            return stripe.checkout.Session.create(
+                line_items=line_items,
+                mode="payment",
+                success_url=success_url,
+                cancel_url=cancel_url,
+                idempotency_key=idempotency_key,
+            )
+
+    def list_events(
+            self,
+            types: list[str],
+            created_gte: int,
+            starting_after: str | None,
+            limit: int,
+            timeout: float,
+    ):
+        """
+        Page of the events of ``types`` created since ``created_gte``,
+        newest first, older than the ``starting_after`` event
+        """
+        params = {"types": types, "created": {"gte": created_gte}, "limit": limit}
+
+        if starting_after:
+            params["starting_after"] = starting_after
+
+        with self.client.deadline(timeout):
+            return stripe.Event.list(**params)
+
+    async def acreate_checkout_session(
+            self,
+            line_items: list[dict],
+            success_url: str,
+            cancel_url: str,
+            idempotency_key: str,
+            timeout: float,
+    ) -> dict:
+        """Same request on a pooled client of the running event loop"""
+        params = {
+            "line_items": line_items,
+            "mode": "payment",
+            "success_url": success_url,
+            "cancel_url": cancel_url,
+        }
+        headers = {
+            "Authorization": f"Bearer {stripe.api_key}",
+            "Content-Type": "application/x-www-form-urlencoded",
+            "Idempotency-Key": idempotency_key,
+        }
+
+        if stripe.api_version:
+            headers["Stripe-Version"] = stripe.api_version
+
+        try:
+            response = await self._async_client().post(
+                f"{stripe.api_base}/v1/checkout/sessions",
+                content=urlencode(encode_params(params)),
+                headers=headers,
+                timeout=timeout,
+            )
+        except httpx.TransportError as error:
+            raise stripe.error.APIConnectionError(str(error)) from error
+
+        if response.status_code < 400:
+            return response.json()
+
+        try:
+            message = response.json()["error"]["message"]
+        except (ValueError, KeyError, TypeError):
+            message = response.text
+
+        if response.status_code == 401:
+            raise stripe.error.AuthenticationError(message, http_status=401)
+        if response.status_code == 429:
+            raise stripe.error.RateLimitError(message, http_status=429)
+        if response.status_code >= 500:
+            raise stripe.error.APIError(message, http_status=response.status_code)
+
+        raise stripe.error.InvalidRequestError(
+            message, None, http_status=response.status_code
+        )
+
+    def _async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self.async_clients.get(loop)
+
+        if client is None:
+            client = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(
+                    limits=httpx.Limits(
+                        max_connections=settings.PAYMENT_GATEWAY_ASYNC_POOL_SIZE
+                    ),
+                    # the headers and the body of a request are written
+                    # separately, Nagle would hold the body for an ACK
+                    socket_options=[(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)],
+                ),
+            )
+            self.async_clients[loop] = client
+
+        return client
+
+
+class ResilientGateway:
+    """Deadline, retries and circuit breaker around a gateway"""
+
+    def __init__(self, gateway, breaker: CircuitBreaker):
+        self.gateway = gateway
+        self.breaker = breaker
+
+    def create_checkout_session(
+            self, line_items: list[dict], success_url: str, cancel_url: str
+    ):
+        return self._call(
+            self.gateway.create_checkout_session,
+            self._request(line_items, success_url, cancel_url),
+            "Payment gateway did not create the session.",
+        )
+
+    def list_events(
+            self,
+            types: list[str],
+            created_gte: int,
+            starting_after: str | None = None,
+            limit: int = 100,
+    ):
+        return self._call(
+            self.gateway.list_events,
+            {
+                "types": types,
+                "created_gte": created_gte,
+                "starting_after": starting_after,
+                "limit": limit,
+            },
+            "Payment gateway did not list the events.",
+        )
+
+    def _call(self, method, request: dict, failure: str):
+        """Calls the gateway with retries until the deadline"""
+        self._check_circuit()
+        deadline = time.monotonic() + settings.PAYMENT_GATEWAY_DEADLINE
+
+        for attempt in range(settings.PAYMENT_GATEWAY_RETRIES + 1):
+            try:
+                result = method(**request, timeout=self._timeout(deadline))
+            except self.gateway.transient_errors as error:
+                self.breaker.record_failure()
+                last_error = error
+            except Exception:
+                # the provider answered, so it is not degraded
+                self.breaker.record_success()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+            backoff = self._backoff(deadline, attempt)
+
+            if backoff is None:
+                break
+
+            time.sleep(backoff)
+
+        raise PaymentGatewayUnavailable(failure) from last_error
+
+    async def acreate_checkout_session(
+            self, line_items: list[dict], success_url: str, cancel_url: str
+    ):
+        self._check_circuit()
+        request = self._request(line_items, success_url, cancel_url)
+        deadline = time.monotonic() + settings.PAYMENT_GATEWAY_DEADLINE
+
+        for attempt in range(settings.PAYMENT_GATEWAY_RETRIES + 1):
+            try:
+                session = await self.gateway.acreate_checkout_session(
+                    **request, timeout=self._timeout(deadline)
+                )
+            except self.gateway.transient_errors as error:
+                self.breaker.record_failure()
+                last_error = error
+            except Exception:
+                self.breaker.record_success()
+                raise
+            else:
+                self.breaker.record_success()
+                return session
+
+            backoff = self._backoff(deadline, attempt)
+
+            if backoff is None:
+                break
+
+            await asyncio.sleep(backoff)
+
+        raise PaymentGatewayUnavailable(
+            "Payment gateway did not create the session."
+        ) from last_error
+
+    def _check_circuit(self) -> None:
+        """Fails a call at once while the circuit is open"""
+        if not self.breaker.allow():
+            raise PaymentGatewayUnavailable("Payment gateway circuit is open.")
+
+    @staticmethod
+    def _request(line_items: list[dict], success_url: str, cancel_url: str) -> dict:
+        return {
+            "line_items": line_items,
+            "success_url": success_url,
+            "cancel_url": cancel_url,
+            # retries of one call must not create a second session
+            "idempotency_key": uuid.uuid4().hex,
+        }
+
+    @staticmethod
+    def _timeout(deadline: float) -> float:
+        return min(settings.PAYMENT_GATEWAY_TIMEOUT, deadline - time.monotonic())
+
+    def _backoff(self, deadline: float, attempt: int) -> float | None:
+        """Jittered wait before the next attempt, None to give up"""
+        backoff = random.uniform(
+            0, settings.PAYMENT_GATEWAY_BACKOFF * 2 ** attempt
+        )
+
+        if (
+                attempt == settings.PAYMENT_GATEWAY_RETRIES
+                or time.monotonic() + backoff >= deadline
+                # the failures of this call may have opened the circuit
+                or self.breaker.is_open
+        ):
+            return None
+
+        return backoff
+
+
+def get_gateway() -> ResilientGateway:
+    """Gateway of the process, created again after a fork"""
+    global _gateway, _gateway_key
+
+    key = (os.getpid(), settings.PAYMENT_GATEWAY)
+
+    if _gateway is None or _gateway_key != key:
+        _gateway = ResilientGateway(
+            import_string(settings.PAYMENT_GATEWAY)(),
+            CircuitBreaker(
+                settings.PAYMENT_GATEWAY_FAILURE_THRESHOLD,
+                settings.PAYMENT_GATEWAY_RESET_TIMEOUT,
+            ),
+        )
+        _gateway_key = key
+
+    return _gateway
+
+
+@receiver(setting_changed)
+def reset_gateway(setting: str, **kwargs) -> None:
+    global _gateway
+
+    if setting.startswith("PAYMENT_GATEWAY"):
+        _gateway = None
@@ -0,0 +1,104 @@
+"""
+Payment reconciliation against the Stripe event list.
+
+Payments only change when the webhook delivers a checkout session event,
+a lost delivery leaves them pending. reconcile_payments() pages through
+the checkout session events of the provider, newest first, and applies
+each page with one UPDATE. The newest applied event is kept as a
+watermark and the next run stops at it, so a run only reads the events
+created since the previous one. The first run goes
+STRIPE_RECONCILE_LOOKBACK seconds back.
+"""
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone as django_timezone
+
+from borrowings.models import StripeEventWatermark
+from borrowings.payment_gateway import get_gateway
+from borrowings.webhooks import HANDLED_EVENTS, apply_events, to_stripe_event
+
+RECONCILE_LOCK_KEY = "stripe:reconcile:lock"
+# a run that died keeps the lock for this many seconds
+RECONCILE_LOCK_TIMEOUT = 30 * 60
+
+
+def reconcile_payments() -> dict | None:
+    """
+    Applies the checkout session events created since the watermark and
+    moves it to the newest of them. Returns the numbers of events, pages
+    and paid payments, or None when another run holds the lock.
+    """
+    if not cache.add(RECONCILE_LOCK_KEY, 1, timeout=RECONCILE_LOCK_TIMEOUT):
+        return None
+
+    try:
+        return _reconcile()
+    finally:
+        cache.delete(RECONCILE_LOCK_KEY)
+
+
+def _reconcile() -> dict:
+    watermark = StripeEventWatermark.objects.first()
+
+    if watermark:
+        since = watermark.created
+    else:
+        since = django_timezone.now() - timedelta(
+            seconds=settings.STRIPE_RECONCILE_LOOKBACK
+        )
+
+    gateway = get_gateway()
+    result = {"events": 0, "pages": 0, "paid": 0}
+    newest = None
+    starting_after = None
+
+    while True:
+        page = gateway.list_events(
+            types=list(HANDLED_EVENTS),
+            created_gte=int(since.timestamp()),
+            starting_after=starting_after,
+            limit=settings.STRIPE_RECONCILE_PAGE_SIZE,
+        )
+        events = page["data"]
+        # events of the same second as the watermark are listed again,
+        # the watermark and everything after it were applied before
+        reached = next(
+            (
+                index
+                for index, event in enumerate(events)
+                if watermark and event["id"] == watermark.event_id
+            ),
+            None,
+        )
+
+        if reached is not None:
+            events = events[:reached]
+
+        if events:
+            newest = newest or events[0]
+            result["events"] += len(events)
+            result["pages"] += 1
+            result["paid"] += apply_events(
+                [to_stripe_event(event) for event in events]
+            )
+
+        if reached is not None or not page["has_more"]:
+            break
+
+        starting_after = page["data"][-1]["id"]
+
+    if newest:
+        created = datetime.fromtimestamp(newest["created"], tz=timezone.utc)
+
+        if watermark:
+            watermark.event_id = newest["id"]
+            watermark.created = created
+            watermark.save()
+        else:
+            StripeEventWatermark.objects.create(
+                event_id=newest["id"], created=created
+            )
+
+    return result
@@ -0,0 +1,112 @@
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from books.availability import record_return, record_returns
+from books.inventory import return_copies, return_copy
+from books.models import Book
+from borrowings.fines import fine_amount
+from borrowings.models import Borrowing, Payment
+
+BORROWING = Borrowing._meta.db_table
+BORROWING_BOOK = Borrowing._meta.get_field("book_id").column
+BORROWING_USER = Borrowing._meta.get_field("user_id").column
+
+
+def close_borrowing(borrowing: Borrowing) -> bool:
+    """
+    Closes the borrowing and returns its copy, False if it was already
+    returned
+    """
+    returned_at = timezone.now()
+
+    with transaction.atomic():
+        # closing the borrowing with a conditional update makes
+        # concurrent returns of the same borrowing count only once
+        is_returned = Borrowing.objects.filter(
+            pk=borrowing.pk, actual_return_date__isnull=True
+        ).update(actual_return_date=returned_at, updated_at=returned_at)
+
+        if is_returned:
+            return_copy(borrowing.book_id)
+            record_return(borrowing)
+
+    if is_returned:
+        borrowing.actual_return_date = returned_at
+
+    return bool(is_returned)
+
+
+def close_borrowings(queryset: QuerySet) -> list[Borrowing]:
+    """
+    Closes the active borrowings of the queryset and returns their
+    copies with set-based queries, returns the closed borrowings with
+    their book and the fine fields fine_amount needs
+    """
+    returned_at = timezone.now()
+    selected, params = queryset.order_by().values("pk").query.sql_with_params()
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {BORROWING} AS borrowing "
+            "SET actual_return_date = %s, updated_at = %s "
+            f"FROM {Book._meta.db_table} AS book "
+            f"WHERE borrowing.id IN ({selected}) "
+            "AND borrowing.actual_return_date IS NULL "
+            f"AND book.id = borrowing.{BORROWING_BOOK} "
+            f"RETURNING borrowing.id, borrowing.{BORROWING_USER}, "
+            "borrowing.borrow_date, borrowing.expected_return_date, "
+            "borrowing.fine_days, borrowing.accrued_fine, book.id, book.daily_fee",
+            [returned_at, returned_at, *params],
+        )
+        closed = [
+            Borrowing(
+                id=borrowing_id,
+                user_id_id=user_id,
+                borrow_date=borrow_date,
+                expected_return_date=expected_return_date,
+                actual_return_date=returned_at,
+                fine_days=fine_days,
+                accrued_fine=accrued_fine,
+                book_id=Book(id=book_id, daily_fee=daily_fee),
+            )
+            for (
+                borrowing_id, user_id, borrow_date, expected_return_date,
+                fine_days, accrued_fine, book_id, daily_fee,
+            ) in cursor.fetchall()
+        ]
+
+        if closed:
+            return_copies([borrowing.book_id_id for borrowing in closed])
+            record_returns(closed)
+
+    return closed
+
+
+def create_fine(borrowing: Borrowing) -> Payment | None:
+    """Placeholder fine payment of a borrowing returned late"""
+    if borrowing.actual_return_date - borrowing.expected_return_date <= timedelta(0):
+        return None
+
+    return Payment.objects.create(
+        status="PENDING",
+        type="FINE",
+        borrowing_id=borrowing,
+        to_pay=fine_amount(borrowing),
+    )
+
+
+def create_fines(borrowings: list[Borrowing]) -> list[Payment]:
+    """Placeholder fine payments of the borrowings returned late"""
+    return Payment.objects.bulk_create(
+        Payment(
+            status="PENDING",
+            type="FINE",
+            borrowing_id=borrowing,
+            to_pay=fine_amount(borrowing),
+        )
+        for borrowing in borrowings
+        if borrowing.actual_return_date > borrowing.expected_return_date
+    )
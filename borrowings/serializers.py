@@ -1,12 +1,32 @@
-from decimal import Decimal
-
+from django.conf import settings
 from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
 
+from books.availability import record_borrowings
+from books.inventory import take_copies, take_copy
+from books.models import Book
 from books.serializers import BooksSerializer
 from borrowings.models import Borrowing, Payment
-from borrowings.notification import send_borrowing_create_message
-from borrowings.stripe import create_stripe_session
+from borrowings.notification import (
+    send_borrowing_create_message,
+    send_checkout_message,
+)
+from borrowings.stripe import (
+    attach_session_or_defer,
+    calculate_borrowing_price,
+    check_payments_available,
+)
+
+
+def validate_expected_return_date(value):
+    """Borrowings returned in the past would have a negative price"""
+    if value <= timezone.now():
+        raise serializers.ValidationError(
+            "Expected return date must be in the future."
+        )
+
+    return value
 
 
 class BorrowingSerializer(serializers.ModelSerializer):
@@ -21,26 +41,28 @@ class BorrowingSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ("actual_return_date",)
 
-    @transaction.atomic()
+    def validate_expected_return_date(self, value):
+        return validate_expected_return_date(value)
+
     def create(self, validated_data):
-        validated_data["book_id"].inventory -= 1
-        validated_data["book_id"].save()
+        check_payments_available()
 
-        borrowing = Borrowing.objects.create(**validated_data)
+        # Stripe is called only after the transaction is committed, so the
+        # row lock on the book is not held during the network round-trip
+        with transaction.atomic():
+            take_copy(validated_data["book_id"])
 
-        stripe_session = create_stripe_session(
-            borrowing=borrowing,
-            is_fine=False
-        )
+            borrowing = Borrowing.objects.create(**validated_data)
+            record_borrowings([borrowing])
 
-        Payment.objects.create(
-            status="PENDING",
-            type="PAYMENT",
-            borrowing_id=borrowing,
-            session_url=stripe_session["url"],
-            session_id=stripe_session["id"],
-            to_pay=Decimal(stripe_session["amount_total"] / 100),
-        )
+            payment = Payment.objects.create(
+                status="PENDING",
+                type="PAYMENT",
+                borrowing_id=borrowing,
+                to_pay=calculate_borrowing_price(borrowing),
+            )
+
+        attach_session_or_defer([payment])
 
         send_borrowing_create_message(
             user=validated_data["user_id"],
@@ -49,6 +71,79 @@ class BorrowingSerializer(serializers.ModelSerializer):
         return borrowing
 
 
+class BorrowingCheckoutSerializer(serializers.Serializer):
+    """
+    Borrows several books at once: one transaction for all of them,
+    one Stripe session and one notification for the whole checkout
+    """
+
+    expected_return_date = serializers.DateTimeField()
+    books = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=settings.CHECKOUT_MAX_BOOKS,
+        write_only=True,
+    )
+
+    def validate_books(self, value):
+        books = Book.objects.in_bulk(value)
+        unknown = sorted(set(value) - set(books))
+
+        if unknown:
+            raise serializers.ValidationError(
+                f"Books {unknown} do not exist."
+            )
+
+        return [books[book_id] for book_id in value]
+
+    def validate_expected_return_date(self, value):
+        return validate_expected_return_date(value)
+
+    def create(self, validated_data):
+        books = validated_data["books"]
+        check_payments_available()
+
+        # as in BorrowingSerializer.create, Stripe is called after commit
+        with transaction.atomic():
+            take_copies(books)
+
+            borrowings = Borrowing.objects.bulk_create(
+                Borrowing(
+                    book_id=book,
+                    user_id=validated_data["user_id"],
+                    expected_return_date=validated_data["expected_return_date"],
+                )
+                for book in books
+            )
+            record_borrowings(borrowings)
+
+            payments = Payment.objects.bulk_create(
+                Payment(
+                    status="PENDING",
+                    type="PAYMENT",
+                    borrowing_id=borrowing,
+                    to_pay=calculate_borrowing_price(borrowing),
+                )
+                for borrowing in borrowings
+            )
+
+        attach_session_or_defer(payments)
+
+        send_checkout_message(
+            user=validated_data["user_id"],
+            borrowings=borrowings,
+        )
+        return {"borrowings": borrowings, "payments": payments}
+
+    def to_representation(self, instance):
+        return {
+            "borrowings": BorrowingSerializer(
+                instance["borrowings"], many=True
+            ).data,
+            "session_url": instance["payments"][0].session_url,
+        }
+
+
 class BorrowingDetailSerializer(BorrowingSerializer):
     book_id = BooksSerializer(many=False, read_only=True)
 
@@ -60,6 +155,7 @@ class BorrowingDetailSerializer(BorrowingSerializer):
             "actual_return_date",
             "book_id",
             "user_id",
+            "accrued_fine",
         )
 
 
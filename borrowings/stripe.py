@@ -1,44 +1,230 @@
+import logging
+from decimal import Decimal
+
 import stripe
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from borrowings.fines import fine_amount
+from borrowings.models import Borrowing, Payment
+from borrowings.payment_gateway import PaymentGatewayUnavailable, get_gateway
+from library_project.async_db import database_slot
+from library_project.settings import STRIPE_API_BASE, STRIPE_API_KEY
 
-from borrowings.models import Borrowing
-from library_project.settings import STRIPE_API_KEY
+logger = logging.getLogger(__name__)
 
 stripe.api_key = STRIPE_API_KEY
-FINE_MULTIPLIER = 2
+stripe.api_base = STRIPE_API_BASE
+
+
+class PaymentsUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Payments are unavailable now, try again later."
+    default_code = "payments_unavailable"
+
+
+def calculate_borrowing_price(borrowing: Borrowing) -> Decimal:
+    """Price of the whole borrowing period, known before Stripe is called"""
+    return (
+        borrowing.expected_return_date - borrowing.borrow_date
+    ).days * borrowing.book_id.daily_fee
+
+
+def _line_item(name: str, price) -> dict:
+    return {
+        "price_data": {
+            "currency": "usd",
+            "product_data": {"name": name},
+            "unit_amount": int(price * 100),
+        },
+        "quantity": 1,
+    }
+
+
+def _session_urls(borrowing: Borrowing) -> dict:
+    url = "http://127.0.0.1:8000/api/borrowings/borrowings/" + str(borrowing.id)
+    return {
+        "success_url": url + "/success?session_id={CHECKOUT_SESSION_ID}",
+        "cancel_url": url + "/cancel?session_id={CHECKOUT_SESSION_ID}",
+    }
+
+
+def _stripe_session_params(borrowing: Borrowing, is_fine: bool) -> dict:
+    total_price = calculate_borrowing_price(borrowing)
+
+    text = "Borrowing"
+
+    if is_fine:
+        total_price = fine_amount(borrowing)
+        text = "Fine "
+
+    return {
+        "line_items": [
+            _line_item(
+                f"{text} of {borrowing.book_id.title} by {borrowing.user_id}",
+                total_price,
+            ),
+        ],
+        **_session_urls(borrowing),
+    }
 
 
 def create_stripe_session(
         borrowing: Borrowing,
         is_fine: bool,
 ):
-    total_price = (
-                          borrowing.expected_return_date - borrowing.borrow_date
-                  ).days * borrowing.book_id.daily_fee
+    return get_gateway().create_checkout_session(
+        **_stripe_session_params(borrowing, is_fine)
+    )
 
-    text = "Borrowing"
 
-    if is_fine:
-        overdue = borrowing.actual_return_date - borrowing.expected_return_date
-        total_price = overdue.days * float(borrowing.book_id.daily_fee) * FINE_MULTIPLIER
-        text = "Fine "
+async def acreate_stripe_session(borrowing: Borrowing, is_fine: bool):
+    return await get_gateway().acreate_checkout_session(
+        **_stripe_session_params(borrowing, is_fine)
+    )
 
-    url = "http://127.0.0.1:8000/api/borrowings/borrowings/" + str(borrowing.id)
-    stripe_session = stripe.checkout.Session.create(
+
+def create_checkout_session(borrowings: list[Borrowing]):
+    """
+    One Stripe session with a line item per borrowing, it redirects
+    to the success and cancel pages of the first borrowing
+    """
+    return get_gateway().create_checkout_session(
         line_items=[
-            {
-                "price_data": {
-                    "currency": "usd",
-                    "product_data": {
-                        "name": f"{text} of {borrowing.book_id.title} by {borrowing.user_id}"
-                    },
-                    "unit_amount": int(total_price * 100),
-                },
-                "quantity": 1,
-            },
+            _line_item(
+                f"Borrowing of {borrowing.book_id.title} by {borrowing.user_id}",
+                calculate_borrowing_price(borrowing),
+            )
+            for borrowing in borrowings
         ],
-        mode="payment",
-        success_url=url + "/success?session_id={CHECKOUT_SESSION_ID}",
-        cancel_url=url + "/cancel?session_id={CHECKOUT_SESSION_ID}",
+        **_session_urls(borrowings[0]),
     )
 
-    return stripe_session
+
+def _store_session(payment: Payment, stripe_session) -> list[str]:
+    payment.session_url = stripe_session["url"]
+    payment.session_id = stripe_session["id"]
+    payment.to_pay = Decimal(stripe_session["amount_total"]) / 100
+
+    return ["session_url", "session_id", "to_pay"]
+
+
+def attach_stripe_session(payment: Payment) -> Payment:
+    """
+    Creates a Stripe session for a placeholder payment and stores
+    its id and url on the payment
+    """
+    stripe_session = create_stripe_session(
+        borrowing=payment.borrowing_id,
+        is_fine=payment.type == "FINE",
+    )
+    payment.save(update_fields=_store_session(payment, stripe_session))
+
+    return payment
+
+
+async def aattach_stripe_session(payment: Payment) -> Payment:
+    stripe_session = await acreate_stripe_session(
+        borrowing=payment.borrowing_id,
+        is_fine=payment.type == "FINE",
+    )
+    update_fields = _store_session(payment, stripe_session)
+
+    async with database_slot():
+        await payment.asave(update_fields=update_fields)
+
+    return payment
+
+
+def attach_checkout_session(payments: list[Payment]) -> list[Payment]:
+    """
+    Creates one Stripe session for the placeholder payments of a checkout
+    and stores its id and url on all of them. Every payment keeps its
+    own price, the session total is their sum.
+    """
+    stripe_session = create_checkout_session(
+        [payment.borrowing_id for payment in payments]
+    )
+
+    for payment in payments:
+        payment.session_url = stripe_session["url"]
+        payment.session_id = stripe_session["id"]
+
+    Payment.objects.bulk_update(payments, ["session_url", "session_id"])
+
+    return payments
+
+
+def check_payments_available() -> None:
+    """
+    Fails fast, before anything is written, while the payment gateway
+    circuit is open and PAYMENT_GATEWAY_FALLBACK is "fail"
+    """
+    if (
+            settings.PAYMENT_GATEWAY_FALLBACK == "fail"
+            and not settings.STRIPE_DEFERRED_SESSION
+            and get_gateway().breaker.is_open
+    ):
+        raise PaymentsUnavailable()
+
+
+def attach_session_or_defer(payments: list[Payment]) -> None:
+    """
+    Creates the Stripe session of committed placeholder payments, one
+    session for several of them. In the deferred mode, when the payment
+    gateway is unavailable or Stripe rejects the session, a Celery task
+    creates it later.
+    """
+    from borrowings import tasks
+
+    if len(payments) == 1:
+        task, args = tasks.create_payment_session, (payments[0].id,)
+    else:
+        task, args = tasks.create_checkout_payment_session, (
+            [payment.id for payment in payments],
+        )
+
+    if settings.STRIPE_DEFERRED_SESSION:
+        transaction.on_commit(lambda: task.delay(*args))
+        return
+
+    try:
+        if len(payments) == 1:
+            attach_stripe_session(payments[0])
+        else:
+            attach_checkout_session(payments)
+    except (stripe.error.StripeError, PaymentGatewayUnavailable) as error:
+        if isinstance(error, stripe.error.StripeError):
+            # the borrowing is committed, the payment must not be lost
+            logger.exception("Stripe did not create the session of %s", args)
+
+        transaction.on_commit(
+            lambda: task.apply_async(
+                args, countdown=settings.PAYMENT_GATEWAY_RESET_TIMEOUT
+            )
+        )
+
+
+async def aattach_session_or_defer(payment: Payment) -> None:
+    """
+    attach_session_or_defer of one payment for async views, they run
+    without a transaction, so the task is queued at once
+    """
+    from borrowings import tasks
+
+    if settings.STRIPE_DEFERRED_SESSION:
+        await sync_to_async(tasks.create_payment_session.delay)(payment.id)
+        return
+
+    try:
+        await aattach_stripe_session(payment)
+    except (stripe.error.StripeError, PaymentGatewayUnavailable) as error:
+        if isinstance(error, stripe.error.StripeError):
+            logger.exception("Stripe did not create the session of %s", payment.id)
+
+        await sync_to_async(tasks.create_payment_session.apply_async)(
+            (payment.id,), countdown=settings.PAYMENT_GATEWAY_RESET_TIMEOUT
+        )
@@ -1,29 +1,211 @@
-from datetime import date, timedelta
+import heapq
+from datetime import datetime, time, timedelta
 
-from celery import shared_task
+import stripe
+from celery import chord, shared_task
+from django.conf import settings
+from django.db.models import Max, Min
+from django.utils import timezone
 
-from borrowings.models import Borrowing
-from borrowings.notification import send_notification
+from borrowings.fines import accrue_fines, refresh_outstanding_fines
+from borrowings.models import Borrowing, Payment
+from borrowings.notification import (
+    NotificationDeliveryError,
+    deliver,
+    flush_queue,
+    send_notification,
+)
+from borrowings.payment_gateway import PaymentGatewayUnavailable
+from borrowings.reconciliation import reconcile_payments
+from borrowings.stripe import attach_checkout_session, attach_stripe_session
+from borrowings.webhooks import process_events
+
+
+def overdue_borrowings(cutoff):
+    return Borrowing.objects.filter(
+        actual_return_date__isnull=True,
+        expected_return_date__lte=cutoff,
+    )
+
+
+def format_overdue_borrowing(
+        borrowing_id: int, email: str, title: str, expected_return_date
+) -> str:
+    return (
+        "Overdue borrowing: \n"
+        f"Id: {borrowing_id},\n"
+        f"Email: {email},\n"
+        f"Book: {title}\n"
+        f"Expected return date: {expected_return_date}\n"
+    )
 
 
 @shared_task
 def check_overdue_borrowings():
-    overdue_borrowings = Borrowing.objects.filter(
-        actual_return_date__isnull=True,
-        expected_return_date__lte=date.today() + timedelta(days=1),
+    """
+    Splits the overdue scan into id ranges, scans them in parallel
+    subtasks and sends one digest with the results
+    """
+    cutoff = timezone.make_aware(
+        datetime.combine(timezone.localdate() + timedelta(days=1), time.min)
+    ).isoformat()
+    bounds = overdue_borrowings(cutoff).aggregate(
+        first_id=Min("id"), last_id=Max("id")
     )
 
-    if overdue_borrowings:
-        send_notification("Here some overdue borrowings!!")
-
-        for borrowing in overdue_borrowings:
-            message = (
-                "Overdue borrowing: \n"
-                f"Id: {borrowing.id},\n"
-                f"Email: {borrowing.user_id.email},\n"
-                f"Book: {borrowing.book_id.title}\n"
-                f"Expected return date: {borrowing.expected_return_date}\n"
-            )
-            send_notification(message)
-    else:
+    if bounds["first_id"] is None:
+        send_notification("No borrowings overdue today!")
+        return
+
+    step = settings.OVERDUE_SCAN_RANGE_SIZE
+    ranges = [
+        (first_id, min(first_id + step - 1, bounds["last_id"]))
+        for first_id in range(bounds["first_id"], bounds["last_id"] + 1, step)
+    ]
+
+    if len(ranges) == 1:
+        send_overdue_digest([scan_overdue_range(*ranges[0], cutoff)])
+        return
+
+    chord(
+        scan_overdue_range.s(first_id, last_id, cutoff)
+        for first_id, last_id in ranges
+    )(send_overdue_digest.s())
+
+
+@shared_task
+def scan_overdue_range(first_id: int, last_id: int, cutoff: str) -> dict:
+    """
+    Streams overdue borrowings of an id range with only the needed
+    columns and returns their count and the most overdue of them
+    """
+    rows = overdue_borrowings(cutoff).filter(
+        id__range=(first_id, last_id)
+    ).order_by("id").values_list(
+        "expected_return_date", "id", "user_id__email", "book_id__title"
+    ).iterator(chunk_size=settings.OVERDUE_SCAN_CHUNK_SIZE)
+
+    count = 0
+
+    def counted(stream):
+        nonlocal count
+        for expected_return_date, *row in stream:
+            count += 1
+            yield expected_return_date.isoformat(), *row
+
+    most_overdue = heapq.nsmallest(settings.OVERDUE_DIGEST_SIZE, counted(rows))
+
+    return {"count": count, "most_overdue": most_overdue}
+
+
+@shared_task
+def send_overdue_digest(results: list[dict]) -> None:
+    """Sends one message that sums up all scanned ranges"""
+    count = sum(result["count"] for result in results)
+
+    if not count:
         send_notification("No borrowings overdue today!")
+        return
+
+    most_overdue = heapq.nsmallest(
+        settings.OVERDUE_DIGEST_SIZE,
+        (tuple(row) for result in results for row in result["most_overdue"]),
+    )
+    send_notification(
+        f"Here some overdue borrowings!! Total: {count}.\n"
+        "Most overdue of them:\n\n"
+        + "\n".join(
+            format_overdue_borrowing(borrowing_id, email, title, expected_return_date)
+            for expected_return_date, borrowing_id, email, title in most_overdue
+        )
+    )
+
+
+@shared_task
+def accrue_overdue_fines() -> int:
+    """
+    Stores the fines of overdue borrowings whose overdue days changed
+    and sums them up for the outstanding total
+    """
+    updated = accrue_fines()
+    refresh_outstanding_fines()
+
+    return updated
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=10)
+def create_payment_session(self, payment_id: int) -> None:
+    """
+    Creates the Stripe session for a payment that was committed
+    as a placeholder (deferred payment-session mode)
+    """
+    payment = Payment.objects.select_related(
+        "borrowing_id__book_id", "borrowing_id__user_id"
+    ).get(pk=payment_id)
+
+    if payment.session_id:
+        return
+
+    try:
+        attach_stripe_session(payment)
+    except (stripe.error.StripeError, PaymentGatewayUnavailable) as exc:
+        raise self.retry(exc=exc)
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=10)
+def create_checkout_payment_session(self, payment_ids: list[int]) -> None:
+    """
+    Creates the one Stripe session of a bulk checkout for its payments
+    that were committed as placeholders (deferred payment-session mode)
+    """
+    payments = list(
+        Payment.objects.select_related(
+            "borrowing_id__book_id", "borrowing_id__user_id"
+        ).filter(pk__in=payment_ids).order_by("pk")
+    )
+
+    if not payments or any(payment.session_id for payment in payments):
+        return
+
+    try:
+        attach_checkout_session(payments)
+    except (stripe.error.StripeError, PaymentGatewayUnavailable) as exc:
+        raise self.retry(exc=exc)
+
+
+def _backoff(error: NotificationDeliveryError, retries: int) -> int:
+    return error.retry_after or 2 ** retries
+
+
+@shared_task(bind=True, max_retries=8)
+def flush_notifications(self) -> int:
+    """Delivers the queued admin notifications in batches"""
+    try:
+        return flush_queue()
+    except NotificationDeliveryError as error:
+        raise self.retry(exc=error, countdown=_backoff(error, self.request.retries))
+
+
+@shared_task(bind=True, max_retries=8)
+def send_notifications(self, messages: list[str]) -> None:
+    """Delivers admin notifications directly when no queue is configured"""
+    try:
+        deliver(messages)
+    except NotificationDeliveryError as error:
+        raise self.retry(
+            args=[error.undelivered],
+            exc=error,
+            countdown=_backoff(error, self.request.retries),
+        )
+
+
+@shared_task
+def process_stripe_events() -> int:
+    """Applies the checkout session events received by the webhook"""
+    return process_events()
+
+
+@shared_task
+def reconcile_stripe_payments() -> dict | None:
+    """Applies the checkout session events the webhook may have missed"""
+    return reconcile_payments()
@@ -0,0 +1,211 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.admin import helpers
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from books.availability import record_borrowings
+from books.models import Book, BookAvailability
+from borrowings.fines import accrue_fines
+from borrowings.models import Borrowing, Payment
+
+BORROWING_CHANGELIST_URL = reverse("admin:borrowings_borrowing_changelist")
+PAYMENT_CHANGELIST_URL = reverse("admin:borrowings_payment_changelist")
+
+
+class AdminTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.admin = get_user_model().objects.create_superuser(
+            "admin@library.com", "password"
+        )
+        self.reader = get_user_model().objects.create_user(
+            "reader@library.com", "password"
+        )
+        self.book = Book.objects.create(
+            title="Piranesi",
+            author="Susanna Clarke",
+            cover="Hard",
+            inventory=5,
+            daily_fee=Decimal("0.50"),
+        )
+        self.client.force_login(self.admin)
+
+    def borrowing(self, expected_in, **params):
+        return Borrowing.objects.create(
+            book_id=self.book,
+            user_id=self.reader,
+            expected_return_date=self.now + expected_in,
+            **params,
+        )
+
+    def payment(self, payment_status):
+        return Payment.objects.create(
+            status=payment_status,
+            type="PAYMENT",
+            borrowing_id=self.borrowing(timedelta(days=7)),
+            session_id=f"cs_admin_{payment_status}",
+            to_pay=Decimal("3.50"),
+        )
+
+    def queries(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.borrowing(timedelta(days=7))
+        self.payment("PENDING")
+        queries = {
+            url: self.queries(url, **params)
+            for url, params in [
+                (BORROWING_CHANGELIST_URL, {"state": "overdue"}),
+                (BORROWING_CHANGELIST_URL, {"q": "reader@library.com"}),
+                (PAYMENT_CHANGELIST_URL, {"status__exact": "PENDING"}),
+            ]
+        }
+
+        for _ in range(10):
+            self.payment("PENDING")
+
+        for url, count in queries.items():
+            self.assertEqual(self.queries(url), count)
+
+    def test_changelist_filters(self):
+        overdue = self.borrowing(-timedelta(days=1))
+        self.borrowing(timedelta(days=7))
+        self.borrowing(-timedelta(days=3), actual_return_date=self.now)
+
+        # the fixture has overdue borrowings of other readers
+        response = self.client.get(
+            BORROWING_CHANGELIST_URL,
+            {"state": "overdue", "q": "reader@library.com"},
+        )
+
+        self.assertEqual(
+            [borrowing.id for borrowing in response.context["cl"].result_list],
+            [overdue.id],
+        )
+
+        response = self.client.get(
+            reverse("admin:autocomplete"),
+            {
+                "app_label": "borrowings",
+                "model_name": "borrowing",
+                "field_name": "book_id",
+                "term": "piranessi",
+            },
+        )
+
+        self.assertEqual(
+            [book["id"] for book in response.json()["results"]],
+            [str(self.book.id)],
+        )
+
+    @patch("borrowings.tasks.create_payment_session.delay")
+    def test_mark_returned(self, delay):
+        late = self.borrowing(-timedelta(days=2, hours=1))
+        active = self.borrowing(timedelta(days=7))
+        returned = self.borrowing(-timedelta(days=3), actual_return_date=self.now)
+        record_borrowings([late, active])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                BORROWING_CHANGELIST_URL,
+                {
+                    "action": "mark_returned",
+                    helpers.ACTION_CHECKBOX_NAME: [late.id, active.id, returned.id],
+                },
+                follow=True,
+            )
+
+        self.assertContains(response, "2 borrowings returned, 1 fines charged.")
+        self.assertFalse(
+            Borrowing.objects.filter(
+                book_id=self.book, actual_return_date__isnull=True
+            ).exists()
+        )
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 7)
+        self.assertEqual(
+            BookAvailability.objects.get(book=self.book).active_loans, 0
+        )
+        fine = Payment.objects.get(type="FINE")
+        self.assertEqual(
+            (fine.borrowing_id_id, fine.to_pay), (late.id, Decimal("2.00"))
+        )
+        delay.assert_called_once_with(fine.id)
+
+    def test_extending_a_borrowing_resets_its_fine(self):
+        borrowing = self.borrowing(-timedelta(days=3, hours=1))
+        accrue_fines(self.now)
+        extended = timezone.localtime(self.now + timedelta(days=7))
+
+        response = self.client.post(
+            reverse("admin:borrowings_borrowing_change", args=[borrowing.id]),
+            {
+                "book_id": self.book.id,
+                "user_id": self.reader.id,
+                "expected_return_date_0": extended.strftime("%Y-%m-%d"),
+                "expected_return_date_1": extended.strftime("%H:%M:%S"),
+                "actual_return_date_0": "",
+                "actual_return_date_1": "",
+            },
+        )
+
+        self.assertEqual(response.status_code, 302)
+        fine = Borrowing.objects.values_list(
+            "fine_days", "accrued_fine", "fine_accrues_at"
+        )
+        self.assertEqual(fine.get(pk=borrowing.pk), (0, Decimal("0"), None))
+
+        accrue_fines(self.now + timedelta(days=1))
+
+        self.assertEqual(fine.get(pk=borrowing.pk), (0, Decimal("0"), None))
+
+    @patch("borrowings.tasks.create_payment_session.delay")
+    def test_mark_returned_is_rolled_back_when_fines_fail(self, delay):
+        late = self.borrowing(-timedelta(days=2, hours=1))
+
+        with patch(
+                "borrowings.admin.create_fines", side_effect=DatabaseError
+        ), self.assertRaises(DatabaseError), self.captureOnCommitCallbacks(
+            execute=True
+        ):
+            self.client.post(
+                BORROWING_CHANGELIST_URL,
+                {"action": "mark_returned", helpers.ACTION_CHECKBOX_NAME: [late.id]},
+            )
+
+        late.refresh_from_db()
+        self.assertIsNone(late.actual_return_date)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 5)
+        delay.assert_not_called()
+
+    def test_cancel_pending_payments(self):
+        pending = self.payment("PENDING")
+        paid = self.payment("PAID")
+
+        self.client.post(
+            PAYMENT_CHANGELIST_URL,
+            {
+                "action": "cancel_pending",
+                helpers.ACTION_CHECKBOX_NAME: [pending.id, paid.id],
+            },
+        )
+
+        self.assertEqual(
+            dict(Payment.objects.filter(
+                pk__in=[pending.id, paid.id]
+            ).values_list("id", "status")),
+            {pending.id: "EXPIRED", paid.id: "PAID"},
+        )
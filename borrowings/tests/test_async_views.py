@@ -0,0 +1,150 @@
+import asyncio
+from datetime import timedelta
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books.models import Book
+from borrowings.models import Borrowing, Payment
+from library_project.async_db import database_slot
+from user.serializers import TokenObtainPairSerializer
+
+
+def return_url(borrowing_id):
+    return reverse("borrowings:borrowing-return-book", args=[borrowing_id])
+
+
+def success_url(borrowing_id):
+    return reverse("borrowings:borrowing-borrowing-is-successfully-paid", args=[borrowing_id])
+
+
+def cancel_url(borrowing_id):
+    return reverse("borrowings:borrowing-borrowing-payment-is-cancelled", args=[borrowing_id])
+
+
+@override_settings(
+    ROOT_URLCONF="library_project.asgi_urls",
+    PAYMENT_GATEWAY="borrowings.tests.test_payment_gateway.FlakyGateway",
+)
+class AsyncBorrowingViewsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "reader@library.com", "password"
+        )
+        token = TokenObtainPairSerializer.get_token(self.user).access_token
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.async_client = AsyncClient()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.book = Book.objects.create(
+            title="Harry Potter",
+            author="J.K. Rowling",
+            cover="Hard",
+            inventory=5,
+            daily_fee=1,
+        )
+        self.borrowing = Borrowing.objects.create(
+            expected_return_date=timezone.now() - timedelta(days=3),
+            book_id=self.book,
+            user_id=self.user,
+        )
+        self.payment = Payment.objects.create(
+            status="PENDING",
+            type="PAYMENT",
+            borrowing_id=self.borrowing,
+            session_id="cs_test",
+            session_url="https://checkout.stripe.com/cs_test",
+            to_pay=7,
+        )
+        other = get_user_model().objects.create_user("other@library.com", "password")
+        self.other_borrowing = Borrowing.objects.create(
+            expected_return_date=timezone.now(), book_id=self.book, user_id=other
+        )
+
+    async def test_late_return_creates_fine_session_on_async_gateway(self):
+        with patch(
+                "borrowings.tests.test_payment_gateway.FlakyGateway.acreate_checkout_session",
+                return_value={"id": "cs_fine", "url": "https://fine", "amount_total": 600},
+        ) as create_session:
+            response = await self.async_client.post(
+                return_url(self.borrowing.id), headers=self.headers
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        fine = await Payment.objects.aget(type="FINE")
+        self.assertEqual(fine.session_id, "cs_fine")
+        self.assertEqual(fine.to_pay, 6)
+        create_session.assert_awaited_once()
+        self.assertEqual((await Book.objects.aget(pk=self.book.pk)).inventory, 6)
+
+        response = await self.async_client.post(
+            return_url(self.borrowing.id), headers=self.headers
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    async def test_borrowings_of_other_users_can_not_be_returned(self):
+        response = await self.async_client.post(
+            return_url(self.other_borrowing.id), headers=self.headers
+        )
+
+        with self.settings(ROOT_URLCONF="library_project.urls"):
+            expected = await sync_to_async(self.client.post)(
+                return_url(self.other_borrowing.id)
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(expected.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.json(), expected.json())
+        await self.other_borrowing.arefresh_from_db()
+        self.assertIsNone(self.other_borrowing.actual_return_date)
+
+    async def test_requests_without_token_are_rejected(self):
+        response = await AsyncClient().post(return_url(self.borrowing.id))
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("WWW-Authenticate", response.headers)
+
+    async def test_success_and_cancel_respond_like_the_viewset(self):
+        requests = [
+            (success_url(self.borrowing.id), {"session_id": "cs_test"}),
+            (success_url(self.borrowing.id), {"session_id": "cs_other"}),
+            (cancel_url(self.borrowing.id), {"session_id": "cs_test"}),
+            (success_url(self.other_borrowing.id), {"session_id": "cs_test"}),
+        ]
+
+        for url, params in requests:
+            response = await self.async_client.get(url, params, headers=self.headers)
+
+            with self.settings(ROOT_URLCONF="library_project.urls"):
+                expected = await self.sync_get(url, params)
+
+            with self.subTest(url=url, params=params):
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.json(), expected.json())
+
+    async def sync_get(self, url, params):
+        return await sync_to_async(self.client.get)(url, params)
+
+    @override_settings(ASYNC_DATABASE_CONNECTIONS=2)
+    async def test_database_slots_limit_concurrent_requests(self):
+        inside = peak = 0
+
+        async def request():
+            nonlocal inside, peak
+
+            async with database_slot():
+                inside += 1
+                peak = max(peak, inside)
+                await asyncio.sleep(0.01)
+                inside -= 1
+
+        await asyncio.gather(*(request() for _ in range(5)))
+
+        self.assertEqual(peak, 2)
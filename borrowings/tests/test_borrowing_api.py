@@ -1,7 +1,7 @@
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -77,10 +77,10 @@ class AuthenticatedBorrowingApiTests(TestCase):
 
     def test_list_borrowings_display_this_user_borrowings(self):
         response = self.client.get(BORROWING_URL)
-        borrowings = Borrowing.objects.filter(user_id=self.user)
+        borrowings = Borrowing.objects.filter(user_id=self.user).order_by("-id")
         serializer = BorrowingSerializer(borrowings, many=True)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
     def test_retrieve_borrowings_allowed(self):
         response = self.client.get(detail_url(self.user.borrowing.first().id))
@@ -103,7 +103,7 @@ class AuthenticatedBorrowingApiTests(TestCase):
     def test_create_success_borrowing_and_decrease_inventory_by_1(self):
         start_inventory = self.book.inventory
         payload = {
-            "expected_return_date": "2023-12-12",
+            "expected_return_date": "2099-12-12",
             "book_id": self.book.id,
         }
         response = self.client.post(BORROWING_URL, payload)
@@ -112,14 +112,18 @@ class AuthenticatedBorrowingApiTests(TestCase):
             Book.objects.get(pk=self.book.id).inventory, start_inventory - 1
         )
 
+    @override_settings(CHAT_ID="1")
     def test_task_borrowings_overdue(self):
-        with patch("requests.get") as mock_send_notification:
-            check_overdue_borrowings()
+        with patch(
+                "borrowings.notification.enqueue_notification"
+        ) as mock_send_notification:
+            with self.captureOnCommitCallbacks(execute=True):
+                check_overdue_borrowings()
             mock_send_notification.assert_called()
 
     def test_crate_payment_and_stripe_session_when_creating_a_borrowing(self):
         payload = {
-            "expected_return_date": "2023-12-12",
+            "expected_return_date": "2099-12-12",
             "book_id": self.book.id,
         }
 
@@ -146,10 +150,12 @@ class AdminBorrowingApiTests(TestCase):
         sample_setup(self)
 
     def test_filtering_by_user_id(self):
-        another_borrowings = Borrowing.objects.filter(user_id__id=self.another_user.id)
+        another_borrowings = Borrowing.objects.filter(
+            user_id__id=self.another_user.id
+        ).order_by("-id")
         serializer_another = BorrowingSerializer(another_borrowings, many=True)
 
         response = self.client.get(BORROWING_URL, {"user_id": self.another_user.id})
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(serializer_another.data, response.data)
+        self.assertEqual(serializer_another.data, response.data["results"])
@@ -0,0 +1,164 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books.models import Book
+from borrowings.models import Borrowing, Payment
+from borrowings.tasks import create_checkout_payment_session
+
+CHECKOUT_URL = reverse("borrowings:borrowing-checkout")
+
+STRIPE_SESSION = {
+    "id": "cs_test_checkout",
+    "url": "https://checkout.stripe.com/c/pay/cs_test_checkout",
+    "amount_total": 1000,
+}
+
+
+def sample_book(**params):
+    defaults = {
+        "title": "Harry Potter 2",
+        "author": "J.K. Rowling",
+        "cover": "Hard",
+        "inventory": 5,
+        "daily_fee": 0.5,
+    }
+    defaults.update(params)
+
+    return Book.objects.create(**defaults)
+
+
+@patch("borrowings.serializers.send_checkout_message")
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "authenticated@library.com", "password"
+        )
+        self.client.force_authenticate(self.user)
+        self.books = [
+            sample_book(title=f"Book {number}", inventory=number)
+            for number in range(1, 4)
+        ]
+        self.payload = {
+            "expected_return_date": "2099-12-12",
+            "books": [book.id for book in self.books],
+        }
+
+    @patch("stripe.checkout.Session.create", return_value=STRIPE_SESSION)
+    def test_checkout_creates_borrowings_and_one_session(
+            self, session_create, send_message
+    ):
+        response = self.client.post(CHECKOUT_URL, self.payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["session_url"], STRIPE_SESSION["url"])
+        self.assertEqual(
+            [borrowing["book_id"] for borrowing in response.data["borrowings"]],
+            self.payload["books"],
+        )
+        self.assertEqual(
+            list(Book.objects.filter(
+                pk__in=self.payload["books"]
+            ).order_by("pk").values_list("inventory", flat=True)),
+            [0, 1, 2],
+        )
+
+        payments = Payment.objects.filter(borrowing_id__user_id=self.user)
+        self.assertEqual(payments.count(), 3)
+        self.assertEqual(
+            set(payments.values_list("session_id", flat=True)),
+            {STRIPE_SESSION["id"]},
+        )
+        self.assertTrue(all(payment.to_pay > 0 for payment in payments))
+
+        session_create.assert_called_once()
+        self.assertEqual(len(session_create.call_args.kwargs["line_items"]), 3)
+        send_message.assert_called_once()
+
+    @patch("stripe.checkout.Session.create", return_value=STRIPE_SESSION)
+    def test_checkout_fails_as_a_whole_when_book_is_out_of_stock(
+            self, session_create, send_message
+    ):
+        empty = sample_book(title="Empty", inventory=0)
+
+        response = self.client.post(
+            CHECKOUT_URL,
+            {**self.payload, "books": self.payload["books"] + [empty.id]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertIn("Empty", response.data["detail"])
+        self.assertFalse(Borrowing.objects.filter(user_id=self.user).exists())
+        self.assertEqual(
+            list(Book.objects.filter(
+                pk__in=self.payload["books"]
+            ).order_by("pk").values_list("inventory", flat=True)),
+            [1, 2, 3],
+        )
+        session_create.assert_not_called()
+        send_message.assert_not_called()
+
+    def test_checkout_takes_a_copy_per_listed_book(self, send_message):
+        with patch("stripe.checkout.Session.create", return_value=STRIPE_SESSION):
+            response = self.client.post(
+                CHECKOUT_URL,
+                {**self.payload, "books": [self.books[1].id] * 2},
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Book.objects.get(pk=self.books[1].pk).inventory, 0)
+
+        response = self.client.post(
+            CHECKOUT_URL,
+            {**self.payload, "books": [self.books[2].id] * 4},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Book.objects.get(pk=self.books[2].pk).inventory, 3)
+
+    def test_checkout_validates_books(self, send_message):
+        for books in ([], [0], [10 ** 9], list(range(1, 23))):
+            response = self.client.post(
+                CHECKOUT_URL, {**self.payload, "books": books}, format="json"
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(
+            CHECKOUT_URL,
+            {**self.payload, "expected_return_date": "2023-12-12"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("expected_return_date", response.data)
+
+    @override_settings(STRIPE_DEFERRED_SESSION=True)
+    @patch("stripe.checkout.Session.create", return_value=STRIPE_SESSION)
+    @patch("borrowings.tasks.create_checkout_payment_session.delay")
+    def test_deferred_mode_creates_session_in_task(
+            self, delay, session_create, send_message
+    ):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(CHECKOUT_URL, self.payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsNone(response.data["session_url"])
+        session_create.assert_not_called()
+
+        payment_ids = delay.call_args.args[0]
+        self.assertEqual(len(payment_ids), 3)
+
+        create_checkout_payment_session(payment_ids)
+        create_checkout_payment_session(payment_ids)
+
+        session_create.assert_called_once()
+        self.assertEqual(
+            set(Payment.objects.filter(
+                pk__in=payment_ids
+            ).values_list("session_url", flat=True)),
+            {STRIPE_SESSION["url"]},
+        )
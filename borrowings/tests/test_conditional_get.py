@@ -0,0 +1,120 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books.inventory import take_copy
+from books.models import Book
+from borrowings.fines import accrue_fines
+from borrowings.models import Borrowing
+
+BOOK_URL = reverse("books:book-list")
+BORROWING_URL = reverse("borrowings:borrowing-list")
+
+
+@override_settings(STRIPE_DEFERRED_SESSION=True)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "reader@library.com", "password"
+        )
+        self.client.force_authenticate(self.user)
+        self.book = Book.objects.create(
+            title="Harry Potter",
+            author="J.K. Rowling",
+            cover="Hard",
+            inventory=5,
+            daily_fee=1,
+        )
+        self.borrowing = Borrowing.objects.create(
+            book_id=self.book,
+            user_id=self.user,
+            expected_return_date=timezone.now() - timedelta(days=2),
+        )
+
+    def revalidate(self, url, response, expected_status):
+        revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(revalidated.status_code, expected_status)
+
+        return revalidated
+
+    def test_unchanged_borrowings_are_not_modified(self):
+        response = self.client.get(BORROWING_URL)
+
+        revalidated = self.revalidate(
+            BORROWING_URL, response, status.HTTP_304_NOT_MODIFIED
+        )
+        self.assertEqual(revalidated["ETag"], response["ETag"])
+        self.assertEqual(revalidated.content, b"")
+
+        with patch("borrowings.tasks.create_payment_session.delay"):
+            self.client.post(
+                reverse("borrowings:borrowing-return-book", args=[self.borrowing.id])
+            )
+
+        self.revalidate(BORROWING_URL, response, status.HTTP_200_OK)
+
+    def test_borrowing_detail_changes_with_its_fine(self):
+        url = reverse("borrowings:borrowing-detail", args=[self.borrowing.id])
+        response = self.client.get(url)
+        self.assertIn("Last-Modified", response)
+
+        self.assertEqual(
+            self.client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+            ).status_code,
+            status.HTTP_304_NOT_MODIFIED,
+        )
+        self.revalidate(url, response, status.HTTP_304_NOT_MODIFIED)
+
+        accrue_fines()
+
+        self.revalidate(url, response, status.HTTP_200_OK)
+
+    def test_borrowings_of_other_users_do_not_match(self):
+        response = self.client.get(BORROWING_URL)
+        self.client.force_authenticate(
+            get_user_model().objects.create_user("other@library.com", "password")
+        )
+
+        self.revalidate(BORROWING_URL, response, status.HTTP_200_OK)
+
+    def test_cached_catalog_is_revalidated_without_the_database(self):
+        detail_url = reverse("books:book-detail", args=[self.book.id])
+        page = self.client.get(BOOK_URL)
+        detail = self.client.get(detail_url)
+
+        with self.assertNumQueries(0):
+            self.revalidate(BOOK_URL, page, status.HTTP_304_NOT_MODIFIED)
+            self.revalidate(detail_url, detail, status.HTTP_304_NOT_MODIFIED)
+
+        take_copy(self.book)
+
+        self.revalidate(detail_url, detail, status.HTTP_200_OK)
+
+        self.book.title = "The Hobbit"
+        self.book.save()
+
+        self.revalidate(BOOK_URL, page, status.HTTP_200_OK)
+
+    def test_modified_since_an_earlier_date(self):
+        url = reverse("books:book-detail", args=[self.book.id])
+
+        response = self.client.get(
+            url,
+            HTTP_IF_MODIFIED_SINCE=http_date(
+                (self.book.updated_at - timedelta(minutes=1)).timestamp()
+            ),
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["title"], "Harry Potter")
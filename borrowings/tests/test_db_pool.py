@@ -0,0 +1,113 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import psycopg2
+from django.test import SimpleTestCase
+from psycopg2.extensions import (
+    TRANSACTION_STATUS_IDLE,
+    TRANSACTION_STATUS_INERROR,
+)
+
+from library_project.pooled_postgresql import pool
+from library_project.pooled_postgresql.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self, healthy=True):
+        self.closed = 0
+        self.healthy = healthy
+        self.rolled_back = False
+        self.info = SimpleNamespace(transaction_status=TRANSACTION_STATUS_IDLE)
+
+    def cursor(self):
+        if not self.healthy:
+            raise psycopg2.OperationalError("server closed the connection")
+
+        return FakeCursor()
+
+    def rollback(self):
+        self.rolled_back = True
+        self.info.transaction_status = TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeCursor:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def execute(self, sql):
+        pass
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = ConnectionPool("default", max_size=2, timeout=0.01)
+
+    def test_checked_in_connections_are_reused(self):
+        connection = self.pool.getconn(FakeConnection)
+        self.pool.putconn(connection)
+
+        self.assertIs(self.pool.getconn(FakeConnection), connection)
+        self.assertEqual(self.pool.stats()["opened"], 1)
+        self.assertEqual(self.pool.stats()["checkouts"], 2)
+
+    def test_checkout_times_out_when_the_pool_is_exhausted(self):
+        self.pool.getconn(FakeConnection)
+        self.pool.getconn(FakeConnection)
+
+        with self.assertRaises(PoolTimeout):
+            self.pool.getconn(FakeConnection)
+
+        stats = self.pool.stats()
+        self.assertEqual(stats["timeouts"], 1)
+        self.assertEqual(stats["peak_in_use"], 2)
+        self.assertEqual(stats["waits"], 0)
+
+    def test_open_transactions_are_rolled_back_on_check_in(self):
+        connection = self.pool.getconn(FakeConnection)
+        connection.info.transaction_status = TRANSACTION_STATUS_INERROR
+
+        self.pool.putconn(connection)
+
+        self.assertTrue(connection.rolled_back)
+        self.assertEqual(self.pool.stats()["idle"], 1)
+
+    def test_unhealthy_connections_are_replaced_on_checkout(self):
+        broken = self.pool.getconn(lambda: FakeConnection(healthy=False))
+        self.pool.putconn(broken)
+
+        connection = self.pool.getconn(FakeConnection, health_check=True)
+
+        self.assertIsNot(connection, broken)
+        self.assertTrue(broken.closed)
+        stats = self.pool.stats()
+        self.assertEqual(stats["failed_checks"], 1)
+        self.assertEqual(stats["size"], 1)
+
+    def test_idle_connections_above_min_size_expire(self):
+        self.pool.max_idle = 0
+        first = self.pool.getconn(FakeConnection)
+        second = self.pool.getconn(FakeConnection)
+        self.pool.putconn(first)
+
+        self.pool.putconn(second)
+
+        self.assertTrue(first.closed)
+        self.assertFalse(second.closed)
+
+    def test_forked_process_gets_new_pools_and_leaves_inherited_connections(self):
+        with patch.object(pool, "_pools", {}), patch.object(pool, "_inherited", []):
+            parent_pool = pool.get_pool("key", "default", {})
+            connection = parent_pool.getconn(FakeConnection)
+
+            with patch("os.getpid", return_value=-1):
+                self.assertIsNot(pool.get_pool("key", "default", {}), parent_pool)
+                parent_pool.putconn(connection)
+
+            self.assertFalse(connection.closed)
+            self.assertIn(connection, pool._inherited)
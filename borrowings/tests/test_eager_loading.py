@@ -0,0 +1,112 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import serializers, status
+from rest_framework.test import APIClient
+
+from books.models import Book
+from borrowings.models import Borrowing, Payment
+from borrowings.serializers import BorrowingSerializer, PaymentDetailSerializer
+from library_project.eager_loading import eager_load
+
+BOOK_URL = reverse("books:book-list")
+BORROWING_URL = reverse("borrowings:borrowing-list")
+PAYMENT_URL = reverse("borrowings:payment-list")
+
+
+def sample_payment(user, number):
+    book = Book.objects.create(
+        title=f"Book {number}",
+        author="Author",
+        cover="Hard",
+        inventory=5,
+        daily_fee=1,
+    )
+    borrowing = Borrowing.objects.create(
+        expected_return_date="2023-12-12", book_id=book, user_id=user
+    )
+    return Payment.objects.create(
+        status="PENDING", type="PAYMENT", borrowing_id=borrowing, to_pay=1
+    )
+
+
+class BookWithBorrowingsSerializer(serializers.ModelSerializer):
+    borrowing = BorrowingSerializer(many=True, read_only=True)
+    is_available = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Book
+        fields = ("id", "title", "borrowing", "is_available")
+
+    def get_is_available(self, book):
+        return book.inventory > 0
+
+
+class EagerLoadingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_superuser(
+            "admin@library.com", "password"
+        )
+        self.client.force_authenticate(self.user)
+        # the catalog fixture is loaded by a data migration
+        Payment.objects.all().delete()
+        Borrowing.objects.all().delete()
+        Book.objects.all().delete()
+        self.payment = sample_payment(self.user, 0)
+
+    def count_queries(self, url):
+        cache.clear()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_results(self):
+        borrowing = self.payment.borrowing_id
+        # books and borrowings read their conditional GET validators first
+        urls = {
+            BOOK_URL: 2,
+            reverse("books:book-detail", args=[borrowing.book_id_id]): 2,
+            BORROWING_URL: 2,
+            reverse("borrowings:borrowing-detail", args=[borrowing.id]): 2,
+            PAYMENT_URL: 1,
+            reverse("borrowings:payment-detail", args=[self.payment.id]): 1,
+        }
+        single = {url: self.count_queries(url) for url in urls}
+
+        for number in range(1, 20):
+            sample_payment(self.user, number)
+
+        self.assertEqual(single, urls)
+        self.assertEqual({url: self.count_queries(url) for url in urls}, urls)
+
+    def test_nested_serializers_are_joined_and_columns_restricted(self):
+        queryset = eager_load(Payment.objects.all(), PaymentDetailSerializer)
+
+        with self.assertNumQueries(1):
+            data = PaymentDetailSerializer(queryset, many=True).data
+
+        self.assertEqual(data[0]["borrowing_id"]["book_id"]["title"], "Book 0")
+        sql = str(queryset.query)
+        self.assertIn('JOIN "books_book"', sql)
+        # user_id is rendered as a pk, the user is neither joined nor loaded
+        self.assertNotIn("user_user", sql)
+
+    def test_to_many_relations_are_prefetched(self):
+        for number in range(1, 5):
+            sample_payment(self.user, number)
+
+        queryset = eager_load(Book.objects.all(), BookWithBorrowingsSerializer)
+
+        with self.assertNumQueries(2):
+            data = BookWithBorrowingsSerializer(queryset, many=True).data
+
+        self.assertEqual(len(data), 5)
+        self.assertTrue(all(len(book["borrowing"]) == 1 for book in data))
+        self.assertTrue(all(book["is_available"] for book in data))
@@ -0,0 +1,126 @@
+import datetime
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from books.models import Book
+from books.serializers import BooksSerializer
+from borrowings.models import Borrowing, Payment
+from borrowings.serializers import (
+    BorrowingSerializer,
+    PaymentDetailSerializer,
+    PaymentSerializer,
+)
+from library_project.fast_serializers import get_values_serializer
+from library_project.renderers import ORJSONRenderer
+
+
+class FastSerializationGoldenTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_superuser(
+            "admin@library.com", "password"
+        )
+        self.client.force_authenticate(self.user)
+        cache.clear()
+
+        books = [
+            Book.objects.create(
+                title="Кобзар   «Poems»",
+                author="Тарас Шевченко",
+                cover="Hard",
+                inventory=0,
+                daily_fee=Decimal("0.5"),
+            ),
+            Book.objects.create(
+                title='Quotes " and \\ slashes',
+                author="J.K. Rowling",
+                cover="Soft",
+                inventory=12,
+                daily_fee=Decimal("1234.99"),
+            ),
+        ]
+        for number, book in enumerate(books):
+            borrowing = Borrowing.objects.create(
+                expected_return_date=timezone.now() + datetime.timedelta(days=3),
+                actual_return_date=(
+                    None if number
+                    else datetime.datetime(
+                        2023, 7, 1, 23, 59, 59, 123456, tzinfo=datetime.timezone.utc
+                    )
+                ),
+                book_id=book,
+                user_id=self.user,
+            )
+            Payment.objects.create(
+                status="PAID" if number else "PENDING",
+                type="FINE" if number else "PAYMENT",
+                borrowing_id=borrowing,
+                session_url=None if number else "https://checkout.stripe.com/c/1",
+                session_id=None if number else "cs_test_1",
+                to_pay=Decimal("7.10"),
+            )
+
+    def assert_same_output(self, url, serializer_class, queryset):
+        response = self.client.get(url, {"page_size": 100})
+        expected = serializer_class(queryset, many=True).data
+
+        self.assertEqual(
+            ORJSONRenderer().render(response.data["results"]),
+            JSONRenderer().render(expected),
+        )
+
+    def test_books_list(self):
+        self.assert_same_output(
+            reverse("books:book-list"), BooksSerializer, Book.objects.order_by("id")
+        )
+
+    def test_borrowings_list(self):
+        self.assert_same_output(
+            reverse("borrowings:borrowing-list"),
+            BorrowingSerializer,
+            Borrowing.objects.order_by("-id"),
+        )
+
+    def test_payments_list(self):
+        self.assert_same_output(
+            reverse("borrowings:payment-list"),
+            PaymentSerializer,
+            Payment.objects.order_by("-id"),
+        )
+
+    def test_nested_serializer(self):
+        serializer = get_values_serializer(PaymentDetailSerializer)
+        queryset = Payment.objects.order_by("id")
+
+        self.assertEqual(
+            JSONRenderer().render(
+                serializer.to_representation(serializer.values(queryset))
+            ),
+            JSONRenderer().render(PaymentDetailSerializer(queryset, many=True).data),
+        )
+
+    def test_renderer_output_matches_json_renderer(self):
+        data = OrderedDict([
+            ("text", "naïve     \"quoted\" \\ </script>"),
+            ("lazy", gettext_lazy("This field is required.")),
+            ("numbers", [0, -1, 2 ** 53, 0.5, Decimal("7.10"), True, None]),
+            ("aware", datetime.datetime(2023, 7, 1, 12, 0, tzinfo=datetime.timezone.utc)),
+            ("naive", datetime.datetime(2023, 7, 1, 12, 0, 0, 1)),
+            ("date", datetime.date(2023, 7, 1)),
+            ("time", datetime.time(12, 30)),
+            ("duration", datetime.timedelta(hours=1)),
+            ("uuid", uuid.UUID(int=1)),
+            (1, {"nested": ("tuple", [])}),
+        ])
+
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
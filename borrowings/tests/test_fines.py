@@ -0,0 +1,111 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books.models import Book
+from borrowings.fines import (
+    accrue_fines,
+    outstanding_fines,
+    refresh_outstanding_fines,
+)
+from borrowings.models import Borrowing, Payment
+
+
+@override_settings(STRIPE_DEFERRED_SESSION=True)
+class FineAccrualTests(TestCase):
+    def setUp(self):
+        # the borrowings of the fixture are long overdue
+        Borrowing.objects.all().delete()
+        cache.clear()
+        self.now = timezone.now()
+        self.user = get_user_model().objects.create_user(
+            "reader@library.com", "password"
+        )
+        self.book = Book.objects.create(
+            title="Harry Potter",
+            author="J.K. Rowling",
+            cover="Hard",
+            inventory=5,
+            daily_fee=Decimal("0.10"),
+        )
+
+    def borrowing(self, overdue, **params):
+        return Borrowing.objects.create(
+            book_id=self.book,
+            user_id=self.user,
+            expected_return_date=self.now - overdue,
+            **params,
+        )
+
+    def fine(self, borrowing):
+        return Borrowing.objects.values_list(
+            "fine_days", "accrued_fine", "fine_accrues_at"
+        ).get(pk=borrowing.pk)
+
+    def test_only_borrowings_with_a_new_overdue_day_are_accrued(self):
+        late = self.borrowing(timedelta(days=3, hours=12))
+        hours_late = self.borrowing(timedelta(hours=12))
+        self.borrowing(-timedelta(days=7))
+        self.borrowing(
+            timedelta(days=9), actual_return_date=self.now - timedelta(days=1)
+        )
+
+        self.assertEqual(accrue_fines(self.now), 1)
+        self.assertEqual(self.fine(late), (
+            3, Decimal("0.60"), late.expected_return_date + timedelta(days=4)
+        ))
+        self.assertEqual(self.fine(hours_late), (0, Decimal("0"), None))
+
+        self.assertEqual(accrue_fines(self.now + timedelta(hours=6)), 0)
+
+        self.assertEqual(accrue_fines(self.now + timedelta(days=1)), 2)
+        self.assertEqual(self.fine(late)[:2], (4, Decimal("0.80")))
+        self.assertEqual(self.fine(hours_late)[:2], (1, Decimal("0.20")))
+        self.assertEqual(outstanding_fines(), Decimal("1.00"))
+
+        late.actual_return_date = self.now
+        late.save()
+
+        self.assertEqual(outstanding_fines(), Decimal("1.00"))
+        self.assertEqual(refresh_outstanding_fines(), Decimal("0.20"))
+
+    @patch("borrowings.tasks.create_payment_session.delay")
+    def test_return_adds_the_days_since_the_last_accrual(self, delay):
+        borrowing = self.borrowing(timedelta(days=5, hours=1))
+        accrue_fines(self.now - timedelta(days=2))
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(
+                reverse("borrowings:borrowing-return-book", args=[borrowing.id])
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        fine = Payment.objects.get(borrowing_id=borrowing, type="FINE")
+        self.assertEqual(fine.to_pay, Decimal("1.00"))
+        self.assertEqual(outstanding_fines(), Decimal("0"))
+
+    def test_extended_borrowing_owes_no_negative_fine(self):
+        borrowing = self.borrowing(timedelta(days=3, hours=12))
+        accrue_fines(self.now)
+        extended = self.now + timedelta(days=7)
+        Borrowing.objects.filter(pk=borrowing.pk).update(
+            expected_return_date=extended
+        )
+
+        # the next day of the old date is due
+        self.assertEqual(accrue_fines(self.now + timedelta(days=1)), 1)
+        self.assertEqual(
+            self.fine(borrowing), (0, Decimal("0"), extended + timedelta(days=1))
+        )
+        self.assertEqual(accrue_fines(self.now + timedelta(days=2)), 0)
+        self.assertEqual(refresh_outstanding_fines(), Decimal("0"))
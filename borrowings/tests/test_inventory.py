@@ -0,0 +1,127 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books.inventory import OutOfStock, return_copy, take_copy
+from books.models import Book
+
+BORROWING_URL = reverse("borrowings:borrowing-list")
+
+THREADS = 32
+
+
+def sample_book(**params):
+    defaults = {
+        "title": "Harry Potter 2",
+        "author": "J.K. Rowling",
+        "cover": "Hard",
+        "inventory": 5,
+        "daily_fee": 0.5,
+    }
+    defaults.update(params)
+
+    return Book.objects.create(**defaults)
+
+
+def run_in_threads(func, calls):
+    def call(_):
+        try:
+            return func()
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        return list(executor.map(call, range(calls)))
+
+
+@patch("borrowings.serializers.send_borrowing_create_message", Mock())
+class InventoryTests(TestCase):
+    def test_take_copy_of_book_out_of_stock(self):
+        book = sample_book(inventory=0)
+
+        with self.assertRaises(OutOfStock):
+            take_copy(book)
+        self.assertEqual(Book.objects.get(pk=book.pk).inventory, 0)
+
+    def test_check_constraint_rejects_negative_inventory(self):
+        book = sample_book()
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Book.objects.filter(pk=book.pk).update(inventory=-1)
+
+    def test_borrowing_book_out_of_stock_returns_409(self):
+        user = get_user_model().objects.create_user(
+            "authenticated@library.com", "password"
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        book = sample_book(inventory=0)
+
+        response = client.post(
+            BORROWING_URL,
+            {"expected_return_date": "2099-12-12", "book_id": book.id},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(book.borrowing.exists())
+
+
+@patch("borrowings.serializers.send_borrowing_create_message", Mock())
+class InventoryStressTests(TransactionTestCase):
+    def test_parallel_borrows_never_oversell(self):
+        book = sample_book(inventory=100)
+
+        def borrow():
+            try:
+                take_copy(Book(id=book.id, title=book.title))
+            except OutOfStock:
+                return False
+            return True
+
+        results = run_in_threads(borrow, 400)
+
+        self.assertEqual(results.count(True), 100)
+        self.assertEqual(Book.objects.get(pk=book.pk).inventory, 0)
+
+    def test_parallel_borrows_and_returns_keep_inventory(self):
+        book = sample_book(inventory=50)
+
+        def borrow_and_return():
+            copy = Book(id=book.id, title=book.title)
+            try:
+                take_copy(copy)
+            except OutOfStock:
+                return
+            return_copy(copy)
+
+        run_in_threads(borrow_and_return, 500)
+
+        self.assertEqual(Book.objects.get(pk=book.pk).inventory, 50)
+
+    @patch("borrowings.serializers.attach_session_or_defer")
+    def test_parallel_borrowing_requests(self, attach_session_or_defer):
+        book = sample_book(inventory=20)
+        user = get_user_model().objects.create_user(
+            "authenticated@library.com", "password"
+        )
+
+        def borrow():
+            client = APIClient()
+            client.force_authenticate(user)
+            return client.post(
+                BORROWING_URL,
+                {"expected_return_date": "2099-12-12", "book_id": book.id},
+            ).status_code
+
+        results = run_in_threads(borrow, 100)
+
+        self.assertEqual(results.count(status.HTTP_201_CREATED), 20)
+        self.assertEqual(results.count(status.HTTP_409_CONFLICT), 80)
+        self.assertEqual(Book.objects.get(pk=book.pk).inventory, 0)
+        self.assertEqual(book.borrowing.count(), 20)
@@ -0,0 +1,106 @@
+from unittest.mock import Mock, patch
+
+import fakeredis
+from django.test import TestCase, override_settings
+
+from borrowings.notification import (
+    FLUSH_SCHEDULED_KEY,
+    QUEUE_KEY,
+    TELEGRAM_MESSAGE_LIMIT,
+    NotificationDeliveryError,
+    deliver,
+    flush_queue,
+    send_notification,
+    split_into_batches,
+)
+
+
+def telegram_response(status_code, payload=None):
+    response = Mock(status_code=status_code, text="")
+    response.json.return_value = payload or {"ok": status_code == 200}
+    return response
+
+
+@override_settings(
+    CHAT_ID="1",
+    TELEGRAM_TOKEN="token",
+    TELEGRAM_API_URL="http://telegram.test",
+    NOTIFICATION_MIN_INTERVAL=0,
+)
+class NotificationTests(TestCase):
+    def test_messages_are_coalesced_within_telegram_limit(self):
+        messages = ["x" * 1000] * 9
+
+        batches = split_into_batches(messages)
+
+        self.assertEqual([len(batch) for batch in batches], [4, 4, 1])
+        for batch in batches:
+            self.assertLessEqual(len("\n\n".join(batch)), TELEGRAM_MESSAGE_LIMIT)
+
+    def test_long_message_is_split(self):
+        batches = split_into_batches(["x" * (TELEGRAM_MESSAGE_LIMIT + 1)])
+
+        self.assertEqual(len(batches), 2)
+
+    @patch("borrowings.notification.get_session")
+    def test_deliver_posts_encoded_text_with_timeout(self, get_session):
+        get_session.return_value.post.return_value = telegram_response(200)
+
+        deliver(["Book: Harry & Potter #1?", "second"])
+
+        get_session.return_value.post.assert_called_once()
+        _, kwargs = get_session.return_value.post.call_args
+        self.assertEqual(kwargs["data"]["text"], "Book: Harry & Potter #1?\n\nsecond")
+        self.assertIsNotNone(kwargs["timeout"])
+
+    @patch("borrowings.notification.get_session")
+    def test_rate_limited_batch_is_reported_undelivered(self, get_session):
+        get_session.return_value.post.side_effect = [
+            telegram_response(200),
+            telegram_response(429, {"ok": False, "parameters": {"retry_after": 7}}),
+        ]
+        messages = ["x" * 3000, "y" * 3000, "z"]
+
+        with self.assertRaises(NotificationDeliveryError) as error:
+            deliver(messages)
+
+        self.assertEqual(error.exception.retry_after, 7)
+        self.assertEqual(error.exception.undelivered, messages[1:])
+
+    @patch("borrowings.notification.get_session")
+    def test_rate_limit_without_json_body_is_reported_undelivered(
+            self, get_session
+    ):
+        response = telegram_response(429)
+        response.json.side_effect = ValueError("Expecting value")
+        get_session.return_value.post.return_value = response
+
+        with self.assertRaises(NotificationDeliveryError) as error:
+            deliver(["first", "second"])
+
+        self.assertIsNone(error.exception.retry_after)
+        self.assertEqual(error.exception.undelivered, ["first", "second"])
+
+    @patch("borrowings.notification.get_session")
+    def test_flush_puts_batch_back_on_unexpected_error(self, get_session):
+        client = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+        client.rpush(QUEUE_KEY, "first", "second")
+        client.set(FLUSH_SCHEDULED_KEY, 1)
+        get_session.return_value.post.side_effect = RuntimeError
+
+        with patch("borrowings.notification.get_redis", return_value=client):
+            with self.assertRaises(RuntimeError):
+                flush_queue()
+
+        self.assertEqual(client.lrange(QUEUE_KEY, 0, -1), [b"first", b"second"])
+        self.assertFalse(client.exists(FLUSH_SCHEDULED_KEY))
+
+    @patch("borrowings.notification.get_redis", Mock(return_value=None))
+    @patch("borrowings.tasks.send_notifications.delay")
+    def test_send_notification_is_queued_after_commit(self, delay):
+        with self.captureOnCommitCallbacks() as callbacks:
+            send_notification("New borrowing")
+
+        delay.assert_not_called()
+        callbacks[0]()
+        delay.assert_called_once_with(["New borrowing"])
@@ -0,0 +1,111 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from books.models import Book
+from borrowings.models import Borrowing
+from borrowings.tasks import (
+    check_overdue_borrowings,
+    scan_overdue_range,
+    send_overdue_digest,
+)
+
+
+def create_overdue_borrowings(count, **params):
+    user = get_user_model().objects.create_user(
+        f"reader{Borrowing.objects.count()}@library.com", "password"
+    )
+    book = Book.objects.create(
+        title="Harry Potter 2",
+        author="J.K. Rowling",
+        cover="Hard",
+        inventory=5,
+        daily_fee=0.5,
+    )
+    now = timezone.now()
+    return Borrowing.objects.bulk_create(
+        Borrowing(
+            expected_return_date=now - timedelta(days=i + 1),
+            book_id=book,
+            user_id=user,
+            **params,
+        )
+        for i in range(count)
+    )
+
+
+class OverdueScanTests(TestCase):
+    def setUp(self):
+        # the fixture loaded by a data migration has an overdue borrowing
+        Borrowing.objects.all().delete()
+
+    def test_scan_query_count_does_not_grow_with_rows(self):
+        borrowings = create_overdue_borrowings(5)
+        cutoff = timezone.now().isoformat()
+
+        with self.assertNumQueries(1):
+            scan_overdue_range(borrowings[0].id, borrowings[-1].id, cutoff)
+
+        borrowings = create_overdue_borrowings(40)
+
+        with self.assertNumQueries(1):
+            result = scan_overdue_range(borrowings[0].id, borrowings[-1].id, cutoff)
+
+        self.assertEqual(result["count"], 40)
+
+    @override_settings(OVERDUE_DIGEST_SIZE=3)
+    def test_scan_keeps_the_most_overdue_borrowings(self):
+        borrowings = create_overdue_borrowings(10)
+        cutoff = timezone.now().isoformat()
+
+        result = scan_overdue_range(borrowings[0].id, borrowings[-1].id, cutoff)
+
+        self.assertEqual(
+            [row[1] for row in result["most_overdue"]],
+            [borrowing.id for borrowing in borrowings[-1:-4:-1]],
+        )
+
+    def test_returned_borrowings_are_skipped(self):
+        borrowings = create_overdue_borrowings(3, actual_return_date=timezone.now())
+        cutoff = timezone.now().isoformat()
+
+        result = scan_overdue_range(borrowings[0].id, borrowings[-1].id, cutoff)
+
+        self.assertEqual(result["count"], 0)
+
+    @override_settings(OVERDUE_SCAN_RANGE_SIZE=10)
+    @patch("borrowings.tasks.chord")
+    def test_scan_fans_out_over_id_ranges(self, chord):
+        create_overdue_borrowings(25)
+
+        check_overdue_borrowings()
+
+        subtasks = list(chord.call_args.args[0])
+        self.assertEqual(len(subtasks), 3)
+        self.assertEqual(subtasks[0].task, "borrowings.tasks.scan_overdue_range")
+
+    @override_settings(OVERDUE_DIGEST_SIZE=2)
+    @patch("borrowings.tasks.send_notification")
+    def test_digest_merges_range_results(self, send_notification):
+        send_overdue_digest([
+            {
+                "count": 4,
+                "most_overdue": [
+                    ["2023-01-02", 1, "a@library.com", "A"],
+                    ["2023-01-05", 2, "b@library.com", "B"],
+                ],
+            },
+            {
+                "count": 3,
+                "most_overdue": [["2023-01-01", 9, "c@library.com", "C"]],
+            },
+        ])
+
+        message = send_notification.call_args.args[0]
+        self.assertIn("Total: 7", message)
+        self.assertIn("Id: 9", message)
+        self.assertIn("Id: 1", message)
+        self.assertNotIn("Id: 2", message)
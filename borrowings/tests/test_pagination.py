@@ -0,0 +1,109 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books.models import Book
+from borrowings.models import Borrowing, Payment
+
+BOOK_URL = reverse("books:book-list")
+BORROWING_URL = reverse("borrowings:borrowing-list")
+PAYMENT_URL = reverse("borrowings:payment-list")
+
+
+def sample_book(**params):
+    defaults = {
+        "title": "Harry Potter",
+        "author": "J.K. Rowling",
+        "cover": "Hard",
+        "inventory": 5,
+        "daily_fee": 0.5,
+    }
+    defaults.update(params)
+
+    return Book.objects.create(**defaults)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_superuser(
+            "admin@library.com", "password"
+        )
+        self.client.force_authenticate(self.user)
+        # the catalog fixture is loaded by a data migration
+        Payment.objects.all().delete()
+        Borrowing.objects.all().delete()
+        Book.objects.all().delete()
+
+        self.books = [sample_book(title=f"Book {i}") for i in range(5)]
+        self.borrowings = [
+            Borrowing.objects.create(
+                expected_return_date="2023-12-12",
+                book_id=book,
+                user_id=self.user,
+            )
+            for book in self.books
+        ]
+        for borrowing in self.borrowings:
+            Payment.objects.create(
+                status="PENDING",
+                type="PAYMENT",
+                borrowing_id=borrowing,
+                to_pay=1,
+            )
+
+    def walk(self, url, **params):
+        """Ids of every page, following the next links"""
+        pages = []
+        response = self.client.get(url, params)
+
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append([item["id"] for item in response.data["results"]])
+
+            if response.data["next"] is None:
+                return pages
+
+            response = self.client.get(response.data["next"])
+
+    def test_books_are_paginated_in_catalog_order(self):
+        self.assertEqual(
+            self.walk(BOOK_URL, page_size=2),
+            [
+                [self.books[0].id, self.books[1].id],
+                [self.books[2].id, self.books[3].id],
+                [self.books[4].id],
+            ],
+        )
+
+    def test_borrowings_and_payments_are_paginated_newest_first(self):
+        borrowing_ids = [borrowing.id for borrowing in reversed(self.borrowings)]
+        payment_ids = list(
+            Payment.objects.order_by("-id").values_list("id", flat=True)
+        )
+
+        self.assertEqual(
+            sum(self.walk(BORROWING_URL, page_size=2), []), borrowing_ids
+        )
+        self.assertEqual(sum(self.walk(PAYMENT_URL, page_size=3), []), payment_ids)
+
+    def test_page_does_not_count_rows_by_default(self):
+        response = self.client.get(BORROWING_URL)
+
+        self.assertNotIn("count", response.data)
+
+    def test_estimated_count_on_request(self):
+        response = self.client.get(BOOK_URL, {"count": "estimate"})
+
+        self.assertIsInstance(response.data["count"], int)
+        self.assertEqual(len(response.data["results"]), len(self.books))
+
+    def test_search_results_are_paginated_by_offset(self):
+        pages = self.walk(BOOK_URL, search="book", limit=2)
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(
+            sorted(sum(pages, [])), sorted(book.id for book in self.books)
+        )
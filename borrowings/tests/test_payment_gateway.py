@@ -0,0 +1,285 @@
+from unittest.mock import Mock, patch
+from urllib.parse import parse_qs
+
+import httpx
+import requests
+import stripe
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books.models import Book
+from borrowings.models import Borrowing, Payment
+from borrowings.payment_gateway import (
+    DeadlineRequestsClient,
+    PaymentGatewayUnavailable,
+    StripeGateway,
+    encode_params,
+    get_gateway,
+)
+
+BORROWING_URL = reverse("borrowings:borrowing-list")
+
+STRIPE_SESSION = {
+    "id": "cs_test_session",
+    "url": "https://checkout.stripe.com/c/pay/cs_test_session",
+    "amount_total": 150,
+}
+
+SESSION = {
+    "line_items": [],
+    "success_url": "http://testserver/success",
+    "cancel_url": "http://testserver/cancel",
+}
+
+
+class FlakyGateway:
+    """Fails the next ``failures`` calls with a transient error"""
+
+    transient_errors = (ConnectionError,)
+    failures = 0
+    calls = []
+
+    def create_checkout_session(self, **kwargs):
+        FlakyGateway.calls.append(kwargs)
+
+        if FlakyGateway.failures:
+            FlakyGateway.failures -= 1
+            raise ConnectionError("provider is down")
+
+        return STRIPE_SESSION
+
+    async def acreate_checkout_session(self, **kwargs):
+        return self.create_checkout_session(**kwargs)
+
+
+@override_settings(
+    PAYMENT_GATEWAY="borrowings.tests.test_payment_gateway.FlakyGateway",
+    PAYMENT_GATEWAY_RETRIES=2,
+    PAYMENT_GATEWAY_BACKOFF=0,
+    PAYMENT_GATEWAY_FAILURE_THRESHOLD=3,
+    PAYMENT_GATEWAY_RESET_TIMEOUT=30,
+)
+class PaymentGatewayTests(SimpleTestCase):
+    def setUp(self):
+        FlakyGateway.failures = 0
+        FlakyGateway.calls = []
+        self.gateway = get_gateway()
+        self.addCleanup(self.gateway.breaker.record_success)
+
+    def test_transient_errors_are_retried_with_one_idempotency_key(self):
+        FlakyGateway.failures = 2
+
+        self.assertEqual(
+            self.gateway.create_checkout_session(**SESSION), STRIPE_SESSION
+        )
+        self.assertEqual(len(FlakyGateway.calls), 3)
+        self.assertEqual(
+            len({call["idempotency_key"] for call in FlakyGateway.calls}), 1
+        )
+        self.assertFalse(self.gateway.breaker.is_open)
+
+    def test_other_errors_are_not_retried(self):
+        with patch.object(
+                FlakyGateway, "create_checkout_session", side_effect=ValueError
+        ) as create, self.assertRaises(ValueError):
+            self.gateway.create_checkout_session(**SESSION)
+
+        create.assert_called_once()
+        self.assertFalse(self.gateway.breaker.is_open)
+
+    def test_open_circuit_fails_fast_until_trial_call(self):
+        FlakyGateway.failures = 100
+
+        with self.assertRaises(PaymentGatewayUnavailable):
+            self.gateway.create_checkout_session(**SESSION)
+        self.assertEqual(len(FlakyGateway.calls), 3)
+        self.assertTrue(self.gateway.breaker.is_open)
+
+        with self.assertRaises(PaymentGatewayUnavailable):
+            self.gateway.create_checkout_session(**SESSION)
+        self.assertEqual(len(FlakyGateway.calls), 3)
+
+        FlakyGateway.failures = 0
+        self.gateway.breaker.opened_at -= 30
+        self.assertFalse(self.gateway.breaker.is_open)
+
+        self.assertEqual(
+            self.gateway.create_checkout_session(**SESSION), STRIPE_SESSION
+        )
+        self.assertIsNone(self.gateway.breaker.opened_at)
+
+    def test_failed_trial_call_opens_circuit_again(self):
+        FlakyGateway.failures = 100
+
+        with self.assertRaises(PaymentGatewayUnavailable):
+            self.gateway.create_checkout_session(**SESSION)
+        self.gateway.breaker.opened_at -= 30
+
+        with self.assertRaises(PaymentGatewayUnavailable):
+            self.gateway.create_checkout_session(**SESSION)
+
+        self.assertEqual(len(FlakyGateway.calls), 4)
+        self.assertTrue(self.gateway.breaker.is_open)
+
+    async def test_async_calls_share_retries_and_circuit(self):
+        FlakyGateway.failures = 2
+
+        self.assertEqual(
+            await self.gateway.acreate_checkout_session(**SESSION), STRIPE_SESSION
+        )
+        self.assertEqual(len(FlakyGateway.calls), 3)
+
+        FlakyGateway.failures = 100
+
+        with self.assertRaises(PaymentGatewayUnavailable):
+            await self.gateway.acreate_checkout_session(**SESSION)
+        self.assertTrue(self.gateway.breaker.is_open)
+
+    def test_request_timeout_is_bounded_by_call_deadline(self):
+        session = Mock(spec=requests.Session)
+        session.request.return_value = Mock(content=b"{}", status_code=200, headers={})
+        client = DeadlineRequestsClient(session, timeout=5)
+
+        client.request("post", "https://api.stripe.com/v1/checkout/sessions", {})
+        self.assertEqual(session.request.call_args.kwargs["timeout"], 5)
+
+        with client.deadline(1):
+            client.request("post", "https://api.stripe.com/v1/checkout/sessions", {})
+            self.assertTrue(0 < session.request.call_args.kwargs["timeout"] <= 1)
+
+        session.request.side_effect = requests.ConnectTimeout
+
+        with self.assertRaises(stripe.error.APIConnectionError) as error:
+            client.request("post", "https://api.stripe.com/v1/checkout/sessions", {})
+        self.assertTrue(error.exception.should_retry)
+
+
+class AsyncStripeGatewayTests(SimpleTestCase):
+    def setUp(self):
+        self.gateway = StripeGateway()
+        self.requests = []
+
+    def mock_provider(self, status_code, payload):
+        def handler(request):
+            self.requests.append(request)
+            return httpx.Response(status_code, json=payload)
+
+        return patch.object(
+            self.gateway,
+            "_async_client",
+            return_value=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        )
+
+    async def create_session(self):
+        return await self.gateway.acreate_checkout_session(
+            line_items=[{
+                "price_data": {
+                    "currency": "usd",
+                    "product_data": {"name": "Fine"},
+                    "unit_amount": 150,
+                },
+                "quantity": 1,
+            }],
+            success_url="http://testserver/success",
+            cancel_url="http://testserver/cancel",
+            idempotency_key="key",
+            timeout=5,
+        )
+
+    async def test_session_is_created_with_form_encoded_params(self):
+        with self.mock_provider(200, STRIPE_SESSION):
+            self.assertEqual(await self.create_session(), STRIPE_SESSION)
+
+        request = self.requests[0]
+        params = parse_qs(request.content.decode())
+        self.assertEqual(request.url.path, "/v1/checkout/sessions")
+        self.assertEqual(request.headers["Idempotency-Key"], "key")
+        self.assertEqual(params["line_items[0][price_data][unit_amount]"], ["150"])
+        self.assertEqual(params["mode"], ["payment"])
+
+    def test_nested_params_are_encoded_like_the_stripe_client(self):
+        params = {
+            "line_items": [
+                {"price_data": {"unit_amount": 150}, "quantity": 1},
+                {"price": "price_1", "adjustable_quantity": {"enabled": True}},
+            ],
+            "mode": "payment",
+            "customer": None,
+        }
+
+        self.assertEqual(
+            encode_params(params),
+            [
+                ("line_items[0][price_data][unit_amount]", "150"),
+                ("line_items[0][quantity]", "1"),
+                ("line_items[1][price]", "price_1"),
+                ("line_items[1][adjustable_quantity][enabled]", "true"),
+                ("mode", "payment"),
+            ],
+        )
+
+    async def test_provider_errors_are_raised_as_stripe_errors(self):
+        for status_code, error in (
+                (500, stripe.error.APIError),
+                (429, stripe.error.RateLimitError),
+                (400, stripe.error.InvalidRequestError),
+        ):
+            with self.subTest(status_code=status_code), \
+                    self.mock_provider(status_code, {"error": {"message": "no"}}), \
+                    self.assertRaises(error):
+                await self.create_session()
+
+
+@override_settings(
+    PAYMENT_GATEWAY="borrowings.tests.test_payment_gateway.FlakyGateway",
+    PAYMENT_GATEWAY_BACKOFF=0,
+    PAYMENT_GATEWAY_FAILURE_THRESHOLD=3,
+)
+@patch("borrowings.serializers.send_borrowing_create_message", Mock())
+class DegradedGatewayBorrowingTests(TestCase):
+    def setUp(self):
+        FlakyGateway.failures = 100
+        FlakyGateway.calls = []
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "authenticated@library.com", "password"
+        )
+        self.client.force_authenticate(self.user)
+        self.book = Book.objects.create(
+            title="Harry Potter 2",
+            author="J.K. Rowling",
+            cover="Hard",
+            inventory=5,
+            daily_fee=0.5,
+        )
+        self.payload = {
+            "expected_return_date": "2099-12-12",
+            "book_id": self.book.id,
+        }
+        self.addCleanup(get_gateway().breaker.record_success)
+
+    @patch("borrowings.tasks.create_payment_session.apply_async")
+    def test_session_is_deferred_when_gateway_is_unavailable(self, apply_async):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(BORROWING_URL, self.payload)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        payment = Payment.objects.get(borrowing_id=response.data["id"])
+        self.assertIsNone(payment.session_url)
+        apply_async.assert_called_once()
+        self.assertEqual(apply_async.call_args.args[0], (payment.id,))
+
+    @override_settings(PAYMENT_GATEWAY_FALLBACK="fail")
+    def test_borrowing_is_rejected_while_circuit_is_open(self):
+        for _ in range(3):
+            get_gateway().breaker.record_failure()
+
+        response = self.client.post(BORROWING_URL, self.payload)
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(Borrowing.objects.filter(user_id=self.user).exists())
+        self.assertEqual(Book.objects.get(pk=self.book.pk).inventory, 5)
+        self.assertEqual(FlakyGateway.calls, [])
@@ -0,0 +1,125 @@
+import time
+from unittest.mock import patch
+
+import stripe
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from benchmarks.fake_stripe import FakeStripeServer, checkout_event
+from books.models import Book
+from borrowings.models import Borrowing, Payment, StripeEventWatermark
+from borrowings.reconciliation import RECONCILE_LOCK_KEY, reconcile_payments
+
+
+@override_settings(
+    PAYMENT_GATEWAY="borrowings.payment_gateway.StripeGateway",
+    STRIPE_RECONCILE_PAGE_SIZE=3,
+)
+@patch("borrowings.webhooks.send_notification")
+class PaymentReconciliationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeStripeServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.server.events.clear()
+        self.server.event_positions.clear()
+        patcher = patch.multiple(
+            stripe, api_base=self.server.url, api_key="sk_test"
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        user = get_user_model().objects.create_user(
+            "reader@library.com", "password"
+        )
+        book = Book.objects.create(
+            title="Harry Potter",
+            author="J.K. Rowling",
+            cover="Hard",
+            inventory=50,
+            daily_fee=1,
+        )
+        self.payments = []
+        for number in range(10):
+            borrowing = Borrowing.objects.create(
+                expected_return_date="2023-12-12", book_id=book, user_id=user
+            )
+            self.payments.append(
+                Payment.objects.create(
+                    status="PENDING",
+                    type="PAYMENT",
+                    borrowing_id=borrowing,
+                    session_id=f"cs_test_{number}",
+                    to_pay=7,
+                )
+            )
+
+    def statuses(self):
+        return list(
+            Payment.objects.filter(
+                id__in=[payment.id for payment in self.payments]
+            ).order_by("id").values_list("status", flat=True)
+        )
+
+    def test_runs_apply_only_the_events_since_the_watermark(
+            self, send_notification
+    ):
+        now = int(time.time())
+        self.server.add_events([
+            checkout_event(payment.session_id, created=now)
+            for payment in self.payments[:5]
+        ] + [
+            checkout_event(payment.session_id, "checkout.session.expired", created=now)
+            for payment in self.payments[5:7]
+        ] + [
+            # older than the first run looks back
+            checkout_event(self.payments[7].session_id, created=now - 3600),
+            checkout_event(self.payments[8].session_id, "customer.created", created=now),
+        ])
+
+        with override_settings(STRIPE_RECONCILE_LOOKBACK=60):
+            result = reconcile_payments()
+
+        self.assertEqual(result, {"events": 7, "pages": 3, "paid": 5})
+        self.assertEqual(
+            self.statuses(), ["PAID"] * 5 + ["EXPIRED"] * 2 + ["PENDING"] * 3
+        )
+        self.assertEqual(send_notification.call_count, 5)
+        self.assertEqual(
+            StripeEventWatermark.objects.get().event_id,
+            self.server.events[-2]["id"],
+        )
+
+        self.assertEqual(reconcile_payments(), {"events": 0, "pages": 0, "paid": 0})
+
+        self.server.add_events([
+            checkout_event(self.payments[5].session_id, created=now),
+            checkout_event(self.payments[9].session_id, created=now + 1),
+        ])
+
+        self.assertEqual(reconcile_payments(), {"events": 2, "pages": 1, "paid": 2})
+        self.assertEqual(self.statuses()[5:], ["PAID", "EXPIRED", "PENDING", "PENDING", "PAID"])
+        self.assertEqual(
+            StripeEventWatermark.objects.get().event_id, self.server.events[-1]["id"]
+        )
+
+    def test_runs_do_not_overlap(self, send_notification):
+        self.server.add_events([checkout_event(self.payments[0].session_id)])
+        cache.add(RECONCILE_LOCK_KEY, 1)
+
+        self.assertIsNone(reconcile_payments())
+        self.assertEqual(self.statuses()[0], "PENDING")
+
+        cache.delete(RECONCILE_LOCK_KEY)
+
+        self.assertEqual(reconcile_payments()["paid"], 1)
@@ -0,0 +1,118 @@
+from unittest.mock import Mock, patch
+
+import stripe
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books.models import Book
+from borrowings.models import Borrowing, Payment
+from borrowings.tasks import create_payment_session
+
+BORROWING_URL = reverse("borrowings:borrowing-list")
+
+STRIPE_SESSION = {
+    "id": "cs_test_session",
+    "url": "https://checkout.stripe.com/c/pay/cs_test_session",
+    "amount_total": 150,
+}
+
+
+def payment_url(borrowing_id):
+    return reverse("borrowings:borrowing-borrowing-payment", args=[borrowing_id])
+
+
+@patch("borrowings.serializers.send_borrowing_create_message", Mock())
+class PaymentSessionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "authenticated@library.com", "password"
+        )
+        self.client.force_authenticate(self.user)
+        self.book = Book.objects.create(
+            title="Harry Potter 2",
+            author="J.K. Rowling",
+            cover="Hard",
+            inventory=5,
+            daily_fee=0.5,
+        )
+        self.payload = {
+            "expected_return_date": "2099-12-12",
+            "book_id": self.book.id,
+        }
+
+    @patch("stripe.checkout.Session.create", return_value=STRIPE_SESSION)
+    def test_session_is_created_after_commit_by_default(self, session_create):
+        response = self.client.post(BORROWING_URL, self.payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        payment = Payment.objects.get(borrowing_id=response.data["id"])
+        self.assertEqual(payment.session_id, STRIPE_SESSION["id"])
+        self.assertEqual(payment.session_url, STRIPE_SESSION["url"])
+        session_create.assert_called_once()
+
+    @override_settings(STRIPE_DEFERRED_SESSION=True)
+    @patch("stripe.checkout.Session.create", return_value=STRIPE_SESSION)
+    @patch("borrowings.tasks.create_payment_session.delay")
+    def test_deferred_mode_commits_placeholder_payment(
+            self, delay, session_create
+    ):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(BORROWING_URL, self.payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        payment = Payment.objects.get(borrowing_id=response.data["id"])
+        self.assertEqual(payment.status, "PENDING")
+        self.assertIsNone(payment.session_url)
+        self.assertGreater(payment.to_pay, 0)
+        delay.assert_called_once_with(payment.id)
+        session_create.assert_not_called()
+
+        response = self.client.get(payment_url(payment.borrowing_id_id))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertIsNone(response.data["session_url"])
+
+        create_payment_session(payment.id)
+
+        response = self.client.get(payment_url(payment.borrowing_id_id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["session_url"], STRIPE_SESSION["url"])
+
+    @patch("stripe.checkout.Session.create", return_value=STRIPE_SESSION)
+    def test_task_does_not_recreate_existing_session(self, session_create):
+        response = self.client.post(BORROWING_URL, self.payload)
+        payment = Payment.objects.get(borrowing_id=response.data["id"])
+
+        create_payment_session(payment.id)
+        session_create.assert_called_once()
+
+    @patch(
+        "stripe.checkout.Session.create",
+        side_effect=stripe.error.InvalidRequestError("Invalid amount", None),
+    )
+    @patch("borrowings.tasks.create_payment_session.apply_async")
+    def test_rejected_session_is_deferred_to_the_task(
+            self, apply_async, session_create
+    ):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(BORROWING_URL, self.payload)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        payment = Payment.objects.get(borrowing_id=response.data["id"])
+        self.assertIsNone(payment.session_id)
+        apply_async.assert_called_once()
+        self.assertEqual(apply_async.call_args.args[0], (payment.id,))
+
+    def test_past_expected_return_date_is_rejected(self):
+        response = self.client.post(
+            BORROWING_URL, {**self.payload, "expected_return_date": "2023-12-12"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("expected_return_date", response.data)
+        self.assertFalse(Borrowing.objects.filter(book_id=self.book).exists())
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 5)
@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, modify_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+BORROWING_URL = reverse("borrowings:borrowing-list")
+
+
+@modify_settings(
+    MIDDLEWARE={"prepend": "library_project.middleware.QueryCountMiddleware"}
+)
+class QueryCountHeaderTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "authenticated@library.com", "password"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_response_reports_database_queries(self):
+        # the conditional GET validators of the page and the page
+        with self.assertNumQueries(2):
+            response = self.client.get(BORROWING_URL)
+
+        self.assertEqual(response["X-DB-Queries"], "2")
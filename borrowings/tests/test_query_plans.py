@@ -0,0 +1,180 @@
+import base64
+import json
+import re
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from borrowings.models import Borrowing, Payment
+from borrowings.tasks import check_overdue_borrowings
+
+BORROWING_URL = reverse("borrowings:borrowing-list")
+PAYMENT_URL = reverse("borrowings:payment-list")
+
+# tables that are large in production, a sequential scan of them is a bug
+LARGE_TABLES = {
+    "books_book",
+    "borrowings_borrowing",
+    "borrowings_payment",
+    "user_user",
+}
+
+# highest planner cost of any query of a case on the seeded data, about
+# twice the cost measured when the indexes were added
+MAX_COSTS = {
+    "borrowings list": 175,
+    "active borrowings list": 80,
+    "borrowings of a user, admin": 175,
+    "borrowings deep page, admin": 5,
+    "payments list": 700,
+    "payments of a user, admin": 700,
+    "payment success page": 20,
+    "overdue scan": 4000,
+}
+
+# a range of the overdue scan joins a large share of all users and books,
+# hashing them is cheaper than looking every row up by index
+ALLOWED_SEQ_SCANS = {
+    "overdue scan": {"user_user", "books_book"},
+}
+
+
+def seq_scans(plan: dict) -> list[str]:
+    scans = []
+
+    if plan["Node Type"] == "Seq Scan":
+        scans.append(plan["Relation Name"])
+
+    for child in plan.get("Plans", []):
+        scans.extend(seq_scans(child))
+
+    return scans
+
+
+class QueryPlanTests(TestCase):
+    """
+    Runs EXPLAIN on the queries of the borrowing and payment endpoints
+    and tasks against seeded data, failing on a sequential scan of a
+    large table or a planner cost above the budget of the case
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO user_user (password, is_superuser, email, first_name, "
+                "last_name, is_staff, is_active, date_joined) "
+                "SELECT '', false, 'plan' || i || '@library.com', '', '', "
+                "false, true, now() FROM generate_series(1, 2000) i"
+            )
+            cursor.execute(
+                "INSERT INTO books_book (title, author, cover, inventory, daily_fee) "
+                "SELECT 'Book ' || i, 'Author ' || i, 'Hard', 10, 1 "
+                "FROM generate_series(1, 5000) i"
+            )
+            cursor.execute(
+                "INSERT INTO borrowings_borrowing (borrow_date, expected_return_date, "
+                "actual_return_date, book_id_id, user_id_id) "
+                "SELECT now() - interval '60 days', "
+                "now() + (i % 60 - 30) * interval '1 day', "
+                "CASE WHEN i % 3 = 0 THEN NULL ELSE now() END, "
+                "(SELECT max(id) FROM books_book) - i % 5000, "
+                "(SELECT max(id) FROM user_user) - i % 2000 "
+                "FROM generate_series(1, 60000) i"
+            )
+            cursor.execute(
+                "INSERT INTO borrowings_payment (status, type, session_url, "
+                "session_id, to_pay, borrowing_id_id) "
+                "SELECT 'PENDING', 'PAYMENT', 'https://checkout.stripe.com/' || id, "
+                "'cs_plan_' || id, 7, id FROM borrowings_borrowing"
+            )
+            cursor.execute("ANALYZE")
+
+        cls.reader = get_user_model().objects.get(email="plan1@library.com")
+        cls.admin = get_user_model().objects.create_superuser(
+            "plan_admin@library.com", "password"
+        )
+        cls.payment = Payment.objects.filter(
+            borrowing_id__user_id=cls.reader
+        ).first()
+
+    def plans_of(self, func) -> list[dict]:
+        with CaptureQueriesContext(connection) as queries:
+            func()
+
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries:
+                # iterator() queries run through a server-side cursor
+                sql = re.sub(r"^DECLARE .+? CURSOR .*?FOR ", "", query["sql"])
+
+                if not sql.startswith("SELECT"):
+                    continue
+
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+                plans.append(cursor.fetchone()[0][0]["Plan"])
+
+        self.assertTrue(plans)
+        return plans
+
+    def assert_plans(self, case: str, func) -> None:
+        for plan in self.plans_of(func):
+            report = json.dumps(plan, indent=2)
+            self.assertFalse(
+                set(seq_scans(plan)) & LARGE_TABLES - ALLOWED_SEQ_SCANS.get(case, set()),
+                f"{case}: sequential scan\n{report}",
+            )
+            self.assertLessEqual(
+                plan["Total Cost"],
+                MAX_COSTS[case],
+                f"{case}: plan cost regression\n{report}",
+            )
+
+    def get(self, user, url, **params):
+        client = APIClient()
+        client.force_authenticate(user)
+        return lambda: client.get(url, params)
+
+    def test_borrowing_endpoints(self):
+        middle = Borrowing.objects.order_by("id")[30000].id
+        cursor = base64.b64encode(f"p={middle}".encode()).decode()
+
+        self.assert_plans("borrowings list", self.get(self.reader, BORROWING_URL))
+        self.assert_plans(
+            "active borrowings list",
+            self.get(self.reader, BORROWING_URL, is_active="1"),
+        )
+        self.assert_plans(
+            "borrowings of a user, admin",
+            self.get(self.admin, BORROWING_URL, user_id=self.reader.id),
+        )
+        self.assert_plans(
+            "borrowings deep page, admin",
+            self.get(self.admin, BORROWING_URL, cursor=cursor),
+        )
+
+    def test_payment_endpoints(self):
+        success_url = reverse(
+            "borrowings:borrowing-borrowing-is-successfully-paid",
+            args=[self.payment.borrowing_id_id],
+        )
+
+        self.assert_plans("payments list", self.get(self.reader, PAYMENT_URL))
+        self.assert_plans(
+            "payments of a user, admin",
+            self.get(self.admin, PAYMENT_URL, user_id=self.reader.id),
+        )
+        self.assert_plans(
+            "payment success page",
+            self.get(self.reader, success_url, session_id=self.payment.session_id),
+        )
+
+    @override_settings(OVERDUE_SCAN_RANGE_SIZE=10 ** 6)
+    @patch("borrowings.tasks.send_overdue_digest")
+    def test_overdue_scan(self, send_overdue_digest):
+        self.assert_plans("overdue scan", check_overdue_borrowings)
@@ -0,0 +1,164 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from benchmarks.fake_stripe import checkout_event, send_events, sign
+from books.models import Book
+from borrowings.models import Borrowing, Payment, StripeEvent
+from borrowings.webhooks import process_events
+
+WEBHOOK_URL = reverse("borrowings:stripe-webhook")
+SECRET = "whsec_test"
+
+
+def success_url(borrowing_id):
+    return reverse("borrowings:borrowing-borrowing-is-successfully-paid", args=[borrowing_id])
+
+
+def cancel_url(borrowing_id):
+    return reverse("borrowings:borrowing-borrowing-payment-is-cancelled", args=[borrowing_id])
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=SECRET)
+@patch("borrowings.webhooks.send_notification")
+@patch("borrowings.tasks.process_stripe_events.apply_async")
+class StripeWebhookTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            "reader@library.com", "password"
+        )
+        book = Book.objects.create(
+            title="Harry Potter",
+            author="J.K. Rowling",
+            cover="Hard",
+            inventory=50,
+            daily_fee=1,
+        )
+        self.payments = []
+        for number in range(20):
+            borrowing = Borrowing.objects.create(
+                expected_return_date="2023-12-12", book_id=book, user_id=self.user
+            )
+            self.payments.append(
+                Payment.objects.create(
+                    status="PENDING",
+                    type="PAYMENT",
+                    borrowing_id=borrowing,
+                    session_id=f"cs_test_{number}",
+                    session_url=f"https://checkout.stripe.com/{number}",
+                    to_pay=7,
+                )
+            )
+
+    def post(self, payload, signature):
+        return self.client.post(
+            WEBHOOK_URL,
+            payload,
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=signature,
+        ).status_code
+
+    def send(self, events):
+        with self.captureOnCommitCallbacks(execute=True):
+            return send_events(self.post, events, SECRET, workers=1)
+
+    def statuses(self):
+        return set(Payment.objects.filter(
+            id__in=[payment.id for payment in self.payments]
+        ).values_list("status", flat=True))
+
+    def test_unsigned_events_are_rejected(self, apply_async, send_notification):
+        payload = '{"id": "evt_1"}'
+
+        self.assertEqual(self.post(payload, ""), status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.post(payload, sign(payload, "whsec_other")),
+            status.HTTP_400_BAD_REQUEST,
+        )
+        self.assertFalse(StripeEvent.objects.exists())
+
+    def test_events_are_stored_once_and_applied_in_one_batch(
+            self, apply_async, send_notification
+    ):
+        events = [
+            checkout_event(payment.session_id, event_id=f"evt_{payment.id}")
+            for payment in self.payments
+        ]
+
+        statuses = self.send(events + events[:5])
+
+        self.assertEqual(statuses, [status.HTTP_200_OK] * 25)
+        self.assertEqual(StripeEvent.objects.count(), 20)
+        apply_async.assert_called_once()
+        self.assertEqual(self.statuses(), {"PENDING"})
+
+        with override_settings(STRIPE_EVENT_BATCH_SIZE=8):
+            self.assertEqual(process_events(), 20)
+
+        self.assertEqual(self.statuses(), {"PAID"})
+        self.assertEqual(send_notification.call_count, 20)
+
+    def test_reprocessing_events_changes_nothing(self, apply_async, send_notification):
+        self.send([checkout_event(self.payments[0].session_id)])
+        process_events()
+
+        self.send([checkout_event(self.payments[0].session_id)])
+
+        self.assertEqual(process_events(), 1)
+        self.assertEqual(process_events(), 0)
+        send_notification.assert_called_once()
+
+    def test_expired_sessions(self, apply_async, send_notification):
+        paid, expired = self.payments[:2]
+
+        self.send([
+            checkout_event(paid.session_id),
+            checkout_event(paid.session_id, "checkout.session.expired"),
+            checkout_event(expired.session_id, "checkout.session.expired"),
+            checkout_event(expired.session_id, payment_status="unpaid"),
+        ])
+        process_events()
+
+        paid.refresh_from_db()
+        expired.refresh_from_db()
+        self.assertEqual(paid.status, "PAID")
+        self.assertEqual(expired.status, "EXPIRED")
+
+    def test_unhandled_events_are_ignored(self, apply_async, send_notification):
+        self.send([checkout_event("cs_test_0", "customer.created")])
+
+        self.assertFalse(StripeEvent.objects.exists())
+
+    @patch("stripe.checkout.Session.retrieve")
+    def test_success_and_cancel_pages_read_local_state(
+            self, retrieve, apply_async, send_notification
+    ):
+        payment = self.payments[0]
+        borrowing_id = payment.borrowing_id_id
+        params = {"session_id": payment.session_id}
+        self.client.force_authenticate(self.user)
+
+        response = self.client.get(success_url(borrowing_id), params)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        self.send([checkout_event(payment.session_id)])
+        process_events()
+
+        response = self.client.get(success_url(borrowing_id), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["id"], borrowing_id)
+
+        response = self.client.get(cancel_url(borrowing_id), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(payment.session_url, response.data["Cancel"])
+
+        response = self.client.get(success_url(borrowing_id), {"session_id": "cs_other"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        retrieve.assert_not_called()
@@ -0,0 +1,185 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+import fakeredis
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books.models import Book
+from borrowings.models import Borrowing, Payment
+from library_project import throttling
+from user.serializers import TokenObtainPairSerializer
+
+BORROWING_URL = reverse("borrowings:borrowing-list")
+
+
+def success_url(borrowing_id):
+    return reverse(
+        "borrowings:borrowing-borrowing-is-successfully-paid", args=[borrowing_id]
+    )
+
+
+def cancel_url(borrowing_id):
+    return reverse(
+        "borrowings:borrowing-borrowing-payment-is-cancelled", args=[borrowing_id]
+    )
+
+
+def return_url(borrowing_id):
+    return reverse("borrowings:borrowing-return-book", args=[borrowing_id])
+
+
+@override_settings(
+    THROTTLE_RATES={
+        "user": "60/min",
+        "borrowing": "10/min",
+        "return": "10/min",
+        "payment": "2/min",
+    },
+)
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+        patcher = patch("library_project.throttling.get_redis", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = get_user_model().objects.create_user(
+            "reader@library.com", "password"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.book = Book.objects.create(
+            title="Harry Potter",
+            author="J.K. Rowling",
+            cover="Hard",
+            inventory=5,
+            daily_fee=1,
+        )
+        self.borrowing = Borrowing.objects.create(
+            expected_return_date=timezone.now() + timedelta(days=3),
+            book_id=self.book,
+            user_id=self.user,
+        )
+        Payment.objects.create(
+            status="PENDING",
+            type="PAYMENT",
+            borrowing_id=self.borrowing,
+            session_id="cs_test",
+            to_pay=3,
+        )
+
+    def get(self, url):
+        return self.client.get(url, {"session_id": "cs_test"})
+
+    def test_endpoint_bucket_throttles_with_retry_after(self):
+        for _ in range(2):
+            self.assertEqual(
+                self.get(success_url(self.borrowing.id)).status_code,
+                status.HTTP_202_ACCEPTED,
+            )
+
+        response = self.get(success_url(self.borrowing.id))
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # one of 2 tokens a minute comes back in 30 seconds
+        self.assertIn(int(response["Retry-After"]), (29, 30))
+        # lists have no bucket
+        self.assertEqual(
+            self.client.get(BORROWING_URL).status_code, status.HTTP_200_OK
+        )
+
+        self.client.force_authenticate(
+            get_user_model().objects.create_user("other@library.com", "password")
+        )
+        self.assertEqual(
+            self.get(success_url(self.borrowing.id)).status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+
+    @override_settings(
+        THROTTLE_RATES={"user": "2/min", "payment": "60/min", "return": "60/min"}
+    )
+    def test_user_bucket_is_shared_by_endpoints(self):
+        self.get(success_url(self.borrowing.id))
+        self.get(cancel_url(self.borrowing.id))
+
+        response = self.client.post(return_url(self.borrowing.id))
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.borrowing.refresh_from_db()
+        self.assertIsNone(self.borrowing.actual_return_date)
+
+    def test_bucket_refills_over_the_period(self):
+        for _ in range(2):
+            self.assertEqual(throttling.take_tokens("1", "payment"), 0)
+
+        self.assertGreater(throttling.take_tokens("1", "payment"), 0)
+
+        # as if the last request was made a minute ago
+        key = "throttle:bucket:payment:1"
+        self.redis.hincrby(key, "at", -60_000)
+
+        self.assertEqual(throttling.take_tokens("1", "payment"), 0)
+        self.assertEqual(throttling.take_tokens("1", "payment"), 0)
+        self.assertGreater(throttling.take_tokens("1", "payment"), 0)
+
+    @override_settings(EXTERNAL_CALL_CONCURRENCY=1)
+    def test_external_calls_wait_for_a_free_slot(self):
+        holder = throttling.acquire_slot()
+
+        response = self.client.post(return_url(self.borrowing.id))
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response["Retry-After"], "1")
+
+        throttling.release_slot(holder)
+
+        response = self.client.post(return_url(self.borrowing.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(throttling.get_stats()["slots_in_use"], 0)
+
+    @override_settings(EXTERNAL_CALL_CONCURRENCY=1, EXTERNAL_CALL_LEASE=0)
+    def test_slots_of_dead_requests_expire(self):
+        throttling.acquire_slot()
+
+        self.assertIsNotNone(throttling.acquire_slot())
+
+    def test_decisions_are_counted(self):
+        for _ in range(3):
+            self.get(success_url(self.borrowing.id))
+
+        out = StringIO()
+        call_command("throttle_stats", "--reset", stdout=out)
+
+        self.assertEqual(throttling.get_stats()["scopes"], {})
+        self.assertIn("payment: 2 allowed, 1 throttled (33.3%)", out.getvalue())
+        self.assertIn("user: 2 allowed, 0 throttled (0.0%)", out.getvalue())
+
+    @override_settings(ROOT_URLCONF="library_project.asgi_urls")
+    async def test_async_views_take_the_same_tokens(self):
+        token = TokenObtainPairSerializer.get_token(self.user).access_token
+        client = AsyncClient()
+
+        for expected in (
+                status.HTTP_202_ACCEPTED,
+                status.HTTP_200_OK,
+                status.HTTP_429_TOO_MANY_REQUESTS,
+        ):
+            response = await client.get(
+                cancel_url(self.borrowing.id)
+                if expected == status.HTTP_200_OK
+                else success_url(self.borrowing.id),
+                {"session_id": "cs_test"},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            self.assertEqual(response.status_code, expected)
+
+        self.assertIn("Retry-After", response)
@@ -1,6 +1,7 @@
+from django.urls import path
 from rest_framework import routers
 
-from borrowings.views import BorrowingViewSet, PaymentViewSet
+from borrowings.views import BorrowingViewSet, PaymentViewSet, StripeWebhookView
 
 app_name = "borrowings"
 
@@ -8,4 +9,6 @@ router = routers.DefaultRouter()
 router.register("borrowings", BorrowingViewSet)
 router.register("payments", PaymentViewSet)
 
-urlpatterns = [] + router.urls
+urlpatterns = [
+    path("webhooks/stripe/", StripeWebhookView.as_view(), name="stripe-webhook"),
+] + router.urls
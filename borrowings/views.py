@@ -1,27 +1,34 @@
-from datetime import timedelta
-from decimal import Decimal
 from typing import Any
 
 import stripe
-from django.utils import timezone
+from django.conf import settings
+from django.shortcuts import get_object_or_404
 from drf_spectacular.utils import extend_schema_view, extend_schema, OpenApiParameter
 from rest_framework import status, mixins
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
 from borrowings.models import Borrowing, Payment
-from borrowings.notification import send_notification
 from borrowings.serializers import (
+    BorrowingCheckoutSerializer,
     BorrowingSerializer,
     BorrowingDetailSerializer,
     PaymentSerializer,
     PaymentDetailSerializer,
 )
-from borrowings.stripe import create_stripe_session
+from borrowings.returns import close_borrowing, create_fine
+from borrowings.stripe import attach_session_or_defer
+from borrowings.webhooks import record_event
+from library_project.conditional import ConditionalGetMixin
+from library_project.eager_loading import EagerLoadingMixin
+from library_project.fast_serializers import ValuesListMixin
+from library_project.pagination import KeysetPagination
+from library_project.throttling import ExternalCallLimitMixin, TokenBucketThrottle
+from user.authentication import StatelessJWTAuthentication
 
 
 @extend_schema_view(
@@ -36,15 +43,32 @@ from borrowings.stripe import create_stripe_session
     create=extend_schema(description="Creating a new borrowing endpoint."),
 )
 class BorrowingViewSet(
+    ExternalCallLimitMixin,
+    ConditionalGetMixin,
+    EagerLoadingMixin,
+    ValuesListMixin,
     mixins.CreateModelMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     GenericViewSet
 ):
-    queryset = Borrowing.objects.select_related("book_id", "user_id")
+    queryset = Borrowing.objects.all()
     serializer_class = BorrowingSerializer
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (StatelessJWTAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    # the detail shows the book too
+    detail_modified_fields = ("updated_at", "book_id__updated_at")
+    throttle_classes = (TokenBucketThrottle,)
+    throttle_scopes = {
+        "create": "borrowing",
+        "checkout": "borrowing",
+        "return_book": "return",
+        "borrowing_is_successfully_paid": "payment",
+        "borrowing_payment_is_cancelled": "payment",
+    }
+    # they create Stripe sessions and notify Telegram
+    external_call_actions = ("create", "checkout", "return_book")
 
     def get_queryset(self):
         queryset = self.queryset
@@ -69,6 +93,9 @@ class BorrowingViewSet(
         if self.action == "retrieve":
             return BorrowingDetailSerializer
 
+        if self.action == "checkout":
+            return BorrowingCheckoutSerializer
+
         return BorrowingSerializer
 
     def perform_create(self, serializer):
@@ -88,39 +115,51 @@ class BorrowingViewSet(
                 required=False,
                 type=str,
             ),
+            OpenApiParameter(
+                name="count",
+                description=(
+                    "Add the estimated number of borrowings to the page "
+                    "(ex. ?count=estimate)."
+                ),
+                required=False,
+                type=str,
+            ),
         ],
     )
     def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
-        return super().list(self, request, *args, **kwargs)
+        return super().list(request, *args, **kwargs)
+
+    @extend_schema(
+        description=(
+                "Borrowing several books at once with one payment session "
+                "(fails as a whole if any book is out of stock)."
+        ),
+    )
+    @action(detail=False, url_path="checkout", methods=["post"])
+    def checkout(self, request):
+        """
+        Bulk checkout endpoint that borrows all the given books.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user_id=request.user)
+
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, url_path="return", methods=["post"])
     def return_book(self, request, pk=None):
         """
         Returning book endpoint that closing the specific borrowing.
         """
-        borrowing = Borrowing.objects.get(pk=pk)
-
-        if borrowing.actual_return_date is None:  # check if book has not yet been returned
-            borrowing.actual_return_date = timezone.now()
-            borrowing.book_id.inventory += 1
-
-            if borrowing.actual_return_date - borrowing.expected_return_date > timedelta(0):
-                # check that borrowing have fine
-                stripe_session = create_stripe_session(
-                    borrowing=borrowing,
-                    is_fine=True
-                )
-                Payment.objects.create(
-                    status="PENDING",
-                    type="FINE",
-                    borrowing_id=borrowing,
-                    session_url=stripe_session["url"],
-                    session_id=stripe_session["id"],
-                    to_pay=Decimal(stripe_session["amount_total"] / 100),
-                )
-
-            borrowing.book_id.save()
-            borrowing.save()
+        borrowing = get_object_or_404(
+            self.get_queryset().select_related("book_id", "user_id"), pk=pk
+        )
+
+        if close_borrowing(borrowing):
+            payment = create_fine(borrowing)
+
+            if payment:
+                attach_session_or_defer([payment])
 
             return Response(
                 {'success': 'You are return your borrowing book.'},
@@ -132,6 +171,36 @@ class BorrowingViewSet(
             status.HTTP_403_FORBIDDEN
         )
 
+    @action(
+        methods=["GET"],
+        detail=True,
+        url_path="payment",
+    )
+    def borrowing_payment(self, request, pk=None):
+        """
+        Payment of the borrowing. Responds with 202 until the Stripe
+        session is created, so clients can poll it for the session url.
+        """
+        borrowing = self.get_object()
+        payment = Payment.objects.filter(
+            borrowing_id=borrowing, type="PAYMENT"
+        ).last()
+
+        if payment is None:
+            return Response(
+                {"error": "Borrowing has no payment."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        return Response(
+            PaymentSerializer(payment).data,
+            status=(
+                status.HTTP_202_ACCEPTED
+                if payment.session_url is None
+                else status.HTTP_200_OK
+            ),
+        )
+
     @action(
         methods=["GET"],
         detail=True,
@@ -139,21 +208,32 @@ class BorrowingViewSet(
     )
     def borrowing_is_successfully_paid(self, request, pk=None):
         """
-        Success payment endpoint after paying for the borrowing
+        Success payment endpoint after paying for the borrowing. The payment
+        status is set by the Stripe webhook, responds with 202 until it is.
         """
         borrowing = self.get_object()
-        session_id = request.query_params.get("session_id")
-        payment = Payment.objects.get(session_id=session_id)
-        session = stripe.checkout.Session.retrieve(session_id)
-
-        if session["payment_status"] == "paid":
-            payment.status = "PAID"
-            payment.save()
-            send_notification(f"{payment} was paid.")
+        payment = Payment.objects.filter(
+            borrowing_id=borrowing,
+            session_id=request.query_params.get("session_id"),
+        ).first()
+
+        if payment is None:
+            return Response(
+                {"error": "Borrowing has no such payment."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        if payment.status == "PAID":
             serializer = self.get_serializer(borrowing)
 
             return Response(serializer.data, status=status.HTTP_200_OK)
 
+        if payment.status == "PENDING":
+            return Response(
+                {"Pending": "Payment is not confirmed by Stripe yet."},
+                status=status.HTTP_202_ACCEPTED,
+            )
+
         return Response(
             {"Fail": "Payment wasn't successful."}, status=status.HTTP_400_BAD_REQUEST
         )
@@ -168,18 +248,54 @@ class BorrowingViewSet(
         Cancel endpoint for borrowing payment.
         """
         borrowing = self.get_object()
-        session_id = request.query_params.get("session_id")
-        session = stripe.checkout.Session.retrieve(session_id)
+        payment = Payment.objects.filter(
+            borrowing_id=borrowing,
+            session_id=request.query_params.get("session_id"),
+        ).first()
+
+        if payment is None:
+            return Response(
+                {"error": "Borrowing has no such payment."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
         return Response(
             {
                 "Cancel": f"The payment for the {borrowing} is cancelled. "
                           f"Make sure to pay during 24 hours. Payment url: "
-                          f"{session.url}. Thanks!"
+                          f"{payment.session_url}. Thanks!"
             },
             status=status.HTTP_200_OK,
         )
 
 
+class StripeWebhookView(APIView):
+    """
+    Receives signed checkout session events from Stripe. Events are only
+    stored here and applied to payments in batches by a Celery task.
+    """
+
+    authentication_classes = ()
+    permission_classes = ()
+
+    @extend_schema(exclude=True)
+    def post(self, request: Request) -> Response:
+        try:
+            event = stripe.Webhook.construct_event(
+                request.body,
+                request.headers.get("Stripe-Signature", ""),
+                settings.STRIPE_WEBHOOK_SECRET,
+            )
+        except (ValueError, stripe.error.SignatureVerificationError):
+            return Response(
+                {"error": "Invalid Stripe event."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        record_event(event)
+        return Response(status=status.HTTP_200_OK)
+
+
 @extend_schema_view(
     list=extend_schema(
         description=(
@@ -191,14 +307,17 @@ class BorrowingViewSet(
     retrieve=extend_schema(description="Endpoint for getting a specific payment."),
 )
 class PaymentViewSet(
+    EagerLoadingMixin,
+    ValuesListMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     GenericViewSet
 ):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (StatelessJWTAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
 
     def get_serializer_class(self):
         if self.action == "retrieve":
@@ -0,0 +1,134 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from analytics.summaries import record_revenue
+from borrowings.models import Payment, StripeEvent
+from borrowings.notification import send_notification
+
+PROCESSING_SCHEDULED_KEY = "stripe:events:scheduled"
+# scheduling is retried after this many seconds if the task got lost
+PROCESSING_SCHEDULED_TIMEOUT = 60
+SESSION_COMPLETED = "checkout.session.completed"
+SESSION_ASYNC_PAYMENT_SUCCEEDED = "checkout.session.async_payment_succeeded"
+SESSION_EXPIRED = "checkout.session.expired"
+PAYMENT = Payment._meta.db_table
+HANDLED_EVENTS = (
+    SESSION_COMPLETED,
+    SESSION_ASYNC_PAYMENT_SUCCEEDED,
+    SESSION_EXPIRED,
+)
+
+
+def to_stripe_event(event) -> StripeEvent:
+    """Unsaved StripeEvent of a checkout session event of the Stripe API"""
+    session = event["data"]["object"]
+
+    return StripeEvent(
+        event_id=event["id"],
+        type=event["type"],
+        session_id=session["id"],
+        payment_status=session.get("payment_status") or "",
+    )
+
+
+def record_event(event) -> None:
+    """
+    Stores a checkout session event once, Stripe may deliver the same
+    event several times, and schedules the batch that applies it
+    """
+    if event["type"] not in HANDLED_EVENTS:
+        return
+
+    StripeEvent.objects.bulk_create(
+        [to_stripe_event(event)], ignore_conflicts=True
+    )
+    transaction.on_commit(schedule_processing)
+
+
+def schedule_processing() -> None:
+    """Schedules one processing task for the events of the next seconds"""
+    from borrowings.tasks import process_stripe_events
+
+    if cache.add(
+            PROCESSING_SCHEDULED_KEY, 1, timeout=PROCESSING_SCHEDULED_TIMEOUT
+    ):
+        process_stripe_events.apply_async(
+            countdown=settings.STRIPE_EVENT_BATCH_DELAY
+        )
+
+
+def is_paid(event: StripeEvent) -> bool:
+    return event.type == SESSION_ASYNC_PAYMENT_SUCCEEDED or (
+        event.type == SESSION_COMPLETED and event.payment_status == "paid"
+    )
+
+
+def apply_events(events: list[StripeEvent]) -> int:
+    """
+    Updates the payments of the events with one UPDATE and returns how
+    many were paid. A paid session wins over its expiry, applying an
+    event twice or an expiry after the payment changes nothing.
+    """
+    statuses = {}
+
+    for event in events:
+        if is_paid(event):
+            statuses[event.session_id] = "PAID"
+        elif event.type == SESSION_EXPIRED:
+            statuses.setdefault(event.session_id, "EXPIRED")
+
+    if not statuses:
+        return 0
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {PAYMENT} AS payment SET status = session.status "
+            "FROM unnest(%s::varchar[], %s::varchar[]) AS session (id, status) "
+            "WHERE payment.session_id = session.id "
+            "AND payment.status <> session.status "
+            "AND (session.status = 'PAID' OR payment.status = 'PENDING') "
+            "RETURNING payment.id, payment.status, payment.type, payment.to_pay",
+            [list(statuses), list(statuses.values())],
+        )
+        paid = [
+            (payment_id, payment_type, to_pay)
+            for payment_id, payment_status, payment_type, to_pay
+            in cursor.fetchall()
+            if payment_status == "PAID"
+        ]
+
+    record_revenue([(payment_type, to_pay) for _, payment_type, to_pay in paid])
+
+    for payment_id, _, _ in paid:
+        send_notification(f"{Payment(id=payment_id)} was paid.")
+
+    return len(paid)
+
+
+def process_events() -> int:
+    """
+    Applies pending events in batches of STRIPE_EVENT_BATCH_SIZE and
+    returns how many were processed. Concurrent runs skip each other's rows.
+    """
+    cache.delete(PROCESSING_SCHEDULED_KEY)
+    processed = 0
+
+    while True:
+        with transaction.atomic():
+            events = list(
+                StripeEvent.objects.select_for_update(skip_locked=True)
+                .filter(processed_at__isnull=True)
+                .order_by("id")[:settings.STRIPE_EVENT_BATCH_SIZE]
+            )
+
+            if not events:
+                return processed
+
+            apply_events(events)
+            StripeEvent.objects.filter(
+                id__in=[event.id for event in events]
+            ).update(processed_at=timezone.now())
+
+        processed += len(events)
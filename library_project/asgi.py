@@ -2,6 +2,8 @@
 ASGI config for library_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests are routed with library_project.asgi_urls, which serves the async
+borrowing views, e.g. ``uvicorn library_project.asgi:application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -9,8 +11,17 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'library_project.settings')
 
-application = get_asgi_application()
+
+class AsyncRoutesASGIHandler(ASGIHandler):
+    async def get_response_async(self, request):
+        request.urlconf = "library_project.asgi_urls"
+        return await super().get_response_async(request)
+
+
+django.setup(set_prefix=False)
+application = AsyncRoutesASGIHandler()
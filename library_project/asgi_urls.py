@@ -0,0 +1,18 @@
+"""
+URL configuration of the ASGI application.
+
+The async borrowing views take the place of the BorrowingViewSet actions
+they mirror, everything else is routed as in library_project.urls.
+"""
+from django.urls import path
+
+from borrowings import async_views
+from library_project.urls import urlpatterns as wsgi_urlpatterns
+
+BORROWING_URL = "api/borrowings/borrowings/<int:pk>/"
+
+urlpatterns = [
+    path(BORROWING_URL + "return/", async_views.return_book),
+    path(BORROWING_URL + "success/", async_views.borrowing_is_successfully_paid),
+    path(BORROWING_URL + "cancel/", async_views.borrowing_payment_is_cancelled),
+] + wsgi_urlpatterns
@@ -0,0 +1,40 @@
+"""
+Bounded database access for async views.
+
+Django runs the ORM of every async request on a thread of its own and
+every thread opens its own connection, so a burst of requests would open
+as many connections as there are requests in flight. The views query the
+database inside database_slot(), which lets ASYNC_DATABASE_CONNECTIONS
+requests of a process at a time use it and closes the connection of the
+request when it leaves, before the request waits on anything else.
+"""
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+
+_slots = weakref.WeakKeyDictionary()
+
+
+def _release_connection() -> None:
+    # closing the connection in a transaction would roll it back
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+@asynccontextmanager
+async def database_slot():
+    loop = asyncio.get_running_loop()
+    slots = _slots.get(loop)
+
+    if slots is None:
+        slots = _slots[loop] = asyncio.Semaphore(settings.ASYNC_DATABASE_CONNECTIONS)
+
+    async with slots:
+        try:
+            yield
+        finally:
+            await sync_to_async(_release_connection)()
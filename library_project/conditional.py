@@ -0,0 +1,125 @@
+"""
+Conditional GET of list pages and details.
+
+The validators of a response are computed from the ids and modification
+times of the rows it shows, read with the query of the page restricted
+to those columns, before anything is serialized. A request whose
+If-None-Match or If-Modified-Since still matches gets 304 Not Modified
+with no body. List pages only carry an ETag: rows leaving a page can
+make its newest modification time older, which If-Modified-Since would
+take for no change.
+"""
+import hashlib
+from datetime import datetime
+from typing import Callable, NamedTuple
+
+from django.core.exceptions import ValidationError
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+
+class Validators(NamedTuple):
+    etag: str
+    last_modified: datetime | None = None
+
+
+def _etag(*parts) -> str:
+    """Weak ETag, the same data is rendered in several formats and encodings"""
+    return f'W/"{hashlib.sha1(repr(parts).encode()).hexdigest()}"'
+
+
+class ConditionalGetMixin:
+    """
+    Answers conditional list and retrieve requests with 304 Not Modified.
+    ``modified_fields`` date the rows of a list page and
+    ``detail_modified_fields`` the object of a detail, which may follow
+    relations its nested representations show.
+    """
+
+    modified_fields = ("updated_at",)
+    detail_modified_fields = None
+
+    def page_validators(self, request: Request) -> Validators:
+        queryset = self.filter_queryset(self.get_queryset())
+        # a paginator of its own, the page itself is paginated later
+        paginator = type(self.paginator)()
+        rows = paginator.paginate_queryset(
+            queryset.values("id", *self.modified_fields), request, view=self
+        )
+
+        return Validators(_etag(
+            [tuple(row.values()) for row in rows],
+            paginator.get_next_link(),
+            paginator.get_previous_link(),
+        ))
+
+    def detail_validators(self, request: Request) -> Validators | None:
+        """Validators of the object, None when it does not exist"""
+        fields = self.detail_modified_fields or self.modified_fields
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+
+        try:
+            row = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: lookup}
+            ).values_list(*fields).first()
+        except (TypeError, ValueError, ValidationError):
+            # a malformed lookup, retrieve responds with 404 to it
+            return None
+
+        if row is None:
+            return None
+
+        return Validators(
+            _etag(row),
+            max(modified for modified in row if modified is not None),
+        )
+
+    def conditional(
+            self,
+            request: Request,
+            validators: Validators | None,
+            respond: Callable[[], Response],
+    ) -> Response:
+        """
+        Responds with 304 Not Modified, or 412 Precondition Failed, when
+        the validators satisfy the conditions of the request, otherwise
+        with ``respond()``. Both carry the validators.
+        """
+        if validators is None:
+            return respond()
+
+        last_modified = (
+            int(validators.last_modified.timestamp())
+            if validators.last_modified else None
+        )
+        not_modified = get_conditional_response(
+            request, etag=validators.etag, last_modified=last_modified
+        )
+        response = (
+            respond() if not_modified is None
+            else Response(status=not_modified.status_code)
+        )
+        response["ETag"] = validators.etag
+
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(
+            request,
+            self.page_validators(request),
+            lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(
+            request,
+            self.detail_validators(request),
+            lambda: super(ConditionalGetMixin, self).retrieve(
+                request, *args, **kwargs
+            ),
+        )
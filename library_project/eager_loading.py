@@ -0,0 +1,138 @@
+from functools import lru_cache
+from typing import NamedTuple
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Model, Prefetch, QuerySet
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+class LoadPlan(NamedTuple):
+    select_related: tuple[str, ...]
+    prefetch_related: tuple[tuple[str, "LoadPlan"], ...]
+    only: tuple[str, ...]
+
+
+def _readable_fields(serializer: serializers.BaseSerializer):
+    return (field for field in serializer.fields.values() if not field.write_only)
+
+
+def _concrete_fields(model: type[Model], prefix: str) -> list[str]:
+    return [prefix + field.name for field in model._meta.concrete_fields]
+
+
+def _plan(
+        serializer: serializers.BaseSerializer, model: type[Model], prefix: str = ""
+) -> LoadPlan:
+    """
+    Walks the readable fields of the serializer: nested serializers of
+    forward relations are joined, to-many relations are prefetched and
+    only the columns the fields read are loaded. A level with a field
+    that reads something else than a model field loads all its columns.
+    """
+    select, prefetch, only = [], [], [prefix + model._meta.pk.name]
+    is_complete = True
+
+    for field in _readable_fields(serializer):
+        if field.source == "*":
+            is_complete = False
+            continue
+
+        current_model, path = model, prefix
+        attrs = field.source_attrs
+
+        try:
+            for attr in attrs[:-1]:
+                relation = current_model._meta.get_field(attr)
+                if not (relation.many_to_one or relation.one_to_one):
+                    raise FieldDoesNotExist(attr)
+
+                select.append(path + attr)
+                only.append(path + attr)
+                current_model, path = relation.related_model, f"{path}{attr}__"
+
+            model_field = current_model._meta.get_field(attrs[-1])
+        except FieldDoesNotExist:
+            is_complete = False
+            continue
+
+        name = path + attrs[-1]
+
+        if model_field.many_to_many or model_field.one_to_many:
+            child = getattr(field, "child", None)
+            prefetch.append((
+                name,
+                _plan(child, model_field.related_model, "")._replace(only=())
+                if isinstance(child, serializers.BaseSerializer)
+                else LoadPlan((), (), ()),
+            ))
+        elif isinstance(field, serializers.BaseSerializer):
+            nested = _plan(field, model_field.related_model, f"{name}__")
+            select.extend([name, *nested.select_related])
+            prefetch.extend(nested.prefetch_related)
+            only.extend(nested.only)
+
+            if model_field.concrete:
+                only.append(name)
+        elif model_field.concrete:
+            only.append(name)
+
+    if not is_complete:
+        only.extend(_concrete_fields(model, prefix))
+
+    return LoadPlan(
+        tuple(dict.fromkeys(select)),
+        tuple(prefetch),
+        tuple(dict.fromkeys(only)),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_load_plan(serializer_class: type[serializers.ModelSerializer]) -> LoadPlan:
+    """Load plan of the serializer, built once per serializer class"""
+    return _plan(serializer_class(), serializer_class.Meta.model)
+
+
+def _apply(queryset: QuerySet, plan: LoadPlan) -> QuerySet:
+    if plan.select_related:
+        queryset = queryset.select_related(*plan.select_related)
+
+    for path, child_plan in plan.prefetch_related:
+        related_model = queryset.model
+
+        for attr in path.split("__"):
+            related_model = related_model._meta.get_field(attr).related_model
+
+        queryset = queryset.prefetch_related(
+            Prefetch(path, queryset=_apply(related_model._default_manager.all(), child_plan))
+        )
+
+    if plan.only:
+        queryset = queryset.only(*plan.only)
+
+    return queryset
+
+
+def eager_load(
+        queryset: QuerySet, serializer_class: type[serializers.ModelSerializer]
+) -> QuerySet:
+    """
+    Queryset that loads everything the serializer reads in a fixed number
+    of queries, whatever the number of objects
+    """
+    return _apply(queryset, get_load_plan(serializer_class))
+
+
+class EagerLoadingMixin:
+    """
+    Eager loads the queryset of read requests for the serializer of the
+    action. Writes keep loading whole objects.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+
+        return eager_load(queryset, self.get_serializer_class())
@@ -0,0 +1,165 @@
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import Model, QuerySet
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# fields whose representation of a database value is the value itself
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+def _converted(getter: Callable, convert: Callable) -> Callable:
+    def extract(row):
+        value = getter(row)
+        return None if value is None else convert(value)
+
+    return extract
+
+
+def _datetime_converter(field: serializers.DateTimeField) -> Callable:
+    """
+    DateTimeField.to_representation for aware values in the default
+    ISO 8601 format, without its per-value format and timezone lookups
+    """
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+
+    if (
+            not settings.USE_TZ
+            or hasattr(field, "timezone")
+            or output_format is None
+            or output_format.lower() != ISO_8601
+    ):
+        return field.to_representation
+
+    def convert(value):
+        if value.tzinfo is None:
+            return field.to_representation(value)
+
+        value = value.astimezone(timezone.get_current_timezone()).isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+    return convert
+
+
+def _nested(getter: Callable, build: Callable) -> Callable:
+    def extract(row):
+        return None if getter(row) is None else build(row)
+
+    return extract
+
+
+def _compile(
+        serializer: serializers.BaseSerializer,
+        model: type[Model],
+        columns: list[str],
+        prefix: str = "",
+) -> Callable[[Any], dict]:
+    """
+    Extractors of every readable field, reading the row positions of
+    the columns they append to ``columns``
+    """
+    extractors = []
+
+    def column(name: str) -> Callable:
+        if name not in columns:
+            columns.append(name)
+        return itemgetter(columns.index(name))
+
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            raise ImproperlyConfigured(
+                f"{type(serializer).__name__}.{name} is not a model field"
+            )
+
+        path = prefix + field.source
+
+        if isinstance(field, serializers.BaseSerializer):
+            if not (model_field.many_to_one or model_field.one_to_one):
+                raise ImproperlyConfigured(
+                    f"{type(serializer).__name__}.{name} is not a forward relation"
+                )
+            related_model = model_field.related_model
+            extract = _nested(
+                column(f"{path}__{related_model._meta.pk.name}"),
+                _compile(field, related_model, columns, f"{path}__"),
+            )
+        elif isinstance(field, PASSTHROUGH_FIELDS) and not (
+                isinstance(field, serializers.PrimaryKeyRelatedField)
+                and field.pk_field is not None
+        ):
+            extract = column(path)
+        elif isinstance(field, serializers.DateTimeField):
+            extract = _converted(column(path), _datetime_converter(field))
+        elif isinstance(field, serializers.Field) and model_field.concrete:
+            extract = _converted(column(path), field.to_representation)
+        else:
+            raise ImproperlyConfigured(
+                f"{type(serializer).__name__}.{name} can not be read from values"
+            )
+
+        extractors.append((name, extract))
+
+    def build(row) -> dict:
+        return {name: extract(row) for name, extract in extractors}
+
+    return build
+
+
+class ValuesSerializer:
+    """
+    Read-only counterpart of a ModelSerializer of model fields and nested
+    forward relations. Reads rows with values_list() and builds the same
+    representation with extractors compiled once, without creating model
+    instances or going through the field machinery per row.
+    """
+
+    def __init__(self, serializer_class: type[serializers.ModelSerializer]):
+        self.columns = []
+        self.build = _compile(
+            serializer_class(), serializer_class.Meta.model, self.columns
+        )
+
+    def values(self, queryset: QuerySet) -> QuerySet:
+        # named rows keep the cursor paginator able to read the ordering key
+        return queryset.values_list(*self.columns, named=True)
+
+    def to_representation(self, rows) -> list[dict]:
+        build = self.build
+        return [build(row) for row in rows]
+
+
+@lru_cache(maxsize=None)
+def get_values_serializer(
+        serializer_class: type[serializers.ModelSerializer],
+) -> ValuesSerializer:
+    return ValuesSerializer(serializer_class)
+
+
+class ValuesListMixin:
+    """List action served by the ValuesSerializer of the serializer class"""
+
+    def list(self, request, *args, **kwargs):
+        serializer = get_values_serializer(self.get_serializer_class())
+        queryset = serializer.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.to_representation(page))
+
+        return Response(serializer.to_representation(queryset))
@@ -0,0 +1,49 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from debug_toolbar import middleware as debug_toolbar
+from django.db import connection
+
+QUERY_COUNT_HEADER = "X-DB-Queries"
+
+
+class QueryCountMiddleware:
+    """Adds the number of database queries of a request to its response"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            response = self.get_response(request)
+
+        response[QUERY_COUNT_HEADER] = str(queries)
+        return response
+
+
+class DebugToolbarMiddleware(debug_toolbar.DebugToolbarMiddleware):
+    """
+    Debug toolbar of sync requests. The toolbar middleware is sync only,
+    under it every async view would run on a thread and event loop of
+    its own, so async requests pass through.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.get_response(request)
+
+        return super().__call__(request)
@@ -0,0 +1,146 @@
+from collections import OrderedDict
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def estimate_count(queryset: QuerySet) -> int:
+    """
+    Row count estimated by the query planner from table statistics,
+    instead of an exact COUNT(*) that has to visit every row
+    """
+    sql, params = queryset.order_by().query.sql_with_params()
+
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator of the admin changelists. Large results are counted by
+    estimate_count, the exact COUNT(*) is only run when the estimate is
+    small enough for it to be cheap.
+    """
+
+    exact_count_below = 10_000
+
+    @cached_property
+    def count(self) -> int:
+        estimated = estimate_count(self.object_list)
+
+        if estimated < self.exact_count_below:
+            return self.object_list.count()
+
+        return estimated
+
+
+class EstimatedCountMixin:
+    """Adds an estimated ``count`` to the page when ``?count=estimate``"""
+
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.estimated_count = None
+
+        if request.query_params.get(self.count_query_param) == "estimate":
+            self.estimated_count = estimate_count(queryset)
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+
+        if self.estimated_count is not None:
+            response.data = OrderedDict(
+                [("count", self.estimated_count), *response.data.items()]
+            )
+
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"] = {
+            "count": {
+                "type": "integer",
+                "description": "Estimated total, only with ?count=estimate.",
+            },
+            **response_schema["properties"],
+        }
+        return response_schema
+
+
+class KeysetPagination(EstimatedCountMixin, CursorPagination):
+    """
+    Cursor pagination over the primary key, every page costs one index
+    range scan however deep it is. Newest objects come first.
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = "-id"
+
+
+class CatalogPagination(KeysetPagination):
+    ordering = "id"
+
+
+class UncountedLimitOffsetPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination that reads one row past the page to know
+    whether there is a next one, instead of counting all matches
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+
+        rows = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(rows) > self.limit
+
+        return rows[:self.limit]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(
+            url, self.offset_query_param, self.offset + self.limit
+        )
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict([
+                ("next", self.get_next_link()),
+                ("previous", self.get_previous_link()),
+                ("results", data),
+            ])
+        )
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"].pop("count")
+        return response_schema
+
+
+class SearchResultsPagination(
+    EstimatedCountMixin, UncountedLimitOffsetPagination
+):
+    """
+    Search results are ordered by relevance, which has no stable key
+    for a cursor. Only the first pages of them are meaningful anyway.
+    """
+
+    default_limit = 20
+    max_limit = 100
@@ -0,0 +1,4 @@
+"""
+PostgreSQL database backend with a connection pool per process, enabled
+with DB_POOL (library_project/settings.py).
+"""
@@ -0,0 +1,44 @@
+from django.db.backends.postgresql import base, creation
+
+from library_project.pooled_postgresql.pool import close_pools, get_pool
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # idle pooled connections would keep the test database in use
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend that checks connections out of the pool of the
+    process, configured by OPTIONS["pool"], and checks them in on close.
+    CONN_HEALTH_CHECKS pings a pooled connection before it is checked out.
+    """
+
+    creation_class = DatabaseCreation
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop("pool", None)
+
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        pool = get_pool(
+            tuple(sorted(conn_params.items(), key=lambda item: item[0])),
+            f"{self.alias}:{conn_params.get('dbname')}",
+            self.settings_dict["OPTIONS"].get("pool", {}),
+        )
+        self._pool = pool
+
+        return pool.getconn(
+            lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+            health_check=self.settings_dict["CONN_HEALTH_CHECKS"],
+        )
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self._pool.putconn(self.connection)
@@ -0,0 +1,346 @@
+"""
+Process-wide pools of PostgreSQL connections.
+
+Connections are checked out when Django connects and checked in when it
+closes the connection, at the end of every request and Celery task, so
+the connection setup is paid once per pooled connection instead of once
+per request. A pool opens at most ``max_size`` connections, checkouts
+wait for one up to ``timeout`` seconds, and connections idle for longer
+than ``max_idle`` seconds are closed down to ``min_size``.
+
+A forked process (Celery prefork children, gunicorn workers) gets pools
+of its own. The inherited connections are never used or closed there:
+closing them would end the sessions of the parent.
+"""
+import collections
+import json
+import os
+import socket
+import threading
+import time
+
+import psycopg2
+import redis
+from psycopg2.extensions import (
+    TRANSACTION_STATUS_IDLE,
+    TRANSACTION_STATUS_INERROR,
+    TRANSACTION_STATUS_INTRANS,
+)
+
+from library_project.redis_client import get_redis
+
+STATS_KEY = "db_pool:stats"
+# the inherited connections of a forked process, referenced so they are
+# never garbage collected, which would close them
+_inherited = []
+_pools = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """No connection was checked in within the timeout of the pool"""
+
+
+class ConnectionPool:
+    def __init__(
+            self,
+            name: str,
+            min_size: int = 0,
+            max_size: int = 10,
+            timeout: float = 5,
+            max_idle: float = 300,
+            stats_interval: float = 10,
+    ):
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.stats_interval = stats_interval
+        self.pid = os.getpid()
+        self.condition = threading.Condition()
+        # idle connections with their check in time, the most recently
+        # used are checked out first so the rest can expire
+        self.idle = collections.deque()
+        self.in_use = set()
+        self.opening = 0
+        self.waiting = 0
+        self.published_at = 0
+        self.counters = dict.fromkeys(
+            (
+                "checkouts", "waits", "timeouts", "opened", "closed",
+                "failed_checks", "peak_in_use",
+            ),
+            0,
+        )
+        self.wait_time = 0.0
+
+    @property
+    def size(self) -> int:
+        return len(self.idle) + len(self.in_use) + self.opening
+
+    def getconn(self, connect, health_check: bool = False):
+        """
+        Idle connection that passes the health check or a new one made by
+        ``connect``
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+
+        while True:
+            connection = self._checkout(started, deadline)
+
+            if connection is None:
+                return self._open(connect)
+
+            if self._is_usable(connection, health_check):
+                return connection
+
+            with self.condition:
+                self.in_use.discard(connection)
+                self.counters["failed_checks"] += 1
+                self.condition.notify()
+
+            self._close(connection)
+
+    def putconn(self, connection) -> None:
+        if self.pid != os.getpid():
+            _inherited.append(connection)
+            return
+
+        if not self._reset(connection):
+            with self.condition:
+                self.in_use.discard(connection)
+                self.condition.notify()
+
+            self._close(connection)
+            return
+
+        now = time.monotonic()
+        expired = []
+
+        with self.condition:
+            if connection not in self.in_use:
+                return
+
+            self.in_use.remove(connection)
+            self.idle.append((connection, now))
+
+            while (
+                    len(self.idle) > self.min_size
+                    and now - self.idle[0][1] > self.max_idle
+            ):
+                expired.append(self.idle.popleft()[0])
+
+            self.condition.notify()
+
+        for connection in expired:
+            self._close(connection)
+
+        if now - self.published_at >= self.stats_interval:
+            self.published_at = now
+            publish_stats(self)
+
+    def close_idle(self) -> None:
+        with self.condition:
+            idle = [connection for connection, _ in self.idle]
+            self.idle.clear()
+
+        for connection in idle:
+            self._close(connection)
+
+    def stats(self) -> dict:
+        with self.condition:
+            return {
+                "size": self.size,
+                "in_use": len(self.in_use),
+                "idle": len(self.idle),
+                "waiting": self.waiting,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                **self.counters,
+                "wait_ms": round(self.wait_time * 1000, 1),
+            }
+
+    def _checkout(self, started: float, deadline: float):
+        """Idle connection marked in use, or None when one should be opened"""
+        with self.condition:
+            waited = False
+
+            while not self.idle and self.size >= self.max_size:
+                remaining = deadline - time.monotonic()
+
+                if remaining <= 0:
+                    self.counters["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"No connection of the {self.name} pool "
+                        f"({self.max_size}) was free within {self.timeout}s"
+                    )
+
+                waited = True
+                self.waiting += 1
+                self.condition.wait(remaining)
+                self.waiting -= 1
+
+            self.counters["checkouts"] += 1
+
+            if waited:
+                self.counters["waits"] += 1
+                self.wait_time += time.monotonic() - started
+
+            if self.idle:
+                connection = self.idle.pop()[0]
+                self.in_use.add(connection)
+            else:
+                connection = None
+                self.opening += 1
+
+            self.counters["peak_in_use"] = max(
+                self.counters["peak_in_use"], len(self.in_use) + self.opening
+            )
+
+            return connection
+
+    def _open(self, connect):
+        try:
+            connection = connect()
+        except BaseException:
+            with self.condition:
+                self.opening -= 1
+                self.condition.notify()
+            raise
+
+        with self.condition:
+            self.opening -= 1
+            self.in_use.add(connection)
+            self.counters["opened"] += 1
+
+        return connection
+
+    @staticmethod
+    def _is_usable(connection, health_check: bool) -> bool:
+        if connection.closed:
+            return False
+
+        if not health_check:
+            return True
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+
+            if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except psycopg2.Error:
+            return False
+
+        return True
+
+    @staticmethod
+    def _reset(connection) -> bool:
+        """Ends the transaction a connection was checked in with"""
+        if connection.closed:
+            return False
+
+        status = connection.info.transaction_status
+
+        if status in (TRANSACTION_STATUS_INTRANS, TRANSACTION_STATUS_INERROR):
+            try:
+                connection.rollback()
+            except psycopg2.Error:
+                return False
+
+            status = connection.info.transaction_status
+
+        return status == TRANSACTION_STATUS_IDLE
+
+    def _close(self, connection) -> None:
+        with self.condition:
+            self.counters["closed"] += 1
+
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+
+
+def get_pool(key, name: str, options: dict) -> ConnectionPool:
+    """Pool of the process for the connection parameters of ``key``"""
+    global _pools, _pools_pid
+
+    if _pools_pid != os.getpid():
+        _inherited.extend(_pools.values())
+        _pools = {}
+        _pools_pid = os.getpid()
+
+    pool = _pools.get(key)
+
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(name, **options)
+
+    return pool
+
+
+def close_pools() -> None:
+    """Closes the idle connections of every pool of the process"""
+    if _pools_pid == os.getpid():
+        for pool in list(_pools.values()):
+            pool.close_idle()
+
+
+def _stats_field(pool: ConnectionPool) -> str:
+    return f"{socket.gethostname()}:{pool.pid}:{pool.name}"
+
+
+def publish_stats(pool: ConnectionPool) -> None:
+    """
+    Stores the stats of the pool in Redis, where db_pool_stats reads the
+    pools of every process
+    """
+    client = get_redis()
+
+    if client is None:
+        return
+
+    stats = {**pool.stats(), "updated_at": time.time()}
+
+    try:
+        client.hset(STATS_KEY, _stats_field(pool), json.dumps(stats))
+    except redis.RedisError:
+        # the stats are best effort, a request must not fail on them
+        pass
+
+
+def get_stats(max_age: float) -> dict[str, dict]:
+    """
+    Published stats by process and pool, dropping those of processes that
+    published nothing for ``max_age`` seconds
+    """
+    client = get_redis()
+    stats = {}
+
+    if client is None:
+        for pool in _pools.values() if _pools_pid == os.getpid() else ():
+            stats[_stats_field(pool)] = pool.stats()
+
+        return stats
+
+    stale = []
+
+    for field, value in client.hgetall(STATS_KEY).items():
+        pool_stats = json.loads(value)
+
+        if time.time() - pool_stats.pop("updated_at") > max_age:
+            stale.append(field)
+        else:
+            stats[field.decode()] = pool_stats
+
+    if stale:
+        client.hdel(STATS_KEY, *stale)
+
+    return stats
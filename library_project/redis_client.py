@@ -0,0 +1,16 @@
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+
+
+@lru_cache(maxsize=None)
+def get_redis() -> redis.Redis | None:
+    """
+    Shared Redis client of the process, None when REDIS_URL is not set.
+    The client keeps its own connection pool and reconnects after fork.
+    """
+    if not settings.REDIS_URL:
+        return None
+
+    return redis.Redis.from_url(settings.REDIS_URL)
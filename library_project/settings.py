@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'debug_toolbar',
     'drf_spectacular',
@@ -50,11 +51,12 @@ INSTALLED_APPS = [
     'books',
     'user',
     'borrowings',
+    'analytics',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'library_project.middleware.DebugToolbarMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -63,6 +65,11 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Report the database queries of every request in the X-DB-Queries
+# response header, the load test reads it
+if os.getenv("QUERY_COUNT_HEADER") == "True":
+    MIDDLEWARE.insert(0, "library_project.middleware.QueryCountMiddleware")
+
 ROOT_URLCONF = 'library_project.urls'
 
 TEMPLATES = [
@@ -87,17 +94,50 @@ WSGI_APPLICATION = 'library_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Connections are checked out of a pool of the process (web workers and
+# every Celery prefork child) and checked in at the end of a request or
+# task with DB_POOL, otherwise they are kept for DB_CONN_MAX_AGE seconds.
+# db_pool_stats reports the pools
+DB_POOL = os.getenv("DB_POOL") == "True"
+
 DATABASES = {
     'default': {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": (
+            "library_project.pooled_postgresql"
+            if DB_POOL
+            else "django.db.backends.postgresql"
+        ),
         "NAME": os.environ["POSTGRES_DB"],
         "USER": os.environ["POSTGRES_USER"],
         "PASSWORD": os.environ["POSTGRES_PASSWORD"],
         "HOST": os.environ["POSTGRES_HOST"],
         "PORT": os.environ["POSTGRES_PORT"],
+        "OPTIONS": {
+            # lets book search match words with a typo (default is 0.6)
+            "options": "-c pg_trgm.word_similarity_threshold=0.3",
+        },
+        "CONN_MAX_AGE": 0 if DB_POOL else int(os.getenv("DB_CONN_MAX_AGE", 0)),
+        # pings a pooled or persistent connection before it is reused
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+if DB_POOL:
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(os.getenv("DB_POOL_MIN_SIZE", 2)),
+        "max_size": int(os.getenv("DB_POOL_MAX_SIZE", 20)),
+        # seconds a checkout waits for a connection
+        "timeout": 5,
+        # seconds before an idle connection above min_size is closed
+        "max_idle": 300,
+        "stats_interval": 10,
+    }
+
+# requests of an ASGI process that may use the database at the same time,
+# every one of them holds a connection (library_project/async_db.py), at
+# most DB_POOL_MAX_SIZE with DB_POOL
+ASYNC_DATABASE_CONNECTIONS = 20
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -142,7 +182,11 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "user.authentication.StatelessJWTAuthentication",
+    ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "library_project.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
     ),
 }
 
@@ -163,15 +207,136 @@ SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": False,
+    "TOKEN_OBTAIN_SERIALIZER": "user.serializers.TokenObtainPairSerializer",
 }
+# Resolve the user of a request from its token claims, see
+# user/authentication.py. Needs a cache shared by all processes (Redis),
+# the cached user versions are what revokes the claims of a changed user.
+JWT_STATELESS_USER = os.getenv("JWT_STATELESS_USER") == "True"
+JWT_USER_CACHE_TIMEOUT = 60
 
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
 CHAT_ID = os.getenv("CHAT_ID")
 
+# Admin notifications are queued in Redis and sent in batches by Celery
+NOTIFICATION_BATCH_SIZE = 50
+NOTIFICATION_BATCH_DELAY = 2
+NOTIFICATION_MIN_INTERVAL = 1
+NOTIFICATION_TIMEOUT = 5
+NOTIFICATION_POOL_SIZE = 4
+NOTIFICATION_FLUSH_LOCK_TIMEOUT = 5 * 60
+
 STRIPE_API_KEY = os.getenv("STRIPE_API_KEY")
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE", "https://api.stripe.com")
+# Create Stripe checkout sessions in a Celery task after the borrowing
+# is committed instead of inside the create request.
+STRIPE_DEFERRED_SESSION = os.getenv("STRIPE_DEFERRED_SESSION") == "True"
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
+# Payment gateway client, see borrowings/payment_gateway.py. Timeouts are
+# in seconds, the deadline bounds a whole call with its retries.
+PAYMENT_GATEWAY = os.getenv(
+    "PAYMENT_GATEWAY", "borrowings.payment_gateway.StripeGateway"
+)
+PAYMENT_GATEWAY_POOL_SIZE = 10
+# connections of the async client, shared by all requests of an ASGI process
+PAYMENT_GATEWAY_ASYNC_POOL_SIZE = 500
+PAYMENT_GATEWAY_TIMEOUT = 5
+PAYMENT_GATEWAY_DEADLINE = 8
+PAYMENT_GATEWAY_RETRIES = 2
+PAYMENT_GATEWAY_BACKOFF = 0.2
+PAYMENT_GATEWAY_FAILURE_THRESHOLD = 5
+PAYMENT_GATEWAY_RESET_TIMEOUT = 30
+# While the gateway circuit is open borrowings are either created with
+# the session deferred to Celery ("defer") or rejected with 503 ("fail")
+PAYMENT_GATEWAY_FALLBACK = os.getenv("PAYMENT_GATEWAY_FALLBACK", "defer")
+# Most books a bulk checkout may borrow at once
+CHECKOUT_MAX_BOOKS = 20
+# Webhook events are applied by a Celery task in batches
+STRIPE_EVENT_BATCH_SIZE = 500
+STRIPE_EVENT_BATCH_DELAY = 1
+# Checkout session events the reconciliation lists per request (at most
+# 100 on Stripe) and how far back in seconds its first run goes, Stripe
+# keeps events for 30 days
+STRIPE_RECONCILE_PAGE_SIZE = 100
+STRIPE_RECONCILE_LOOKBACK = 30 * 24 * 60 * 60
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+# Token bucket throttles of the borrowing and payment endpoints, see
+# library_project/throttling.py. A request takes a token of its user
+# ("user") and of its user on the endpoint. Needs Redis, without
+# REDIS_URL requests are not throttled.
+THROTTLE_RATES = {
+    "user": "60/min",
+    "borrowing": "10/min",
+    "return": "10/min",
+    "payment": "30/min",
+}
+# Requests of the endpoints that call Stripe and Telegram served at once
+# by all processes, the slot of a request that died is freed after the
+# lease (seconds)
+EXTERNAL_CALL_CONCURRENCY = 50
+EXTERNAL_CALL_LEASE = 30
+EXTERNAL_CALL_RETRY_AFTER = 1
+
+CACHES = {
+    "default": (
+        {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+        if REDIS_URL
+        else {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    ),
+}
+
+# Catalog cache of the book endpoints. List pages are not invalidated
+# by borrowings and returns, so they may show an inventory up to
+# CATALOG_CACHE_MAX_STALENESS seconds old; book details never do.
+CATALOG_CACHE_TIMEOUT = 60 * 60
+CATALOG_CACHE_MAX_STALENESS = int(os.getenv("CATALOG_CACHE_MAX_STALENESS", 10))
+CATALOG_CACHE_LOCK_TIMEOUT = 5
+
+# Books whose availability projection reconcile_availability checks per
+# run, a full pass over the catalog takes (books / batch size) minutes
+AVAILABILITY_RECONCILE_BATCH_SIZE = 1_000
+
+# Seconds between fine accrual runs, the outstanding fines total is
+# cached for as long
+FINE_ACCRUAL_INTERVAL = 10 * 60
+
+# Borrowings and returns refresh_analytics folds into the summaries per
+# transaction, and how many seconds old they must be to be folded, so the
+# transactions that wrote them have committed
+ANALYTICS_REFRESH_BATCH_SIZE = 10_000
+ANALYTICS_COMMIT_MARGIN = 60
 
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND")
 CELERY_TIMEZONE = "Europe/Kyiv"
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
+CELERY_BEAT_SCHEDULE = {
+    "reconcile-book-availability": {
+        "task": "books.tasks.reconcile_availability",
+        "schedule": 60,
+    },
+    "accrue-overdue-fines": {
+        "task": "borrowings.tasks.accrue_overdue_fines",
+        "schedule": FINE_ACCRUAL_INTERVAL,
+    },
+    "reconcile-stripe-payments": {
+        "task": "borrowings.tasks.reconcile_stripe_payments",
+        "schedule": 5 * 60,
+    },
+    "refresh-analytics": {
+        "task": "analytics.tasks.refresh_analytics",
+        "schedule": 60,
+    },
+}
+
+# The overdue scan runs one subtask per range of borrowing ids
+OVERDUE_SCAN_RANGE_SIZE = 50_000
+OVERDUE_SCAN_CHUNK_SIZE = 2_000
+OVERDUE_DIGEST_SIZE = 20
@@ -0,0 +1,260 @@
+"""
+Token bucket throttles and a concurrency cap kept in Redis.
+
+A request of a throttled endpoint takes a token from the bucket of its
+user and from the bucket of its user on the endpoint, rates are
+THROTTLE_RATES "number/period": a bucket holds that number of tokens and
+refills them over the period. The endpoints that call Stripe and
+Telegram also take one of the EXTERNAL_CALL_CONCURRENCY slots shared by
+every process while they run. Both are Lua scripts, so concurrent
+requests of all processes never take the same token or slot, and they
+use the clock of Redis, not the clocks of the web hosts.
+
+Throttled requests get 429 with Retry-After. Every decision is counted
+in Redis, ``manage.py throttle_stats`` reports the counters. Without
+REDIS_URL, or while Redis is unavailable, requests are not throttled.
+"""
+import logging
+import math
+import uuid
+
+import redis
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+from library_project.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+STATS_KEY = "throttle:stats"
+USER_SCOPE = "user"
+EXTERNAL_CALLS = "external_calls"
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+# KEYS: the buckets, then the stats hash. ARGV: capacity, refill period
+# in ms and stats label of every bucket. Takes a token from every bucket
+# or from none, returns 0 or the ms until all of them have one.
+TAKE_TOKENS = """
+local time = redis.call("TIME")
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local buckets = #KEYS - 1
+local tokens = {}
+local wait = 0
+
+for i = 1, buckets do
+    local capacity = tonumber(ARGV[i * 3 - 2])
+    local period = tonumber(ARGV[i * 3 - 1])
+    local bucket = redis.call("HMGET", KEYS[i], "tokens", "at")
+    local left = tonumber(bucket[1]) or capacity
+    local at = tonumber(bucket[2]) or now
+
+    tokens[i] = math.min(capacity, left + (now - at) * capacity / period)
+
+    if tokens[i] < 1 then
+        wait = math.max(wait, math.ceil((1 - tokens[i]) * period / capacity))
+        redis.call("HINCRBY", KEYS[#KEYS], ARGV[i * 3] .. ":throttled", 1)
+    end
+end
+
+for i = 1, buckets do
+    local period = tonumber(ARGV[i * 3 - 1])
+
+    if wait == 0 then
+        tokens[i] = tokens[i] - 1
+        redis.call("HINCRBY", KEYS[#KEYS], ARGV[i * 3] .. ":allowed", 1)
+    end
+
+    redis.call("HSET", KEYS[i], "tokens", tokens[i], "at", now)
+    redis.call("PEXPIRE", KEYS[i], period)
+end
+
+return wait
+"""
+
+# KEYS: the holders sorted by when they took a slot, the stats hash.
+# ARGV: slots, lease in ms, holder, stats label. Returns 1 when the
+# holder got a slot, slots held longer than the lease are freed first.
+ACQUIRE_SLOT = """
+local time = redis.call("TIME")
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local lease = tonumber(ARGV[2])
+
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", now - lease)
+
+if redis.call("ZCARD", KEYS[1]) < tonumber(ARGV[1]) then
+    redis.call("ZADD", KEYS[1], now, ARGV[3])
+    redis.call("PEXPIRE", KEYS[1], lease)
+    redis.call("HINCRBY", KEYS[2], ARGV[4] .. ":allowed", 1)
+    return 1
+end
+
+redis.call("HINCRBY", KEYS[2], ARGV[4] .. ":throttled", 1)
+return 0
+"""
+
+
+def parse_rate(rate: str) -> tuple[int, int]:
+    """Tokens and refill period in ms of a "number/period" rate"""
+    number, period = rate.split("/")
+    return int(number), PERIODS[period[0]] * 1000
+
+
+def _bucket_key(scope: str, ident: str) -> str:
+    return f"throttle:bucket:{scope}:{ident}"
+
+
+def _slots_key(name: str) -> str:
+    return f"throttle:slots:{name}"
+
+
+def take_tokens(ident: str, scope: str) -> float:
+    """
+    Takes a token from the bucket of the user and from the bucket of
+    the user on ``scope``. Returns 0 when it did, otherwise the seconds
+    until both buckets have a token again.
+    """
+    client = get_redis()
+
+    if client is None:
+        return 0
+
+    keys = []
+    args = []
+
+    for bucket_scope in (USER_SCOPE, scope):
+        keys.append(_bucket_key(bucket_scope, ident))
+        args.extend([*parse_rate(settings.THROTTLE_RATES[bucket_scope]), bucket_scope])
+
+    try:
+        wait = client.register_script(TAKE_TOKENS)(
+            keys=[*keys, STATS_KEY], args=args
+        )
+    except redis.RedisError:
+        logger.warning("Request not throttled, Redis is unavailable", exc_info=True)
+        return 0
+
+    return wait / 1000
+
+
+def acquire_slot(name: str = EXTERNAL_CALLS) -> str | None:
+    """
+    Takes one of the EXTERNAL_CALL_CONCURRENCY slots of ``name``,
+    returns the holder to release it with, None when all are taken
+    """
+    holder = uuid.uuid4().hex
+    client = get_redis()
+
+    if client is None:
+        return holder
+
+    try:
+        acquired = client.register_script(ACQUIRE_SLOT)(
+            keys=[_slots_key(name), STATS_KEY],
+            args=[
+                settings.EXTERNAL_CALL_CONCURRENCY,
+                settings.EXTERNAL_CALL_LEASE * 1000,
+                holder,
+                name,
+            ],
+        )
+    except redis.RedisError:
+        logger.warning("Request not throttled, Redis is unavailable", exc_info=True)
+        return holder
+
+    return holder if acquired else None
+
+
+def release_slot(holder: str, name: str = EXTERNAL_CALLS) -> None:
+    client = get_redis()
+
+    if client is None:
+        return
+
+    try:
+        client.zrem(_slots_key(name), holder)
+    except redis.RedisError:
+        # the lease frees the slot
+        pass
+
+
+def get_stats() -> dict:
+    """Allowed and throttled requests by scope, and slots in use"""
+    client = get_redis()
+    stats = {"scopes": {}, "slots_in_use": 0}
+
+    if client is None:
+        return stats
+
+    for field, count in client.hgetall(STATS_KEY).items():
+        scope, decision = field.decode().rsplit(":", 1)
+        stats["scopes"].setdefault(scope, {"allowed": 0, "throttled": 0})
+        stats["scopes"][scope][decision] = int(count)
+
+    stats["slots_in_use"] = client.zcard(_slots_key(EXTERNAL_CALLS))
+    return stats
+
+
+def reset_stats() -> None:
+    client = get_redis()
+
+    if client is not None:
+        client.delete(STATS_KEY)
+
+
+def retry_after(wait: float) -> str:
+    """Retry-After header value of a wait in seconds"""
+    return str(math.ceil(wait))
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttles the actions of a view listed in its ``throttle_scopes``,
+    mapping each action to the scope of its bucket
+    """
+
+    wait_seconds = 0
+
+    def allow_request(self, request, view):
+        scope = getattr(view, "throttle_scopes", {}).get(view.action)
+
+        if scope is None:
+            return True
+
+        ident = (
+            str(request.user.pk)
+            if request.user and request.user.is_authenticated
+            else self.get_ident(request)
+        )
+        self.wait_seconds = take_tokens(ident, scope)
+
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class ExternalCallLimitMixin:
+    """
+    Runs the ``external_call_actions`` of a view in one of the slots
+    shared by all processes, a request gets 429 while all are taken
+    """
+
+    external_call_actions = ()
+    external_call_slot = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        if self.action in self.external_call_actions:
+            self.external_call_slot = acquire_slot()
+
+            if self.external_call_slot is None:
+                self.throttled(request, settings.EXTERNAL_CALL_RETRY_AFTER)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self.external_call_slot is not None:
+            release_slot(self.external_call_slot)
+            self.external_call_slot = None
+
+        return super().finalize_response(request, response, *args, **kwargs)
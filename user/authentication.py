@@ -0,0 +1,97 @@
+"""
+JWT authentication without a user lookup per request.
+
+Tokens carry the ``email`` and ``is_staff`` of the user and a
+``user_version`` claim, a digest of the fields the API trusts. The
+current version of every user is kept in the shared cache for
+``JWT_USER_CACHE_TIMEOUT`` seconds and dropped whenever the user is
+saved or deleted. With ``JWT_STATELESS_USER`` on, a token of the current
+version is resolved into a User built from its claims without a query;
+a stale token, or one issued without the claims, loads the user from
+the database as before.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+# cached for deleted users, no token carries it
+DELETED_USER_VERSION = ""
+
+
+def _user_version_key(user_id: int) -> str:
+    return f"user:{user_id}:version"
+
+
+def user_version(email: str, is_staff: bool, is_active: bool) -> str:
+    """Digest of the user fields resolved from token claims"""
+    return hashlib.sha1(
+        f"{email}:{is_staff}:{is_active}".encode()
+    ).hexdigest()[:16]
+
+
+def get_user_version(user_id: int) -> str:
+    key = _user_version_key(user_id)
+    version = cache.get(key)
+
+    if version is None:
+        user = (
+            get_user_model().objects
+            .filter(pk=user_id)
+            .values("email", "is_staff", "is_active")
+            .first()
+        )
+        version = user_version(**user) if user else DELETED_USER_VERSION
+        cache.set(key, version, timeout=settings.JWT_USER_CACHE_TIMEOUT)
+
+    return version
+
+
+def invalidate_user(user_id: int) -> None:
+    """
+    Drops the cached version now and again after commit, so a version
+    read by a concurrent request before the commit is not kept
+    """
+    key = _user_version_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def add_user_claims(token, user) -> None:
+    token["email"] = user.email
+    token["is_staff"] = user.is_staff
+    token["user_version"] = user_version(
+        user.email, user.is_staff, user.is_active
+    )
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication resolving the user from token claims"""
+
+    def get_user(self, validated_token):
+        if not settings.JWT_STATELESS_USER:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+            email = validated_token["email"]
+            is_staff = validated_token["is_staff"]
+            version = validated_token["user_version"]
+        except KeyError:
+            return super().get_user(validated_token)
+
+        if version != get_user_version(user_id):
+            # the user changed since the token was issued
+            return super().get_user(validated_token)
+
+        user = get_user_model()(
+            id=user_id, email=email, is_staff=is_staff, is_active=True
+        )
+        user._state.adding = False
+        user.from_token_claims = True
+
+        return user
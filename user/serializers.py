@@ -1,5 +1,8 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
+from rest_framework_simplejwt import serializers as jwt_serializers
+
+from user.authentication import add_user_claims
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -22,3 +25,13 @@ class UserSerializer(serializers.ModelSerializer):
             user.save()
 
         return user
+
+
+class TokenObtainPairSerializer(jwt_serializers.TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        """Add the claims StatelessJWTAuthentication resolves the user from"""
+        token = super().get_token(user)
+        add_user_claims(token, user)
+
+        return token
@@ -1,3 +1,94 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from user.authentication import StatelessJWTAuthentication
+
+TOKEN_URL = reverse("user:token_obtain_pair")
+MANAGE_URL = reverse("user:manage")
+
+
+@override_settings(JWT_STATELESS_USER=True)
+class StatelessJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "reader@library.com", "password", first_name="Reader"
+        )
+        self.token = self.obtain_token()
+
+    def obtain_token(self):
+        response = self.client.post(
+            TOKEN_URL, {"email": "reader@library.com", "password": "password"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["access"]
+
+    def authenticate(self, token):
+        request = APIRequestFactory().get(
+            "/", HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+        return StatelessJWTAuthentication().authenticate(request)[0]
+
+    def test_token_carries_user_claims(self):
+        token = AccessToken(self.token)
+
+        self.assertEqual(token["email"], "reader@library.com")
+        self.assertFalse(token["is_staff"])
+        self.assertIn("user_version", token)
+
+    def test_user_is_resolved_from_claims_without_query(self):
+        self.authenticate(self.token)
+
+        with self.assertNumQueries(0):
+            user = self.authenticate(self.token)
+
+        self.assertEqual(user.id, self.user.id)
+        self.assertEqual(user.email, "reader@library.com")
+        self.assertFalse(user.is_staff)
+
+    def test_changed_user_is_loaded_from_database(self):
+        self.authenticate(self.token)
+        self.user.is_staff = True
+        self.user.save()
+
+        user = self.authenticate(self.token)
+
+        self.assertTrue(user.is_staff)
+        self.assertFalse(getattr(user, "from_token_claims", False))
+
+    def test_deactivated_user_is_rejected(self):
+        self.authenticate(self.token)
+        self.user.is_active = False
+        self.user.save()
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        response = self.client.get(MANAGE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_update_of_current_user_keeps_other_fields(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+
+        response = self.client.patch(MANAGE_URL, {"email": "new@library.com"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, "new@library.com")
+        self.assertEqual(self.user.first_name, "Reader")
+        self.assertTrue(self.user.check_password("password"))
+        self.assertEqual(
+            self.authenticate(self.token).email, "new@library.com"
+        )
+
+    @override_settings(JWT_STATELESS_USER=False)
+    def test_user_is_loaded_from_database_when_disabled(self):
+        with self.assertNumQueries(1):
+            user = self.authenticate(self.token)
+
+        self.assertEqual(user.first_name, "Reader")
@@ -1,8 +1,8 @@
 from drf_spectacular.utils import extend_schema, extend_schema_view
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from user.authentication import StatelessJWTAuthentication
 from user.serializers import UserSerializer
 
 
@@ -24,8 +24,15 @@ class CreateUserView(generics.CreateAPIView):
 )
 class ManageUserView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (StatelessJWTAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_object(self):
-        return self.request.user
+        user = self.request.user
+
+        if getattr(user, "from_token_claims", False):
+            # only some fields come from the token, the rest are loaded
+            # before the user is shown or saved
+            user.refresh_from_db()
+
+        return user